@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Measure the latency of a commit of the store with different PRAGMAs.
+
+Every commit adds one task and saves the store, like "doto task add" does.
+Each setting gets its own store in a temporary directory.
+
+An example of its use would be
+    $ python3 bench/commit.py --commits 200
+    journal_mode synchronous   min ms  median ms
+    delete       full            0.49       0.81
+    ...
+    wal          normal          0.13       0.15
+    ...
+
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import doto.model
+import doto.model.task
+
+JOURNAL_MODES = ("delete", "truncate", "wal")
+SYNCHRONOUS = ("full", "normal", "off")
+
+
+def time_commits(filename, pragmas, commits):
+    """
+    Add a task and commit it commits times.
+
+    @return a list of the times of the commits in seconds
+    """
+    times = []
+    with doto.model.Store(filename, filename + ".cache", filename + ".last", pragmas) as store:
+        for i in range(commits):
+            start = time.perf_counter()
+            doto.model.task.add_new(store, doto.model.task.Task("title %d" % i, "description"))
+            store.save()
+            times.append(time.perf_counter() - start)
+    return times
+
+
+def bench(commits):
+    """
+    Run the commits for every combination of journal mode and synchronous.
+
+    @return a list of (journal_mode, synchronous, times) tuples
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for journal_mode in JOURNAL_MODES:
+            for synchronous in SYNCHRONOUS:
+                pragmas = dict(doto.model.Store.PRAGMAS, journal_mode=journal_mode, synchronous=synchronous)
+                filename = os.path.join(tmp_dir, "{}_{}.db".format(journal_mode, synchronous))
+                results.append((journal_mode, synchronous, time_commits(filename, pragmas, commits)))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the commit latency of the store with different PRAGMAs.")
+    parser.add_argument("--commits", type=int, default=100, help="the number of commits of every setting.")
+    args = parser.parse_args()
+
+    print("{:<12} {:<11} {:>8} {:>10}".format("journal_mode", "synchronous", "min ms", "median ms"))
+    for journal_mode, synchronous, times in bench(args.commits):
+        print("{:<12} {:<11} {:>8.2f} {:>10.2f}".format(journal_mode, synchronous,
+                                                       min(times) * 1000, statistics.median(times) * 1000))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Generate a synthetic store of a configurable size.
+
+The store gets tasks with mixed states, difficulties and due dates,
+single and recurring appointments and years of timerecords.
+The same seed always creates the same events, relative to now.
+
+An example of its use would be
+    $ python3 bench/generate.py /tmp/large.db --tasks 100000 --apmts 10000 --repeats 100 --years 5
+    tasks 100000, appointments 26173, repeats 100, timerecords 2681
+
+"""
+import argparse
+import datetime
+import os
+import random
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import doto.model
+import doto.model.apmt
+import doto.model.task
+import doto.model.timerecord
+
+DAY = datetime.timedelta(days=1)
+# A repeat is created with one of these patterns, and an hourly repeat starts in the last week,
+# otherwise it would add thousands of appointments when it is materialised.
+REPEAT_PATTERNS = ("@daily", "@weekly", "@monthly", "@yearly", "@hourly")
+DIFFICULTIES = tuple(doto.model.task.DIFFICULTY.keys)
+
+
+def random_task(rnd, i, now, years):
+    """
+    Create a task with a random state, difficulty and due date.
+
+    About half of the tasks are done, a tenth is started and two thirds have a due date.
+    """
+    task = doto.model.task.Task("task %d" % i, "the description of the synthetic task %d" % i,
+                                difficulty=rnd.choice(DIFFICULTIES),
+                                created=now - DAY * rnd.uniform(0, 365 * years))
+    if rnd.random() < 2 / 3:
+        task.due = now + DAY * rnd.uniform(-30, 365)
+    state = rnd.random()
+    if state < 0.5:
+        task.done()
+    elif state < 0.6:
+        task.start()
+    return task
+
+
+def random_apmt(rnd, i, now, years):
+    """ Create an appointment of one or two hours in the years before now or the next year. """
+    start = now + DAY * rnd.uniform(-365 * years, 365)
+    return doto.model.apmt.Appointment("appointment %d" % i, start,
+                                       description="the description of the synthetic appointment %d" % i,
+                                       end=start + datetime.timedelta(hours=rnd.choice((1, 2))))
+
+
+def random_timerecords(rnd, tasks, now, years):
+    """
+    Create the timerecords of the working days in the years before now.
+
+    Every working day has up to four records of a few hours on random tasks.
+    """
+    records = []
+    day = now - DAY * 365 * years
+    while day < now - DAY:
+        if day.weekday() < 5:
+            start = day.replace(hour=8, minute=0, second=0, microsecond=0)
+            for _ in range(rnd.randint(0, 4)):
+                end = start + datetime.timedelta(minutes=rnd.randint(15, 180))
+                records.append(doto.model.timerecord.Timerecord(start, end, rnd.choice(tasks)))
+                start = end + datetime.timedelta(minutes=rnd.randint(0, 60))
+        day += DAY
+    return records
+
+
+def generate(filename, tasks=10000, apmts=1000, repeats=50, years=3, seed=0, now=None):
+    """
+    Create a new store with synthetic events.
+
+    The missing appointments of the repeats are added, so the first command
+    on the store does not have to add them.
+
+    @param filename the file of the store, which must not exist
+    @param tasks the number of tasks
+    @param apmts the number of single appointments
+    @param repeats the number of recurring appointments
+    @param years the number of years of past events and timerecords
+    @param seed the seed of the random generator
+    @param now the date relative to which the events are created. Default=now_with_tz()
+
+    @return a dictionary with the number of rows of every table
+    """
+    if os.path.exists(filename):
+        raise FileExistsError(filename)
+    rnd = random.Random(seed)
+    if now is None:
+        now = doto.model.now_with_tz()
+    with doto.model.Store(filename, filename + ".cache", filename + ".last") as store:
+        new_tasks = doto.model.task.add_many(store, [random_task(rnd, i, now, years) for i in range(tasks)])
+        doto.model.apmt.add_many(store, [random_apmt(rnd, i, now, years) for i in range(apmts)])
+        for i in range(repeats):
+            pattern = rnd.choice(REPEAT_PATTERNS)
+            days = 7 if pattern == "@hourly" else 365 * years
+            start = now - DAY * rnd.uniform(0, days)
+            apmt = doto.model.apmt.Appointment("repeated appointment %d" % i, start,
+                                               end=start + datetime.timedelta(hours=1))
+            doto.model.apmt.add_repeated(store, apmt, pattern)
+        doto.model.apmt.create_repeats(store, now)
+        if new_tasks:
+            doto.model.timerecord.add_many(store, random_timerecords(rnd, new_tasks, now, years))
+        store.save()
+        return count_rows(store)
+
+
+def count_rows(store):
+    """ Get the number of rows of the tables of the events. """
+    return {table: store.execute("SELECT COUNT(*) FROM {};".format(table)).fetchone()[0]
+            for table in ("tasks", "appointments", "repeats", "timerecords")}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic doto store.")
+    parser.add_argument("store", help="the file of the new store.")
+    parser.add_argument("--tasks", type=int, default=10000, help="the number of tasks.")
+    parser.add_argument("--apmts", type=int, default=1000, help="the number of single appointments.")
+    parser.add_argument("--repeats", type=int, default=50, help="the number of recurring appointments.")
+    parser.add_argument("--years", type=int, default=3, help="the number of years of past events and timerecords.")
+    parser.add_argument("--seed", type=int, default=0, help="the seed of the random generator.")
+    args = parser.parse_args()
+
+    counts = generate(args.store, args.tasks, args.apmts, args.repeats, args.years, args.seed)
+    print("tasks {tasks}, appointments {appointments}, repeats {repeats}, timerecords {timerecords}".format(**counts))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Measure the cold start time of every doto subcommand.
+
+Every command is run in a new interpreter against a store in a temporary
+directory, so the time includes the interpreter start, the imports,
+the argument parsing and the execution of the command.
+
+An example of its use would be
+    $ python3 bench/startup.py --runs 20
+    command                 min ms  median ms
+    python -c pass            9.81      10.35
+    --help                   21.20      22.02
+    ...
+
+With --server the commands are run while a doto server is running,
+and the round trip of a request to the server is measured without
+the start of the interpreter.
+
+"""
+import argparse
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import doto.cli.client
+
+CONFIG = """
+[path]
+store = {dir}/doto.db
+cache = {dir}/cache
+last = {dir}/last
+socket = {dir}/socket
+
+[date]
+local_tz = UTC
+"""
+
+# The commands are run in this order, so the commands which need a task or
+# an appointment run after the commands which add them.
+COMMANDS = (["--help"],
+            ["task", "add", "title", "description"],
+            ["apmt", "add", "title", "2030.01.01-10:00"],
+            ["ls"],
+            ["ls", "tasks"],
+            ["ls", "apmts"],
+            ["task", "show", "-1"],
+            ["task", "start", "-1"],
+            ["task", "reset", "-1"],
+            ["task", "modify", "-1", "--title", "new title"],
+            ["task", "done", "-1"],
+            ["apmt", "show", "-1"],
+            ["punch", "in"],
+            ["punch", "out"],
+            ["db", "analyze"],
+            )
+
+# The commands whose round trip to the server is measured
+REQUESTS = (["ls"],
+            ["punch", "in"],
+            ["punch", "out"],
+            )
+
+
+def time_run(argv, env):
+    """
+    Run argv in a new process.
+
+    @return the wall clock time in seconds
+    """
+    start = time.perf_counter()
+    subprocess.run(argv, env=env, cwd=ROOT, stdin=subprocess.DEVNULL,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def start_server(env, socket_path):
+    """
+    Start a doto server and wait until it listens on socket_path.
+
+    @return the process of the server
+    """
+    server = subprocess.Popen([sys.executable, "-m", "doto", "serve"], env=env, cwd=ROOT, stdin=subprocess.DEVNULL,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    while not os.path.exists(socket_path):
+        time.sleep(0.01)
+    return server
+
+
+def time_request(socket_path, argv):
+    """
+    Send argv to the server.
+
+    @return the time of the round trip in seconds
+    """
+    message = {"argv": argv, "columns": 80, "lines": 24}
+    start = time.perf_counter()
+    doto.cli.client.request(socket_path, message)
+    return time.perf_counter() - start
+
+
+def bench(runs, use_server):
+    """
+    Run every command runs times.
+
+    @return a list of (name, times) tuples
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        config_file = os.path.join(tmp_dir, "dotorc")
+        with open(config_file, "w") as config:
+            config.write(CONFIG.format(dir=tmp_dir))
+        env = dict(os.environ, DOTO_CONFIG=config_file)
+        socket_path = os.path.join(tmp_dir, "socket")
+        server = start_server(env, socket_path) if use_server else None
+
+        try:
+            baseline = [sys.executable, "-c", "pass"]
+            results.append(("python -c pass", [time_run(baseline, env) for _ in range(runs)]))
+            # every run executes all commands in order, so "punch out" always finds one started record
+            times = [[] for _ in COMMANDS]
+            for _ in range(runs):
+                for cmd, cmd_times in zip(COMMANDS, times):
+                    cmd_times.append(time_run([sys.executable, "-m", "doto"] + cmd, env))
+            results += [(" ".join(cmd), cmd_times) for cmd, cmd_times in zip(COMMANDS, times)]
+            if server is not None:
+                times = [[] for _ in REQUESTS]
+                for _ in range(runs):
+                    for cmd, cmd_times in zip(REQUESTS, times):
+                        cmd_times.append(time_request(socket_path, cmd))
+                results += [("request " + " ".join(cmd), cmd_times) for cmd, cmd_times in zip(REQUESTS, times)]
+        finally:
+            if server is not None:
+                server.send_signal(signal.SIGINT)
+                server.wait()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the cold start time of the doto subcommands.")
+    parser.add_argument("--runs", type=int, default=10, help="the number of runs of every command.")
+    parser.add_argument("--server", action="store_true", help="run the commands with a running doto server.")
+    args = parser.parse_args()
+
+    print("{:<40} {:>8} {:>10}".format("command", "min ms", "median ms"))
+    for name, times in bench(args.runs, args.server):
+        print("{:<40} {:>8.2f} {:>10.2f}".format(name, min(times) * 1000, statistics.median(times) * 1000))
+
+
+if __name__ == "__main__":
+    main()
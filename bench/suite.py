@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Time the doto commands on a large synthetic store and report the results as JSON.
+
+The store is created with bench/generate.py in a temporary directory,
+or copied from an existing store given with --store, since the commands change it.
+The commands run in this process like they run in the doto server,
+so the time includes opening the store and executing the command
+without the start of the interpreter and the imports.
+
+An example of its use would be
+    $ python3 bench/suite.py --tasks 100000 --output before.json
+    ...
+    $ python3 bench/suite.py --tasks 100000 --output after.json --compare before.json
+    name                  before ms   after ms   change
+    ls                        12.10       3.52   -70.9%
+    ...
+
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import doto
+import doto.cli.parser
+import doto.cli.printing
+import doto.defaultconfig
+import doto.model
+import doto.model.task
+
+import generate
+
+CONFIG = """
+[path]
+store = {dir}/doto.db
+cache = {dir}/cache
+last = {dir}/last
+socket = {dir}/socket
+
+[date]
+local_tz = UTC
+"""
+TERM = os.terminal_size((80, 24))
+
+
+class Runner(object):
+    """
+    The Runner executes doto commands with the config of a store in a temporary directory.
+
+    @param config the config object
+    """
+
+    def __init__(self, config):
+        self.config = config
+        doto.cli.parser.set_date_parser(config.date.local_tz, config.date.cli_input_str)
+
+    def run(self, argv):
+        """
+        Execute the command line arguments argv and discard the output.
+
+        @return the wall clock time in seconds
+        """
+        start = time.perf_counter()
+        args, cmd = doto.parse_command(argv)
+        with contextlib.redirect_stdout(io.StringIO()), doto.open_store(self.config) as store:
+            exit_code = doto.run_command(cmd, store, args, self.config, TERM)
+        elapsed = time.perf_counter() - start
+        if exit_code:
+            raise RuntimeError("doto {} exited with {}".format(" ".join(argv), exit_code))
+        return elapsed
+
+    def time_command(self, runs, argv):
+        """ Run the same command runs times. """
+        return [self.run(argv) for _ in range(runs)]
+
+    def time_cache_lookups(self, runs, lookups):
+        """
+        Look up the events of the cache file of the last ls tasks.
+
+        @return a list with the time of lookups lookups for every run
+        """
+        times = []
+        with doto.open_store(self.config) as store:
+            for _ in range(runs):
+                store.reset()
+                start = time.perf_counter()
+                for i in range(lookups):
+                    doto.model.get_cache_item(store, i % 20, doto.model.task.Task)
+                times.append(time.perf_counter() - start)
+        return times
+
+
+def time_row_format(runs, rows, compiled):
+    """
+    Format rows rows of a view with the format method or with a compiled row formatter.
+
+    @return a list with the time of all rows for every run
+    """
+    row_format = '{:>4} {:^15} {:^1} {:<30}'
+    values = [(i, "over due", "✓", 'Tet̲a̲r̲st {}'.format(i)) for i in range(rows)]
+    formatter = doto.cli.printing.UnicodeFormatter()
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        if compiled:
+            format_row = formatter.compile(row_format)
+            for row in values:
+                format_row(*row)
+        else:
+            for row in values:
+                formatter.format(row_format, *row)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def bench(runner, runs):
+    """
+    Time every command runs times.
+
+    The commands which change the store use the cache ids of an ls before them.
+
+    @return a list of (name, times) tuples
+    """
+    results = [("ls", runner.time_command(runs, ["ls"])),
+               ("ls --all", runner.time_command(runs, ["ls", "--all"])),
+               ("ls tasks", runner.time_command(runs, ["ls", "tasks"])),
+               ("ls apmts --all", runner.time_command(runs, ["ls", "apmts", "--all"])),
+               ]
+    runner.run(["ls", "apmts"])
+    results.append(("apmt show", runner.time_command(runs, ["apmt", "show", "0"])))
+    runner.run(["ls", "tasks", "--limit", str(runs)])
+    results.append(("task done", [runner.run(["task", "done", str(i)]) for i in range(runs)]))
+    runner.run(["ls", "tasks"])
+    results.append(("cache lookup x1000", runner.time_cache_lookups(runs, 1000)))
+    punch_in = []
+    punch_out = []
+    for _ in range(runs):
+        punch_in.append(runner.run(["punch", "in"]))
+        punch_out.append(runner.run(["punch", "out"]))
+    results += [("punch in", punch_in), ("punch out", punch_out)]
+    results.append(("punch report", runner.time_command(runs, ["punch", "report", "--period", "month"])))
+    results.append(("row format x10000", time_row_format(runs, 10000, compiled=False)))
+    results.append(("compiled format x10000", time_row_format(runs, 10000, compiled=True)))
+    return results
+
+
+def git_commit():
+    """ Get the commit of the working tree, or None outside of a git repository. """
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, stdout=subprocess.PIPE,
+                              stderr=subprocess.DEVNULL, check=True).stdout.decode("utf-8").strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def report(results, counts, runs):
+    """
+    Create the JSON report of the results.
+
+    @return a dictionary which can be dumped with json
+    """
+    return {"commit": git_commit(),
+            "python": sys.version.split()[0],
+            "sqlite": sqlite3.sqlite_version,
+            "runs": runs,
+            "store": counts,
+            "results": {name: {"min_ms": min(times) * 1000,
+                               "median_ms": statistics.median(times) * 1000,
+                               "max_ms": max(times) * 1000}
+                        for name, times in results},
+            }
+
+
+def print_comparison(before, after):
+    """ Print the change of the median time of every command between two reports. """
+    print("{:<24} {:>10} {:>10} {:>8}".format("name", "before ms", "after ms", "change"))
+    for name, result in after["results"].items():
+        old = before["results"].get(name)
+        if old is None:
+            print("{:<24} {:>10} {:>10.2f}".format(name, "-", result["median_ms"]))
+            continue
+        change = (result["median_ms"] - old["median_ms"]) / old["median_ms"]
+        print("{:<24} {:>10.2f} {:>10.2f} {:>+8.1%}".format(name, old["median_ms"], result["median_ms"], change))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the doto commands on a large synthetic store.")
+    parser.add_argument("--runs", type=int, default=10, help="the number of runs of every command.")
+    parser.add_argument("--store", help="a copy of this store is used instead of a generated one.")
+    parser.add_argument("--tasks", type=int, default=10000, help="the number of generated tasks.")
+    parser.add_argument("--apmts", type=int, default=1000, help="the number of generated single appointments.")
+    parser.add_argument("--repeats", type=int, default=50, help="the number of generated recurring appointments.")
+    parser.add_argument("--years", type=int, default=3, help="the number of years of generated events and timerecords.")
+    parser.add_argument("--output", help="write the JSON report to this file instead of stdout.")
+    parser.add_argument("--compare", help="print the change to the JSON report in this file.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        config_file = os.path.join(tmp_dir, "dotorc")
+        with open(config_file, "w") as config:
+            config.write(CONFIG.format(dir=tmp_dir))
+        os.environ["DOTO_CONFIG"] = config_file
+        config = doto.defaultconfig.read_config()
+        if args.store is None:
+            counts = generate.generate(config.path.store, args.tasks, args.apmts, args.repeats, args.years)
+        else:
+            shutil.copyfile(args.store, config.path.store)
+            with doto.open_store(config) as store:
+                counts = generate.count_rows(store)
+        results = bench(Runner(config), args.runs)
+
+    result = report(results, counts, args.runs)
+    if args.output is None:
+        json.dump(result, sys.stdout, indent=2, sort_keys=True)
+        print()
+    else:
+        with open(args.output, "w") as output:
+            json.dump(result, output, indent=2, sort_keys=True)
+    if args.compare is not None:
+        with open(args.compare) as before:
+            print_comparison(json.load(before), result)
+
+
+if __name__ == "__main__":
+    main()
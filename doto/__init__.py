@@ -2,15 +2,20 @@
 
 import argparse
 import shutil
+import sys
 
-import doto.cli
-import doto.cli.cmd
+import doto.cli.client
+import doto.cli.manifest
 import doto.cli.sub_cmds
 import doto.defaultconfig
-import doto.model
+import doto.timings
 
+# The number of functions printed by --profile without a file
+PROFILE_LINES = 40
+PROFILE_TO_STDERR = "--profile=-"
 
-def init_env(commands):
+
+def init_env(commands, argv=None):
     """
     Initialize the enviroment.
 
@@ -18,14 +23,108 @@ def init_env(commands):
         - the parser and subpurser,
         - and the enviroment variables.
 
-    @param commands the modules of the cli commands
+    @param commands the manifest entries of the cli commands
+    @param argv the command line arguments, sys.argv is used if it is None
 
     """
     parser = argparse.ArgumentParser(prog="doto", description="The Done!Tools are a collection of tools to handle task and events.")
+    parser.add_argument("--stats", action="store_true", help="print the statistics of the statement cache after the command.")
+    parser.add_argument("--profile", metavar="FILE",
+                        help="--profile[=FILE] profile the command and write the stats to FILE or to stderr without FILE.")
+    parser.add_argument("--timings", action="store_true", help="print the time of every phase of the command to stderr.")
     subparsers = parser.add_subparsers(help='command', dest="cmd")
-    for cmd in commands:
-        cmd.init_parser(subparsers)
-    return parser, parser.parse_args()
+    doto.cli.sub_cmds.init_parsers(subparsers, commands)
+    if argv is None:
+        argv = sys.argv[1:]
+    # a bare --profile must not take the command as its FILE
+    argv = [PROFILE_TO_STDERR if arg == "--profile" else arg for arg in argv]
+    return parser, parser.parse_args(argv)
+
+
+def parse_command(argv=None):
+    """
+    Parse the command line arguments and import the module of the given command.
+
+    If no command was given the help is printed.
+
+    @return the parsed arguments and the module of the command or None
+    """
+    parser, args = init_env(doto.cli.manifest.COMMANDS, argv)
+    cmd = doto.cli.sub_cmds.load_command(args)
+    if cmd is None:
+        parser.print_help()
+    return args, cmd
+
+
+def open_store(config, timings=None):
+    """
+    Open the store with the paths and settings of the config.
+
+    @param timings the Timings object of the command or None
+
+    @return the Store object
+    """
+    import doto.model as model
+    settings = dict(iter(config.store))
+    cached_statements = int(settings.pop("cached_statements"))
+    return model.Store(config.path.store, config.path.cache, config.path.last, settings, cached_statements, timings)
+
+
+def print_stats(store):
+    """ Print the hits and misses of the statement cache of the store. """
+    import doto.model as model
+    stats = store.statement_stats
+    print("statement cache: {} hits, {} misses, size {}".format(stats.hits, stats.misses, stats.size))
+    for query, count in sorted(stats.statements.items(), key=lambda item: -item[1]):
+        print("{:>8} {}".format(count, model.query_name(query)))
+
+
+def print_profile(profile, filename):
+    """
+    Write the stats of the profile to the file or print them to stderr if filename is "-".
+    """
+    import pstats
+    if filename != "-":
+        profile.dump_stats(filename)
+        return
+    stats = pstats.Stats(profile, stream=sys.stderr)
+    stats.sort_stats("cumulative").print_stats(PROFILE_LINES)
+
+
+def run_command(cmd, store, args, config, term, timings=None):
+    """
+    Execute the command with the store.
+
+    With --profile the command runs in cProfile and with --timings
+    the time of every phase is printed to stderr after the command.
+
+    @param timings the Timings object with the phases before the command or None
+
+    @return the exit code of the command
+    """
+    if timings is None:
+        timings = doto.timings.Timings() if args.timings else doto.timings.NO_TIMINGS
+    store_timings = store.timings
+    store.timings = timings
+    profile = None
+    if args.profile is not None:
+        import cProfile
+        profile = cProfile.Profile()
+        profile.enable()
+    try:
+        with timings.phase("render"):
+            exit_code = cmd.main(store, args, config, term)
+    finally:
+        if profile is not None:
+            profile.disable()
+        store.timings = store_timings
+    if args.stats:
+        print_stats(store)
+    if profile is not None:
+        print_profile(profile, args.profile)
+    if args.timings:
+        timings.print_timings(sys.stderr)
+    return exit_code
 
 
 def main():
@@ -36,18 +135,33 @@ def main():
     parses the command line arguments,
     and executes the gvien command.
 
+    If a doto server is running the command line arguments are sent to it.
+    Otherwise only the module of the given command is imported,
+    so the model is loaded after the arguments are parsed.
+
     """
 
     # Init phase
-    cmds = doto.cli.sub_cmds.import_commands(doto.cli.cmd)
-    config = doto.defaultconfig.read_config()
-    parser, args = init_env(cmds.values())
-    doto.cli.parser.set_date_parser(config.date.local_tz, config.date.cli_input_str)
-    term = shutil.get_terminal_size()
-    with doto.model.Store(config.path.store, config.path.cache, config.path.last) as store:
-        # execute command
-        if args.cmd not in cmds:
-            parser.print_help()
+    # the timings are cheap, so they are measured before it is known if --timings was given
+    timings = doto.timings.Timings()
+    with timings.phase("config"):
+        config_file = doto.defaultconfig.config_file()
+        config = doto.defaultconfig.read_config(config_file)
+    argv = sys.argv[1:]
+    if not (argv and argv[0] in doto.cli.manifest.LOCAL_COMMANDS):
+        exit_code = doto.cli.client.forward(config.path.socket, argv, config_file, config.path.store)
+        if exit_code is not None:
+            return exit_code
+
+    with timings.phase("import"):
+        args, cmd = parse_command(argv)
+        if cmd is None:
             return -1
-        exit_code = cmds[args.cmd].main(store, args, config, term)
+
+        import doto.cli.parser as cli_parser
+        cli_parser.set_date_parser(config.date.local_tz, config.date.cli_input_str)
+        term = shutil.get_terminal_size()
+    with open_store(config, timings) as store:
+        # execute command
+        exit_code = run_command(cmd, store, args, config, term, timings)
     return exit_code
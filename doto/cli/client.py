@@ -0,0 +1,92 @@
+"""
+The client of the doto server.
+
+If a server was started with "doto serve" the command line arguments are
+sent to it over its Unix domain socket and the server executes the command
+with its open store. The client only prints the output of the command.
+
+A request is one line of JSON with the arguments, the terminal size
+and the paths of the config file and the store of the client,
+the response is one line of JSON with the exit code and the output.
+If the command needs a terminal or the client uses another config or store
+the server answers with "fallback" and the command is executed in the process of the client.
+
+This module is imported on every start of doto, so it must stay small.
+"""
+import json
+import os
+import socket
+import sys
+
+
+def request(socket_path, message):
+    """
+    Send the message to the server and return its response.
+
+    @param socket_path the path of the Unix domain socket of the server
+    @param message a dictionary which can be converted to JSON
+
+    @return the response as dictionary or None if there is no server
+    """
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    with sock:
+        try:
+            sock.connect(socket_path)
+        except OSError:
+            return None
+        sock.sendall(json.dumps(message).encode('utf-8') + b'\n')
+        sock.shutdown(socket.SHUT_WR)
+        with sock.makefile('rb') as response:
+            return json.loads(response.readline().decode('utf-8'))
+
+
+def absolute_profile(argv):
+    """
+    Make the file of the global option --profile=FILE absolute.
+
+    The server has its own working directory, so a relative file
+    would be written relative to the directory of the server.
+
+    @param argv the command line arguments without the program name
+
+    @return the command line arguments with the absolute file
+    """
+    new_argv = list(argv)
+    for i, arg in enumerate(new_argv):
+        if not arg.startswith('-'):
+            # the global options end with the command
+            break
+        if arg.startswith('--profile=') and arg != '--profile=-':
+            new_argv[i] = '--profile=' + os.path.abspath(arg[len('--profile='):])
+    return new_argv
+
+
+def forward(socket_path, argv, config_file, store_file):
+    """
+    Execute the command line arguments argv on the server.
+
+    @param socket_path the path of the Unix domain socket of the server
+    @param argv the command line arguments without the program name
+    @param config_file the path of the config file of the client
+    @param store_file the path of the store of the client
+
+    @return the exit code of the command or None if the command must be executed in process
+    """
+    if not os.path.exists(socket_path):
+        return None
+    try:
+        columns, lines = os.get_terminal_size(sys.__stdout__.fileno())
+    except (OSError, ValueError, AttributeError):
+        columns, lines = 0, 0
+    try:
+        response = request(socket_path, {'argv': absolute_profile(argv), 'columns': columns, 'lines': lines,
+                                         'config': os.path.realpath(config_file),
+                                         'store': os.path.realpath(store_file)})
+    except ValueError:
+        print("The doto server did not answer.", file=sys.stderr)
+        return 1
+    if response is None or response.get('fallback'):
+        return None
+    sys.stdout.write(response['stdout'])
+    sys.stderr.write(response['stderr'])
+    return response['exit_code']
@@ -8,7 +8,6 @@ An example of its use would be
 """
 import doto.model
 import doto.model.apmt
-import doto.model.repeat
 import doto.cli.parser
 
 
@@ -16,14 +15,6 @@ COMMAND = "add"
 CONF_DEF = {}
 
 
-def init_parser(subparsers):
-    """Initialise the subparser for Add"""
-    parser = subparsers.add_parser(COMMAND, help="Add a new appointment.")
-    parser.add_argument("title", type=str, help="The title of the new appointment")
-    parser.add_argument("start", type=str, help="The date when the new appointment will start")
-    doto.cli.cmd.apmt.init_apmt_flags(parser)
-
-
 def print_error(message, exc):
     """
     Print the message and the Exception
@@ -44,13 +35,10 @@ def main(store:doto.model.Store, args, _config, _):
     if args.description is not None:
         new_apmt.description = args.description
 
-    doto.model.apmt.add_new(store, new_apmt)
-
-    if args.repeat is not None:
-        new_apmt.repeat = doto.model.repeat.parse(args.repeat, new_apmt.schedule.start, new_apmt.id)
-        doto.model.repeat.add_new(store, new_apmt.repeat)
-
-    doto.model.apmt.update(store, new_apmt)
+    if args.repeat is None:
+        doto.model.apmt.add_new(store, new_apmt)
+    else:
+        doto.model.apmt.add_repeated(store, new_apmt, args.repeat)
     try:
         store.save()
     except Exception as e:
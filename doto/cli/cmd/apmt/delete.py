@@ -13,12 +13,6 @@ COMMAND = "del"
 CONF_DEF = {}
 
 
-def init_parser(subparsers):
-    """ Initialize the subparser. """
-    parser = subparsers.add_parser(COMMAND, help="delete a appointment from the list.")
-    parser.add_argument("id", type=int, help="the id of the appointment which should be deleted.")
-
-
 def main(store, args, *_):
     """ Delete the given appointment in args.id. """
 
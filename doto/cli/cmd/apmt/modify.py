@@ -6,7 +6,9 @@ An example of its use would be
 $ doto apmt modify id  [--title <string>] [--description <string>]  [--due <date>]  [--difficulty <int>]
 
 """
-import doto.cli
+import doto.cli.parser
+import doto.cli.util
+import doto.cli.cmd.apmt
 
 
 COMMAND = "modify"
@@ -15,19 +17,6 @@ CONF_DEF = {}
 RESET = "RESET"
 
 
-def init_parser(subparsers):
-    """
-    Init the parser
-
-    It adds the id argument to the argument parser
-    """
-    parser = subparsers.add_parser(COMMAND, help="")
-    parser.add_argument("id", type=int, nargs='?', default=-1, help="The id of the appointment which should be modified.")
-    parser.add_argument("--title", type=str, help="The title of the new appointment")
-    parser.add_argument("--start", type=str, help="The date when the new appointment will start")
-    doto.cli.cmd.apmt.init_apmt_flags(parser)
-
-
 def set_or_reset(value, fnc=lambda x: x):
     """
     Check if a value is should be set or reset
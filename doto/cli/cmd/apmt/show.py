@@ -13,12 +13,6 @@ COMMAND = "show"
 CONF_DEF = {}
 
 
-def init_parser(subparsers):
-    """ Initialize the subparser. """
-    parser = subparsers.add_parser(COMMAND, help="delete a task from the list.")
-    parser.add_argument("id", type=int, nargs='?', default=-1, help="the id of the task which should be deleted.")
-
-
 def schedule_to_str(schedule, date_printer):
     start = date_printer.date_to_str(schedule.start)
     if schedule.end is not None:
@@ -85,7 +79,7 @@ def show(apmt, width, date_printer):
 def main(store, args, config, term):
     """ Delete the given task in args.id. """
 
-    apmt, error = doto.cli.cmd.apmt.get_cached_apmt(store, args.id)
+    apmt, error = doto.cli.cmd.apmt.get_cached_apmt(store, args.id, occurrences=True)
     if not apmt:
         return error
     width = term.columns if term.columns else 80
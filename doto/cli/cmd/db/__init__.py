@@ -0,0 +1,11 @@
+# -*- coding: utf-8 -*-
+"""
+The command "db" holds the maintenance commands of the Done!Tools store.
+
+An example of its use would be
+    $ doto db analyze
+
+"""
+
+COMMAND = "db"
+CONF_DEF = {}
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""
+The command "analyze" gathers the statistics of the store for the query planner
+and prints the query plans of the built-in queries.
+
+An example of its use would be
+    $ doto db analyze
+      open tasks
+        SCAN tasks USING INDEX tasks_open_due
+
+"""
+import doto.model
+import doto.model.apmt
+import doto.model.repeat
+import doto.model.task
+import doto.model.timerecord
+
+
+COMMAND = "analyze"
+CONF_DEF = {}
+
+
+def builtin_queries():
+    """
+    Get the built-in queries with example parameters.
+
+    @return a list of (name, query, parameters) tuples
+    """
+    now = doto.model.now_with_tz()
+    page = {'from': now, 'until': now, 'after_start': now, 'after_id': 0, 'limit': 20}
+    return [('open tasks', doto.model.task.open_tasks_limit_query, (20,)),
+            ('task by id', doto.model.task.select_query, {'id': 1}),
+            ('tasks by ids', doto.model.task.select_ids_query.format('?, ?'), (1, 2)),
+            ('current appointments', doto.model.apmt.current_page_query, page),
+            ('all appointments', doto.model.apmt.all_page_query, page),
+            ('due repeats', doto.model.apmt.due_repeats_query, {'now': now}),
+            ('due expansions', doto.model.apmt.due_expansion_query, {'until': now}),
+            ('repeats by ids', doto.model.repeat.select_ids_query.format('?, ?'), (1, 2)),
+            ('started timerecords', doto.model.timerecord.started_query, ()),
+            ]
+
+
+def print_plan(plan):
+    """
+    Print a query plan as a tree.
+
+    @param plan a list of (id, parent, detail) tuples
+    """
+    depth = {0: 0}
+    for node_id, parent, detail in plan:
+        depth[node_id] = depth.get(parent, 0) + 1
+        print("{}{}".format("  " * depth[node_id], detail))
+
+
+def main(store, _args, *_):
+    """ Analyze the store and print the query plans. """
+    try:
+        store.analyze()
+        store.save()
+    except Exception as excpt:
+        print("It was not possible to analyze the store.\n\t(Error: %s)" % excpt)
+        return 4
+
+    for name, query, parameters in builtin_queries():
+        print(name)
+        print_plan(store.explain(query, parameters))
+    return 0
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+"""
+The command "rebuild" creates the search index of the store again.
+
+This is needed for a store which was created before the search existed
+or with an sqlite library without FTS5.
+
+An example of its use would be
+    $ doto db rebuild
+
+"""
+import doto.model.search
+
+
+COMMAND = "rebuild"
+CONF_DEF = {}
+
+
+def main(store, _args, *_):
+    """ Rebuild the search index. """
+    if not doto.model.search.fts5_available():
+        print("The search needs an sqlite library with FTS5.")
+        return 4
+    try:
+        doto.model.search.rebuild(store)
+    except Exception as excpt:
+        print("It was not possible to rebuild the search index.\n\t(Error: %s)" % excpt)
+        return 4
+    return 0
@@ -7,6 +7,8 @@ An example of its use is
 """
 import datetime
 import itertools
+import os
+import sys
 import textwrap
 
 import doto.cli.parser
@@ -190,14 +192,7 @@ def line_generator(columns, data):
         items = (column.pack(datum) for column, datum in zip(columns, row_data))
         return itertools.zip_longest(*items, fillvalue='')
 
-    data_iter = iter(data)
-    line_iter = next_line_iter(next(data_iter))
-    while True:
-        try:
-            yield next(line_iter)
-        except StopIteration:
-            # This breaks out of the loop when data_iter next throws a StopIteration
-            line_iter = next_line_iter(next(data_iter))
+    return itertools.chain.from_iterable(next_line_iter(row_data) for row_data in data)
 
 
 class View(object):
@@ -223,44 +218,70 @@ class View(object):
             row_format.append('{:%s%d}' % (each.align, each.width))
         self._header = ' '.join(header)
         self._row_format = ' '.join(row_format)
+        self._format_row = uf.compile(self._row_format)
 
-    def print_view(self, store, args):
+    def get_page_key(self, store, cache_id):
+        """
+        Get the page key of the event with the cache_id.
+
+        @param store the Store object that holds the events
+        @param cache_id the id of the event printed by the last ls
+
+        @return the page key or None if the cache has no event of this view with the cache_id
+        """
+        event, _ = doto.model.get_cache_item(store, cache_id, self.event_type)
+        if event is None:
+            return None
+        return self.page_key(event)
+
+    def print_view(self, store, args, writer, after=None):
         """
         Print the view.
 
+        The events are formatted and written while they are read from the store.
+        Every event gets its cache id just before it is printed.
+
         @param store the Store object that holds the events
         @param args the arguments that define which events shall be selected
+        @param writer the LineWriter of the output
+        @param after the page key of the event after which the view starts
         """
-        events = self.get_events(store, args)
-        if len(events) > 0:
-            store.add_to_cache(events)
-            print(self._header)
-            self._print_rows(self.get_column_data(events))
-
-    def _print_row(self, event_data):
+        events = iter(self.get_events(store, args, after))
+        first = next(events, None)
+        if first is None:
+            return
+        writer.write_line(self._header)
+        cached_events = (store.cache_event(event) for event in itertools.chain((first,), events))
+        self._print_rows(writer, self.get_column_data(cached_events))
+
+    def _print_row(self, writer, event_data):
         """
         Print one row of the view.
 
         @param event_data the event that is displayed in that row
         """
-        print(uf.format(self._row_format, *event_data))
+        writer.write_line(self._format_row(*event_data))
 
-    def _print_rows(self, data_list):
+    def _print_rows(self, writer, data_list):
         """
         Print a list of event_data tuples.
 
         @param  data_list the events that will be printed in rows
         """
         for event_data in line_generator(self._columns, data_list):
-            self._print_row(event_data)
+            self._print_row(writer, event_data)
 
 
 class TaskOverview(View):
     """
     An Overview for the tasks.
     """
-    def __init__(self, config, width):
-        date_printer = doto.cli.printing.DatePrinter(config)
+    event_type = doto.model.task.Task
+    page_key = staticmethod(doto.model.task.page_key)
+
+    def __init__(self, config, width, date_printer=None):
+        if date_printer is None:
+            date_printer = doto.cli.printing.DatePrinter(config)
         columns = [CutColumn('I̲D̲', 4, '>'),
                    Column('D̲u̲e̲', date_printer.max_due_len, '>', date_printer.due_to_str),
                    Column(' ', 1, '^', doto.cli.printing.state_to_symbol),
@@ -283,25 +304,34 @@ class TaskOverview(View):
                  )
                 for tsk in tasks)
 
-    def get_events(self, store, args):
+    def get_events(self, store, args, after=None):
         """
         Get the Events form the store object.
 
         @param store the Store object
         @param args the arguments of the CLI
+        @param after the page key of the task after which the page starts
         """
-        if args.all:
-            return doto.model.task.get_open_tasks(store, limit=None)
+        if args.page_size is not None:
+            size = args.page_size
+        elif args.all:
+            size = None
         else:
-            return doto.model.task.get_open_tasks(store, limit=args.limit)
+            size = args.limit
+        return doto.model.task.iter_open_tasks_page(store, after=after, size=size)
 
 
 class ApmtOverview(View):
     """
     An Overview for the Appointments.
     """
-    def __init__(self, config, width):
-        date_printer = doto.cli.printing.DatePrinter(config)
+    event_type = doto.model.apmt.Appointment
+    page_key = staticmethod(doto.model.apmt.page_key)
+
+    def __init__(self, config, width, date_printer=None):
+        if date_printer is None:
+            date_printer = doto.cli.printing.DatePrinter(config)
+        self.__now = date_printer.now
         columns = [CutColumn('I̲D̲', 4, '>'),
                    Column('S̲t̲a̲r̲t̲s̲ ̲i̲n̲', date_printer.max_due_len, '^', date_printer.due_to_str),
                    Column(' ', 8, '<'),
@@ -322,17 +352,18 @@ class ApmtOverview(View):
                  )
                 for apmt in apmts)
 
-    def get_events(self, store, args):
+    def get_events(self, store, args, after=None):
         """
         Get the Events form the store object.
 
         @param store the Store object
         @param args the arguments of the CLI
+        @param after the page key of the appointment after which the page starts
         """
         if args.all:
-            apmts = doto.model.apmt.get_all(store, doto.model.now_with_tz())
+            apmts = doto.model.apmt.iter_all(store, self.__now, after=after, size=args.page_size)
         else:
-            apmts = doto.model.apmt.get_current(store, doto.model.now_with_tz(), APMT_LIMIT)
+            apmts = doto.model.apmt.iter_current(store, self.__now, APMT_LIMIT, after=after, size=args.page_size)
         return apmts
 
 
@@ -342,19 +373,24 @@ class EventOverview(object):
     """
     def __init__(self, config, width):
         self.__head_line_format = '{:^%d}' % width
-        self.__task_view = TaskOverview(config, width)
-        self.__apmt_view = ApmtOverview(config, width)
+        # both views share one DatePrinter, so they print the dates relative to the same now
+        date_printer = doto.cli.printing.DatePrinter(config)
+        self.__task_view = TaskOverview(config, width, date_printer)
+        self.__apmt_view = ApmtOverview(config, width, date_printer)
 
-    def print_view(self, store, args):
+    def print_view(self, store, args, writer, after=None):
         """
         Print the view.
 
+        The overview has no pages, so after must be None.
+
         @param store the Store object that holds the events
         @param args the arguments that define which events shall be selected
+        @param writer the LineWriter of the output
         """
-        self.__apmt_view.print_view(store, args)
-        print()
-        self.__task_view.print_view(store, args)
+        self.__apmt_view.print_view(store, args, writer)
+        writer.write_line('')
+        self.__task_view.print_view(store, args, writer)
 
 DEFAULT_VIEW = 'overview'
 
@@ -365,16 +401,6 @@ VIEWS = {DEFAULT_VIEW: EventOverview,
          }
 
 
-def init_parser(subparsers):
-    """Initialize the subparser of ls."""
-
-    parser = subparsers.add_parser(COMMAND, help='list tasks.')
-    parser.add_argument('view', type=str, default=DEFAULT_VIEW, nargs='?',
-                        choices=VIEWS.keys())
-    parser.add_argument('--all', action='store_true', help='list all tasks.')
-    parser.add_argument('--limit', type=int, help='show a maximum of N tasks.', default=20)
-
-
 def main(store, args, config, term):
     """
     List all open tasks.
@@ -389,6 +415,24 @@ def main(store, args, config, term):
         print('There is now view named "{}"\n\tMhh this should not happen.'.format(args.view))
         return 1
 
-    view.print_view(store, args)
+    after = None
+    if args.page_after is not None:
+        if args.view == DEFAULT_VIEW:
+            print('The overview has no pages, use "ls tasks" or "ls apmts" with --page-after.')
+            return 1
+        after = view.get_page_key(store, args.page_after)
+        if after is None:
+            print('There is no {} with the id {}.'.format(args.view[:-1], args.page_after))
+            return 1
+
+    writer = doto.cli.printing.LineWriter(sys.stdout)
+    try:
+        view.print_view(store, args, writer, after)
+        writer.flush()
+    except BrokenPipeError:
+        # The reader of the output is gone, like "head" after its lines.
+        # The rest of the output goes to devnull, so the exit does not fail on the flush of stdout.
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
     store.save()
     return 0
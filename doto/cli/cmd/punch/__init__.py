@@ -14,24 +14,7 @@ An example of its use would be
       You spend 4:32 hours on Task "Title of task"
 
 """
-import functools
-import doto.cli.sub_cmds
-import doto.cli.parser
-import doto.cli.printing
 
 
 COMMAND = "punch"
 CONF_DEF = {}
-sub_cmds = {}
-
-
-init_parser = functools.partial(doto.cli.sub_cmds.init_sub_cmd,
-                                command=COMMAND,
-                                module_name=__name__,
-                                help="The punch command")
-
-
-def main(store, args, config, term):
-    """The Main function of the command gets the subcommand and executes it."""
-    date_printer = doto.cli.printing.DatePrinter(config)
-    return sub_cmds[args.sub_cmd].main(store, args, config, term, date_printer=date_printer)
@@ -8,9 +8,9 @@ An example of its use would be
 
 
 """
+import doto.model
 import doto.model.timerecord
-import doto.cli.parser
-import doto.cli.cmd.task
+import doto.cli.printing
 
 
 COMMAND = "in"
@@ -26,14 +26,9 @@ def print_result(date_printer, choosen_record):
     print(message % (end_date_str))
 
 
-def init_parser(subparsers):
-    """Initalise the subparser for punch in"""
-    parser = subparsers.add_parser(COMMAND, help="Punch in for work")
-    doto.cli.cmd.task.init_task_flags(parser)
-
-
-def main(store, _args, _config, _env, date_printer=None):
+def main(store, _args, config, _env):
     """Crete a new timerecord and punch us in"""
+    date_printer = doto.cli.printing.DatePrinter(config)
     new_timerecord = doto.model.timerecord.Timerecord(start=doto.model.now_with_tz())
     doto.model.timerecord.add_new(store, new_timerecord)
     try:
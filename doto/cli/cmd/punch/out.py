@@ -7,10 +7,9 @@ An example of its use would be
       Punched out at 12:14 for Task "Title of task"
 
 """
+import doto.model
 import doto.model.timerecord
 import doto.cli.printing
-import doto.cli.parser
-import doto.cli.cmd.task
 import doto.cli.interactive
 
 
@@ -44,14 +43,9 @@ def handle_multiple_records(date_printer, records):
     return result, 0
 
 
-def init_parser(subparsers):
-    """Initalise the subparser for Add"""
-    parser = subparsers.add_parser(COMMAND, help="Add a new task to the task list")
-    doto.cli.cmd.task.init_task_flags(parser)
-
-
-def main(store, _args, _config, _term, date_printer=None):
+def main(store, _args, config, _term):
     """Crete a new timerecord and punch us in"""
+    date_printer = doto.cli.printing.DatePrinter(config)
     started_records = doto.model.timerecord.get_started_timerecords(store)
     records_len = len(started_records)
     index = 0
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+The command report sums up the worked time of the timerecords.
+
+The time is summed up per local day, week or month, or in total,
+and can be split by the tasks of the timerecords.
+
+An example of its use would be
+    $ doto punch report --period month --per-task
+      Period        Time  Records  Task
+      2016-03      12:30       14  Title of task
+      2016-03       3:15        4  -
+
+"""
+import pytz
+
+import doto.cli.parser
+import doto.model.timerecord
+
+
+COMMAND = "report"
+CONF_DEF = {}
+
+ROW_FORMAT = "{:<10} {:>10} {:>8}  {}"
+
+
+def hours_str(seconds):
+    """ Format seconds as hours and minutes, like 12:30. """
+    minutes = seconds // 60
+    return "{}:{:02d}".format(minutes // 60, minutes % 60)
+
+
+def parse_date(date_str):
+    """ Parse the date of an argument or return None if there is none. """
+    if date_str is None:
+        return None
+    return doto.cli.parser.date_parser(date_str)
+
+
+def main(store, args, config, _term):
+    """ Print the sum of the worked time of the timerecords. """
+    try:
+        since = parse_date(args.since)
+        until = parse_date(args.until)
+    except ValueError as excpt:
+        print("Mhh, looks like a date is wrong.\n\t(Error: %s)" % excpt)
+        return 5
+
+    rows = doto.model.timerecord.report(store, pytz.timezone(config.date.local_tz), period=args.period,
+                                        per_task=args.per_task, since=since, until=until)
+    print(ROW_FORMAT.format("Period", "Time", "Records", "Task" if args.per_task else "").rstrip())
+    for row in rows:
+        task = ""
+        if args.per_task:
+            task = "-" if row.task_id is None else row.title
+        print(ROW_FORMAT.format(row.period or "total", hours_str(row.seconds), row.records, task).rstrip())
+    return 0
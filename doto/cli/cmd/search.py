@@ -0,0 +1,84 @@
+"""
+The command search lists the tasks and appointments which contain the given words.
+
+The best match is listed first and the ids of the results can be used
+by the other commands like "task done" or "apmt show".
+
+An example of its use is
+    $ doto search milk
+"""
+import sqlite3
+import sys
+
+import doto.cli.cmd.ls
+import doto.cli.printing
+import doto.model.apmt
+import doto.model.search
+
+
+COMMAND = 'search'
+CONF_DEF = {}
+
+
+def event_date(event):
+    """ Get the due date of a task or the start of an appointment. """
+    if isinstance(event, doto.model.apmt.Appointment):
+        return event.schedule.start
+    return event.due
+
+
+def event_kind(event):
+    """ Get the name of the kind of the event. """
+    if isinstance(event, doto.model.apmt.Appointment):
+        return 'apmt'
+    return 'task'
+
+
+class SearchView(doto.cli.cmd.ls.View):
+    """
+    A View of the search results.
+    """
+    def __init__(self, config, width):
+        date_printer = doto.cli.printing.DatePrinter(config)
+        columns = [doto.cli.cmd.ls.CutColumn('I̲D̲', 4, '>'),
+                   doto.cli.cmd.ls.Column(' ', 4, '<', event_kind),
+                   doto.cli.cmd.ls.Column('D̲a̲t̲e̲', date_printer.max_due_len, '>', date_printer.due_to_str),
+                   doto.cli.cmd.ls.WrapColumn('T̲i̲t̲l̲e̲', 10, '<', expand=1)
+                   ]
+        doto.cli.cmd.ls.View.__init__(self, width, columns)
+
+    def get_column_data(self, events):
+        """
+        Get the data for that row from the event.
+
+        @event the event
+        """
+        return ((event.cache_id,
+                 event,
+                 event_date(event),
+                 event.title
+                 )
+                for event in events)
+
+    def get_events(self, store, args, after=None):
+        """
+        Get the results of the search.
+
+        @param store the Store object
+        @param args the arguments of the CLI
+        """
+        return doto.model.search.search(store, args.terms, limit=args.limit)
+
+
+def main(store, args, config, term):
+    """ Search the events and print the results. """
+    view = SearchView(config, term.columns if term.columns else 80)
+    writer = doto.cli.printing.LineWriter(sys.stdout)
+    try:
+        view.print_view(store, args, writer)
+    except sqlite3.OperationalError as excpt:
+        print("It was not possible to search the store, try \"doto db rebuild\".\n\t(Error: %s)" % excpt)
+        return 4
+    writer.flush()
+    store.save()
+    return 0
@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+"""
+The command "serve" starts the doto server.
+
+While the server is running every other doto command is sent to it
+and executed with its open store.
+
+An example of its use would be
+    $ doto serve &
+    $ doto ls
+
+"""
+import doto.cli.server
+import doto.defaultconfig
+
+
+COMMAND = "serve"
+CONF_DEF = {}
+
+
+def main(store, _args, config, _term):
+    """ Run the server until it is interrupted. """
+    if not doto.cli.server.serve(config.path.socket, store, config, doto.defaultconfig.config_file()):
+        print("There is already a doto server listening on %s" % config.path.socket)
+        return 1
+    return 0
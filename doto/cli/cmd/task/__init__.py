@@ -6,8 +6,6 @@ An example of its use would be
     $ doto add "Document the Add command" "Add still has no doc strings" --difficulty 1
 
 """
-import functools
-import doto.cli.sub_cmds
 import doto.cli.parser
 import doto.model
 import doto.model.task
@@ -15,16 +13,6 @@ import doto.model.task
 
 COMMAND = "task"
 CONF_DEF = {}
-sub_cmds = {}
-
-
-init_parser = functools.partial(doto.cli.sub_cmds.init_sub_cmd,
-                                command=COMMAND,
-                                module_name=__name__,
-                                help="The task command")
-
-
-main = doto.cli.sub_cmds.main(sub_cmds)
 
 
 def get_cached_task(store, cache_id):
@@ -47,12 +35,3 @@ def get_cached_task(store, cache_id):
         return None, 2
 
     return cache_item, 0
-
-
-def init_task_flags(parser):
-    """
-    Set the Flags for creating or modifing a task
-    """
-    parser.add_argument("--difficulty", type=int, choices=doto.model.task.DIFFICULTY.keys, help="the estimated difficulty of the task.")
-    parser.add_argument("--due", type=str, help="the estimated completion date.")
-    parser.add_argument("--repeat", type=str, help="repeat pattern of the task")
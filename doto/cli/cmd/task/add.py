@@ -7,7 +7,6 @@ An example of its use would be
 
 """
 import doto.model.task
-import doto.model.repeat
 import doto.cli.parser
 import doto.cli.cmd.task
 
@@ -16,27 +15,19 @@ COMMAND = "add"
 CONF_DEF = {}
 
 
-def init_parser(subparsers):
-    """Initalise the subparser for Add"""
-    parser = subparsers.add_parser(COMMAND, help="Add a new task to the task list")
-    parser.add_argument("title", type=str, help="The title of the new task")
-    parser.add_argument("description", type=str, help="The description of the new task")
-    doto.cli.cmd.task.init_task_flags(parser)
-
-
 def main(store, args, _config, _env):
     """Add a new task with the given args"""
     tsk = doto.model.task.Task(args.title, args.description)
     if args.due is not None:
         tsk.due = doto.cli.parser.date_parser(args.due)
-        if args.repeat is not None:
-            tsk.repeat = doto.model.repeat.parse(args.repeat, tsk.due, tsk.id)
-            doto.model.repeat.add_new(store, tsk.repeat)
 
     if args.difficulty is not None:
         tsk.difficulty = args.difficulty
     try:
-        doto.model.task.add_new(store, tsk)
+        if tsk.due is not None and args.repeat is not None:
+            doto.model.task.add_repeated(store, tsk, args.repeat)
+        else:
+            doto.model.task.add_new(store, tsk)
         store.save()
     except:
         print("It was not possible to save the new task. What are you doing Dave!")
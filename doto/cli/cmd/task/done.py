@@ -14,16 +14,6 @@ COMMAND = "done"
 CONF_DEF = {}
 
 
-def init_parser(subparsers):
-    """
-    Init the parser
-
-    It adds the id argument to the argument parser
-    """
-    parser = subparsers.add_parser(COMMAND, help="")
-    parser.add_argument("id", type=int, help="the id of the task which should be finished.")
-
-
 def main(store, args, *_):
     """ The Main method of done."""
     tsk, error = doto.cli.cmd.task.get_cached_task(store, args.id)
@@ -33,9 +23,11 @@ def main(store, args, *_):
         print(("The task with the Id: " + doto.cli.util.ID_FORMAT + "was already finished!") % (args.id, tsk.id))
         return 5
     try:
-        doto.model.task.update(store, tsk)
-        if tsk.due is not None and tsk.repeat is not None:
-            doto.model.task.create_repeat(store, tsk)
+        # the finished task and its next repetition are committed together
+        with store.transaction():
+            doto.model.task.update(store, tsk)
+            if tsk.due is not None and tsk.repeat is not None:
+                doto.model.task.create_repeat(store, tsk)
         store.save()
     except:
         print(("It was not possible to finish the task with id " + doto.cli.util.ID_FORMAT + ":\n\t %r") % (args.id, tsk.id))
@@ -17,19 +17,6 @@ CONF_DEF = {}
 RESET = "RESET"
 
 
-def init_parser(subparsers):
-    """
-    Init the parser
-
-    It adds the id argument to the argument parser
-    """
-    parser = subparsers.add_parser(COMMAND, help="")
-    parser.add_argument("id", type=int, help="The id of the task which should be modified.")
-    parser.add_argument("--title", type=str, help="Change the title of the task")
-    parser.add_argument("--description", type=str, help="Change the description of the task")
-    doto.cli.cmd.task.init_task_flags(parser)
-
-
 def set_or_reset(value, fnc=lambda x: x):
     """
     Check if a value is should be set or reset
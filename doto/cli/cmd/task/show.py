@@ -13,12 +13,6 @@ COMMAND = "show"
 CONF_DEF = {}
 
 
-def init_parser(subparsers):
-    """ Initialize the subparser. """
-    parser = subparsers.add_parser(COMMAND, help="delete a task from the list.")
-    parser.add_argument("id", type=int, help="the id of the task which should be deleted.")
-
-
 class TaskPrinter(object):
     def __init__(self, config):
         self.__date_printer = doto.cli.printing.DatePrinter(config)
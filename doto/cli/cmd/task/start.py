@@ -6,18 +6,15 @@ An example of its use would be
     $ doto done id
 
 """
-import doto.cli
+import doto.cli.util
+import doto.cli.cmd.task
+import doto.model.task
 
 
 COMMAND = "start"
 CONF_DEF = {}
 
 
-def init_parser(subparsers):
-    """ Init the arg parser. """
-    doto.cli.parser.init_id_flag(COMMAND, subparsers)
-
-
 def main(store, args, *_):
     """ The Main method of start."""
     tsk, error = doto.cli.cmd.task.get_cached_task(store, args.id)
@@ -0,0 +1,128 @@
+"""
+The manifest of all CLI commands.
+
+The manifest holds the name, the help string and the arguments of every command
+in cli.cmd. The argument parser is built from the manifest alone,
+so only the module of the selected command has to be imported.
+
+A Command is a leaf command with the name of the module that implements it.
+A Group holds the sub commands of a command like "task" or "apmt".
+"""
+import collections
+
+
+Command = collections.namedtuple('Command', ['name', 'module', 'help', 'arguments'])
+Group = collections.namedtuple('Group', ['name', 'help', 'commands'])
+Argument = collections.namedtuple('Argument', ['names', 'options'])
+
+
+def arg(*names, **options):
+    """ Create an Argument with the parameters of ArgumentParser.add_argument. """
+    return Argument(names, options)
+
+
+# The keys of doto.model.task.DIFFICULTY
+DIFFICULTIES = [0, 1, 2, 3, 4]
+
+# The keys of doto.cli.cmd.ls.VIEWS
+LS_VIEWS = ['overview', 'tasks', 'apmts']
+
+# The keys of doto.model.timerecord.REPORT_PERIODS
+REPORT_PERIODS = ['day', 'week', 'month', 'total']
+
+TASK_FLAGS = (arg("--difficulty", type=int, choices=DIFFICULTIES, help="the estimated difficulty of the task."),
+              arg("--due", type=str, help="the estimated completion date."),
+              arg("--repeat", type=str, help="repeat pattern of the task"),
+              )
+
+APMT_FLAGS = (arg("--description", type=str, help="The description of the new appointment"),
+              arg("--end", type=str, help="The date when the new appointment will end"),
+              arg("--repeat", type=str, help="The repeat interval of the appointment."),
+              )
+
+
+COMMANDS = (
+    Command('ls', 'doto.cli.cmd.ls', 'list tasks.',
+            (arg('view', type=str, default=LS_VIEWS[0], nargs='?', choices=LS_VIEWS),
+             arg('--all', action='store_true', help='list all tasks.'),
+             arg('--limit', type=int, help='show a maximum of N tasks.', default=20),
+             arg('--page-after', type=int, metavar='ID',
+                 help='show the page after the task or appointment with this id of the last ls tasks or ls apmts.'),
+             arg('--page-size', type=int, metavar='N', help='show a maximum of N events per page.'),
+             )),
+    Group('task', "The task command",
+          (Command('add', 'doto.cli.cmd.task.add', "Add a new task to the task list",
+                   (arg("title", type=str, help="The title of the new task"),
+                    arg("description", type=str, help="The description of the new task"),
+                    ) + TASK_FLAGS),
+           Command('del', 'doto.cli.cmd.task.delete', "delete a task from the list.",
+                   (arg("id", type=int, help="the id of the task which should be deleted."),)),
+           Command('done', 'doto.cli.cmd.task.done', "",
+                   (arg("id", type=int, help="the id of the task which should be finished."),)),
+           Command('modify', 'doto.cli.cmd.task.modify', "",
+                   (arg("id", type=int, help="The id of the task which should be modified."),
+                    arg("--title", type=str, help="Change the title of the task"),
+                    arg("--description", type=str, help="Change the description of the task"),
+                    ) + TASK_FLAGS),
+           Command('reset', 'doto.cli.cmd.task.reset', "",
+                   (arg("id", type=int, help="the id of the task which should be finished."),)),
+           Command('show', 'doto.cli.cmd.task.show', "delete a task from the list.",
+                   (arg("id", type=int, help="the id of the task which should be deleted."),)),
+           Command('start', 'doto.cli.cmd.task.start', "",
+                   (arg("id", type=int, help="the id of the task which should be finished."),)),
+           )),
+    Group('apmt', "The appointment command",
+          (Command('add', 'doto.cli.cmd.apmt.add', "Add a new appointment.",
+                   (arg("title", type=str, help="The title of the new appointment"),
+                    arg("start", type=str, help="The date when the new appointment will start"),
+                    ) + APMT_FLAGS),
+           Command('del', 'doto.cli.cmd.apmt.delete', "delete a appointment from the list.",
+                   (arg("id", type=int, help="the id of the appointment which should be deleted."),)),
+           Command('modify', 'doto.cli.cmd.apmt.modify', "",
+                   (arg("id", type=int, nargs='?', default=-1, help="The id of the appointment which should be modified."),
+                    arg("--title", type=str, help="The title of the new appointment"),
+                    arg("--start", type=str, help="The date when the new appointment will start"),
+                    ) + APMT_FLAGS),
+           Command('show', 'doto.cli.cmd.apmt.show', "delete a task from the list.",
+                   (arg("id", type=int, nargs='?', default=-1, help="the id of the task which should be deleted."),)),
+           )),
+    Group('punch', "The punch command",
+          (Command('in', 'doto.cli.cmd.punch.in', "Punch in for work", TASK_FLAGS),
+           Command('out', 'doto.cli.cmd.punch.out', "Add a new task to the task list", TASK_FLAGS),
+           Command('report', 'doto.cli.cmd.punch.report', "sum up the worked time per period and task.",
+                   (arg('--period', type=str, default=REPORT_PERIODS[1], choices=REPORT_PERIODS,
+                        help='sum up the time per local day, week or month or in total.'),
+                    arg('--per-task', action='store_true', help='split the time of every period by the tasks.'),
+                    arg('--since', type=str, help='only the timerecords which started at or after this date.'),
+                    arg('--until', type=str, help='only the timerecords which started before this date.'),
+                    )),
+           )),
+    Command('search', 'doto.cli.cmd.search', "search the tasks and appointments.",
+            (arg('terms', type=str, nargs='+', help='the words which the title or description must contain.'),
+             arg('--limit', type=int, help='show a maximum of N results.', default=20),
+             )),
+    Command('serve', 'doto.cli.cmd.serve', "keep the store open and execute the commands of other doto processes.", ()),
+    Group('db', "The store maintenance command",
+          (Command('analyze', 'doto.cli.cmd.db.analyze', "update the statistics of the store and show the query plans.",
+                   ()),
+           Command('rebuild', 'doto.cli.cmd.db.rebuild', "rebuild the search index of the tasks and appointments.",
+                   ()),
+           )),
+)
+
+# The commands which are never sent to the doto server
+LOCAL_COMMANDS = ('serve',)
+
+
+def leaf_commands(commands=COMMANDS, path=()):
+    """
+    Iterate over all leaf commands of the manifest.
+
+    @return an iterator of (path, Command) tuples where path is the tuple of the command names
+    """
+    for entry in commands:
+        entry_path = path + (entry.name,)
+        if isinstance(entry, Group):
+            yield from leaf_commands(entry.commands, entry_path)
+        else:
+            yield entry_path, entry
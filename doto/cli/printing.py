@@ -4,8 +4,13 @@ A Collection of functions to display tasks and other data.
 """
 
 import datetime
+import functools
 import itertools
+import json
+import locale
 import math
+import os
+import re
 import string
 
 import doto.model.task
@@ -117,16 +122,109 @@ def max_date_len(date_to_str):
     return max([date_len(datetime.datetime(2012, max_month, day, 12, 12, tzinfo=pytz.utc)) for day in range(10, 17)])
 
 
+DATE_WIDTH_FILE = "date_widths"
+
+# the widths which were already read or computed by this process
+_date_widths = {}
+
+
+def date_width_file(config):
+    """ Get the name of the date width cache, which lies next to the event cache. """
+    return os.path.join(os.path.dirname(config.path.cache), DATE_WIDTH_FILE)
+
+
+def _read_date_widths(filename):
+    try:
+        with open(filename) as width_file:
+            return {tuple(key): width for key, width in json.load(width_file)}
+    except (OSError, ValueError, TypeError):
+        return {}
+
+
+def _write_date_widths(filename, widths):
+    tmp_filename = filename + '.tmp'
+    try:
+        with open(tmp_filename, 'w') as width_file:
+            json.dump([[list(key), width] for key, width in widths.items()], width_file)
+        os.replace(tmp_filename, filename)
+    except OSError:
+        # without the file the widths are only computed again
+        pass
+
+
+def cached_max_date_len(filename, date_format, tz_name, date_to_str):
+    """
+    Get the maximal length of a date formatted by date_to_str.
+
+    The length only changes with the format, the locale and the timezone,
+    so it is stored in the file under these three and computed with
+    max_date_len only if one of them changed.
+
+    @param filename the name of the date width cache
+    @param date_format the format string used by date_to_str
+    @param tz_name the name of the timezone used by date_to_str
+    @param date_to_str the function which formats the dates
+
+    @return the maximal length
+    """
+    key = (date_format, locale.setlocale(locale.LC_TIME), tz_name)
+    try:
+        return _date_widths[key]
+    except KeyError:
+        pass
+    widths = _read_date_widths(filename)
+    if key not in widths:
+        widths[key] = max_date_len(date_to_str)
+        _write_date_widths(filename, widths)
+    _date_widths.update(widths)
+    return widths[key]
+
+
+# strftime directives which do not change during a day
+DAY_DIRECTIVES = frozenset('aAwdbBmyYjUWGuVx%')
+
+
+def is_day_format(date_format):
+    """
+    Check if a strftime format only prints the day of a date and not its time.
+
+    @param date_format the format string
+
+    @return True if two dates of the same day always give the same string
+    """
+    directives = re.findall('%[-#]?(.)', date_format)
+    return all(directive in DAY_DIRECTIVES for directive in directives)
+
+
 class DatePrinter(object):
-    def __init__(self, config):
+    """
+    DatePrinter turns dates into strings in the local timezone of the config.
+
+    The timezone is looked up once and the time spans of due_to_str are all
+    measured from the same point in time, which is taken when the DatePrinter
+    is created, so all rows of a view are printed relative to the same now.
+
+    @param config the config with the date section
+    @param now the point in time the due dates are compared to, now_with_tz() if it is None
+    """
+    def __init__(self, config, now=None):
         self.__config = config
+        self.__local_tz = pytz.timezone(config.date.local_tz)
+        self.__now = doto.model.now_with_tz() if now is None else now
+        self.__short_out_str = config.date.short_out_str
+        self.__day_strings = {} if is_day_format(self.__short_out_str) else None
+
+        self.__max_date_len = self.date_width(self.__short_out_str, self.short_date_string)
 
-        self.__max_date_len = max_date_len(self.short_date_string)
+    @property
+    def now(self):
+        """ Get the point in time the due dates are compared to. """
+        return self.__now
 
     def due_to_str(self, due_date, default=""):
         if due_date is None:
             return default
-        t_delta = due_date - doto.model.now_with_tz()
+        t_delta = due_date - self.__now
         if t_delta < ZERO_DELTA:
             # the time span is negative so the time is over due
             return "over due"
@@ -138,12 +236,20 @@ class DatePrinter(object):
         return self.date_to_str(due_date)
 
     def to_local(self, date_obj):
-        local_tz = pytz.timezone(self.__config.date.local_tz)
-        return date_obj.astimezone(local_tz)
+        return date_obj.astimezone(self.__local_tz)
 
     def short_date_string(self, date):
         local_date = self.to_local(date)
-        return '{:{fmt}}'.format(local_date, fmt=self.__config.date.short_out_str)
+        if self.__day_strings is None:
+            return '{:{fmt}}'.format(local_date, fmt=self.__short_out_str)
+        # the format only depends on the day, so every day is formatted once
+        day = local_date.date()
+        try:
+            return self.__day_strings[day]
+        except KeyError:
+            date_str = '{:{fmt}}'.format(local_date, fmt=self.__short_out_str)
+            self.__day_strings[day] = date_str
+            return date_str
 
     def full_date_string(self, date):
         local_date = self.to_local(date)
@@ -162,6 +268,74 @@ class DatePrinter(object):
     def max_date_len(self):
         return self.__max_date_len
 
+    @property
+    def max_full_date_len(self):
+        return self.date_width(self.__config.date.full_out_str, self.full_date_string)
+
+    def date_width(self, date_format, date_to_str):
+        """
+        Get the maximal length of the dates printed by date_to_str with date_format.
+
+        @param date_format the format string used by date_to_str
+        @param date_to_str a method of this DatePrinter, like short_date_string
+
+        @return the maximal length
+        """
+        return cached_max_date_len(date_width_file(self.__config), date_format, self.__config.date.local_tz, date_to_str)
+
+
+PRINTABLE_ASCII = re.compile(r'[ -~]*\Z')
+
+
+@functools.lru_cache(maxsize=1024)
+def _wcswidth(value):
+    return wcwidth.wcswidth(value)
+
+
+def display_width(value):
+    """
+    Get the number of columns a string occupies on the terminal.
+
+    Printable ASCII strings take one column per character, so wcwidth is only
+    asked for all other strings. Its results are cached, since the same
+    symbols are printed in every row.
+
+    @param value the string
+
+    @return the width of the string or -1 if it contains a non printable character
+    """
+    if PRINTABLE_ASCII.match(value):
+        return len(value)
+    return _wcswidth(value)
+
+
+def pad(value, print_length, fill, align, width, format_spec):
+    """
+    Pad a formatted string to the width by its printed length.
+
+    @param value the string
+    @param print_length the display width of the string
+    @param fill, align, width, format_spec the parts of the format spec returned by UnicodeFormatter.parse_align
+
+    @return the padded string
+    """
+    if width == 0:
+        return value
+    formatted_value = format(value, format_spec)
+    pad_len = width - print_length
+    if pad_len <= 0:
+        return formatted_value
+    left_pad = ''
+    right_pad = ''
+    if align in '<=':
+        right_pad = fill * pad_len
+    elif align == '>':
+        left_pad = fill * pad_len
+    elif align == '^':
+        left_pad = fill * math.floor(pad_len/2)
+        right_pad = fill * math.ceil(pad_len/2)
+    return ''.join((left_pad, formatted_value, right_pad))
+
 
 class UnicodeFormatter(string.Formatter):
     def format_field(self, value, format_spec):
@@ -172,27 +346,67 @@ class UnicodeFormatter(string.Formatter):
             # If `format_spec` is empty we just return the `value` string
             return value
 
-        print_length = wcwidth.wcswidth(value)
+        print_length = display_width(value)
         if len(value) == print_length:
             return format(value, format_spec)
 
-        fill, align, width, format_spec = UnicodeFormatter.parse_align(format_spec)
-        if width == 0:
-            return value
-        formatted_value = format(value, format_spec)
-        pad_len = width - print_length
-        if pad_len <= 0:
-            return formatted_value
-        left_pad = ''
-        right_pad = ''
-        if align in '<=':
-            right_pad = fill * pad_len
-        elif align == '>':
-            left_pad = fill * pad_len
-        elif align == '^':
-            left_pad = fill * math.floor(pad_len/2)
-            right_pad = fill * math.ceil(pad_len/2)
-        return ''.join((left_pad, formatted_value, right_pad))
+        return pad(value, print_length, *UnicodeFormatter.parse_align(format_spec))
+
+    def compile(self, format_string):
+        """
+        Compile a format string with positional fields into a row formatter.
+
+        The format string is parsed once and the format spec of every field
+        is split into fill, align and width in advance,
+        so a row formatter can be called for many rows of a view.
+
+        @param format_string a format string like '{:>4} {:<10}'
+
+        @return a function which takes the values of the fields and returns the formatted string
+        """
+        literals = []
+        fields = []
+        auto_index = 0
+        # the literal text before the next field, an escaped brace is a chunk of its own
+        pending = ''
+        for literal_text, field_name, format_spec, conversion in self.parse(format_string):
+            pending += literal_text
+            if field_name is None:
+                continue
+            literals.append(pending)
+            pending = ''
+            if conversion is not None or '{' in format_spec or (field_name and not field_name.isdigit()):
+                raise ValueError("Only positional fields without conversion can be compiled")
+            if field_name:
+                index = int(field_name)
+            else:
+                index = auto_index
+                auto_index += 1
+            try:
+                align = UnicodeFormatter.parse_align(format_spec) if format_spec else None
+            except (ValueError, IndexError):
+                # a format spec for numbers, which is left to format_field
+                align = None
+            fields.append((index, format_spec, align))
+        tail = pending
+        format_field = self.format_field
+
+        def format_row(*values):
+            parts = []
+            for literal, (index, format_spec, align) in zip(literals, fields):
+                parts.append(literal)
+                value = values[index]
+                if align is None or not isinstance(value, str):
+                    parts.append(format_field(value, format_spec))
+                    continue
+                print_length = display_width(value)
+                if len(value) == print_length:
+                    parts.append(format(value, format_spec))
+                else:
+                    parts.append(pad(value, print_length, *align))
+            parts.append(tail)
+            return ''.join(parts)
+        return format_row
 
     @staticmethod
     def parse_align(format_spec):
@@ -227,3 +441,34 @@ class UnicodeFormatter(string.Formatter):
         else:
             width = 0
         return fill, align, width, format_spec
+
+
+class LineWriter(object):
+    """
+    LineWriter collects lines of text and writes them to a stream in chunks.
+
+    So a long view does not call the write method of the stream once per line.
+    The stream is flushed after every chunk, so a reader like "head" gets the
+    first lines before the whole view is formatted.
+
+    @param stream the stream the lines are written to
+    @param chunk_lines the number of lines which are written at once
+    """
+    def __init__(self, stream, chunk_lines=256):
+        self.__stream = stream
+        self.__chunk_lines = chunk_lines
+        self.__lines = []
+
+    def write_line(self, line):
+        """ Add a line and write the chunk if it is full. """
+        self.__lines.append(line)
+        if len(self.__lines) >= self.__chunk_lines:
+            self.flush()
+
+    def flush(self):
+        """ Write all collected lines to the stream. """
+        if self.__lines:
+            self.__lines.append('')
+            self.__stream.write('\n'.join(self.__lines))
+            self.__lines = []
+        self.__stream.flush()
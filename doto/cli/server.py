@@ -0,0 +1,205 @@
+"""
+The doto server keeps the store and all commands loaded between commands.
+
+The server listens on a Unix domain socket and executes the command line
+arguments it gets from doto.cli.client one after another with the same open
+store. The output of the command is captured and sent back to the client.
+
+After every command the store is reset, so the server sees the changes of
+doto processes which ran without the server.
+
+The server only executes the commands of clients with the same config file and store.
+If the config file was changed the server reads it again before the next command,
+but if the new config changes the store the commands fall back to the clients
+until the server is restarted.
+"""
+import contextlib
+import importlib
+import io
+import json
+import os
+import socket
+import socketserver
+import sys
+import traceback
+
+import doto
+import doto.cli.manifest
+import doto.cli.parser
+import doto.defaultconfig
+
+
+class TerminalRequired(Exception):
+    """ The command tried to read from the terminal, which the server does not have. """
+
+
+class NoStdin(object):
+    """ A replacement for sys.stdin which raises TerminalRequired on every read. """
+
+    def read(self, *_):
+        raise TerminalRequired()
+
+    readline = read
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    """ Read one request from the client and write the response. """
+
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            # a client which only checked if the server is running
+            return
+        message = json.loads(line.decode('utf-8'))
+        response = self.server.run(message)
+        self.wfile.write(json.dumps(response).encode('utf-8') + b'\n')
+
+
+class Server(socketserver.UnixStreamServer):
+    """
+    The Server executes the commands of its clients with a warm store.
+
+    @param socket_path the path of the Unix domain socket
+    @param store the open store
+    @param config the config object
+    @param config_file the path of the file the config was read from
+    """
+
+    def __init__(self, socket_path, store, config, config_file):
+        self.store = store
+        self.config = config
+        self.config_file = os.path.realpath(config_file)
+        self.config_mtime = _mtime(self.config_file)
+        self.store_settings = _store_settings(config)
+        super().__init__(socket_path, RequestHandler)
+
+    def check_config(self, config_file, store_file):
+        """
+        Check if the server can execute the commands of a client with this config file and store.
+
+        If the config file was changed since it was read, it is read again.
+
+        @param config_file the real path of the config file of the client
+        @param store_file the real path of the store of the client
+
+        @return True if the client uses the config file and the store of the server
+        """
+        if config_file != self.config_file:
+            return False
+        mtime = _mtime(config_file)
+        if mtime != self.config_mtime:
+            config = doto.defaultconfig.read_config(config_file)
+            if _store_settings(config) != self.store_settings:
+                return False
+            self.config = config
+            self.config_mtime = mtime
+            doto.cli.parser.set_date_parser(config.date.local_tz, config.date.cli_input_str)
+        return store_file == self.store_settings[0]
+
+    def run(self, message):
+        """
+        Execute the command line arguments of the message.
+
+        @return the response for the client
+        """
+        if not self.check_config(message.get('config'), message.get('store')):
+            return {'fallback': True}
+        term = os.terminal_size((message['columns'], message['lines']))
+        stdout = io.StringIO()
+        stderr = io.StringIO()
+        try:
+            with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr), _replace_stdin():
+                exit_code = self.execute(message['argv'], term)
+        except TerminalRequired:
+            return {'fallback': True}
+        finally:
+            self.store.reset()
+        return {'exit_code': exit_code, 'stdout': stdout.getvalue(), 'stderr': stderr.getvalue()}
+
+    def execute(self, argv, term):
+        """
+        Parse argv and execute the command with the store of the server.
+
+        @return the exit code of the command
+        """
+        try:
+            args, cmd = doto.parse_command(argv)
+        except SystemExit as parser_exit:
+            # argparse exits after printing the help or an error
+            return parser_exit.code if isinstance(parser_exit.code, int) else 0
+        if cmd is None:
+            return -1
+        try:
+            return doto.run_command(cmd, self.store, args, self.config, term)
+        except TerminalRequired:
+            raise
+        except Exception:
+            traceback.print_exc()
+            return 1
+
+
+def _mtime(filename):
+    """ Get the modification time of the file or None if it does not exist. """
+    try:
+        return os.stat(filename).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _store_settings(config):
+    """ Get the settings of the config with which the store of the server was opened. """
+    return (os.path.realpath(config.path.store), os.path.realpath(config.path.cache),
+            os.path.realpath(config.path.last), sorted(config.store))
+
+
+@contextlib.contextmanager
+def _replace_stdin():
+    """ Replace sys.stdin with NoStdin for the duration of the context. """
+    stdin = sys.stdin
+    sys.stdin = NoStdin()
+    try:
+        yield
+    finally:
+        sys.stdin = stdin
+
+
+def import_commands():
+    """ Import the modules of all commands, so no command is imported during a request. """
+    for _, command in doto.cli.manifest.leaf_commands():
+        importlib.import_module(command.module)
+
+
+def is_running(socket_path):
+    """ Check if a server is listening on the socket. """
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    with sock:
+        try:
+            sock.connect(socket_path)
+        except OSError:
+            return False
+    return True
+
+
+def serve(socket_path, store, config, config_file):
+    """
+    Run the server until it is interrupted.
+
+    @param config_file the path of the file the config was read from
+
+    @return False if there is already a server running on the socket
+    """
+    if is_running(socket_path):
+        return False
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(socket_path)
+
+    import_commands()
+    server = Server(socket_path, store, config, config_file)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.remove(socket_path)
+    return True
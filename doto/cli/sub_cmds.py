@@ -1,47 +1,43 @@
-import importlib
-import pkgutil
-import sys
+"""
+Build the argument parser from the command manifest and load the selected command.
 
+The parser is built without importing any command module.
+Every leaf command stores the name of its module in the default "module",
+so after parsing only this module is imported.
+"""
+import importlib
 
-def import_commands(module):
-    """Import all commands dynamicylly from cli.cmd."""
-    commands = {}
-    path = module.__path__
-    name = module.__name__
-    for _, modname, _ in pkgutil.iter_modules(path, name + "."):
-        module = importlib.import_module(modname)
-        commands[module.COMMAND] = module
-    return commands
+import doto.cli.manifest
 
 
-def init_sub_cmd(subparser, command, module_name, help):
+def init_parsers(subparsers, commands):
     """
-    Initialize the enviroment.
+    Add the parsers of all commands to subparsers.
 
-    This includes
-        - the parser and subpurser,
-        - and the enviroment variables.
-
-    @param commands the modules of the cli commands
+    @param subparsers the object returned by ArgumentParser.add_subparsers
+    @param commands a tuple of doto.cli.manifest.Command and doto.cli.manifest.Group entries
 
     """
-    parser = subparser.add_parser(command, help=help)
-    module = sys.modules[module_name]
-    commands = import_commands(module)
-    subparsers = parser.add_subparsers(help="command", dest="sub_cmd")
-    for cmd in commands.values():
-        cmd.init_parser(subparsers)
-    module.sub_cmds.update(commands)
-
-
-def main(sub_cmds):
-    """Add a new task with the given arguments."""
-
-    def exec_cmd(store, args, config, term):
-        """ Closure with the subcommand execution"""
-        if args.sub_cmd is None:
-            pass
+    for entry in commands:
+        parser = subparsers.add_parser(entry.name, help=entry.help)
+        if isinstance(entry, doto.cli.manifest.Group):
+            sub_subparsers = parser.add_subparsers(help="command", dest="sub_cmd")
+            init_parsers(sub_subparsers, entry.commands)
+            continue
+        for argument in entry.arguments:
+            parser.add_argument(*argument.names, **argument.options)
+        parser.set_defaults(module=entry.module)
+
+
+def load_command(args):
+    """
+    Import the module of the command selected in args.
 
-        return sub_cmds[args.sub_cmd].main(store, args, config, term)
+    @param args the parsed arguments
 
-    return exec_cmd
+    @return the module of the command or None if no leaf command was selected
+    """
+    module_name = getattr(args, 'module', None)
+    if module_name is None:
+        return None
+    return importlib.import_module(module_name)
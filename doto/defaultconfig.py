@@ -13,19 +13,41 @@ CONF_DEF = {"path": {"user": USER_PATH,
                      "store": os.path.join(USER_PATH, "store.db"),
                      "cache": os.path.join(USER_PATH, "cache"),
                      "last": os.path.join(USER_PATH, "last"),
+                     "socket": os.path.join(USER_PATH, "socket"),
                      },
             "date": {"short_out_str": "%d. %b. %Y",
                      "full_out_str": "%d.%m.%Y-%H:%M",
                      "cli_input_str": "%Y.%m.%d-%H:%M",
                      "local_tz": "Europe/Berlin"
-                     }
+                     },
+            # The size of the statement cache and the PRAGMAs of the sqlite connection,
+            # which are also the defaults of doto.model.Store.
+            # The model has less statements than the cache, so none of them is removed from it.
+            # With write-ahead logging a commit appends to the log instead of writing a journal,
+            # and readers do not block the writer.
+            "store": {"cached_statements": "256",
+                      "journal_mode": "wal",
+                      "synchronous": "normal",
+                      "cache_size": "-8000",
+                      "mmap_size": "67108864",
+                      "temp_store": "memory",
+                      },
             }
 
 
-def read_config():
+def config_file():
+    """ Get the path of the config file, which is $DOTO_CONFIG or CONFIG_FILE. """
+    return os.getenv("DOTO_CONFIG", CONFIG_FILE)
+
+
+def read_config(filename=None):
     """
     Read in the config with the default values.
 
+    @param filename the path of the config file. Default=config_file()
+
     @return the config object
     """
-    return doto.simpleconf.Config(os.getenv("DOTO_CONFIG", CONFIG_FILE), CONF_DEF)
+    if filename is None:
+        filename = config_file()
+    return doto.simpleconf.Config(filename, CONF_DEF)
@@ -1,37 +1,85 @@
 import collections
+import contextlib
 import datetime
-import pickle
-import sqlite3
 import importlib
+import mmap
+import os
+import re
+import sqlite3
+import struct
 
 import pytz
 
+import doto.defaultconfig
+import doto.model.identity
+import doto.model.mapper
+import doto.timings
 
+# The old text format of the TIMESTAMP columns.
+# Timestamps are stored as integer UTC seconds since the epoch
+# and DATETIME_FMT is only used to read stores which where not migrated.
 DATETIME_FMT = '%Y-%m-%d %H:%M:%S'
 
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=pytz.utc)
+ONE_SECOND = datetime.timedelta(seconds=1)
+
 
 def adapt_datetime(dt):
-    utc_dt = pytz.utc.normalize(dt)
-    return utc_dt.strftime(DATETIME_FMT).encode('utf-8')
+    """ Turn the datetime into integer UTC seconds since the epoch. """
+    return (dt - EPOCH) // ONE_SECOND
 
 
-def convert_datetime(str_dt):
-    stored_dt = datetime.datetime.strptime(str_dt.decode("utf-8"), DATETIME_FMT)
-    return pytz.utc.localize(stored_dt)
+def convert_datetime(stored_dt):
+    """ Turn the stored UTC seconds since the epoch into a datetime. """
+    try:
+        return EPOCH + datetime.timedelta(seconds=int(stored_dt))
+    except ValueError:
+        # The timestamp is still in the old text format
+        text_dt = datetime.datetime.strptime(stored_dt.decode("utf-8"), DATETIME_FMT)
+        return pytz.utc.localize(text_dt)
 
 
 sqlite3.register_adapter(datetime.datetime, adapt_datetime)
 sqlite3.register_converter('TIMESTAMP', convert_datetime)
 
 
-def setup_module(create_cmd, type_list):
-    Store.CREATE_CMDS.add(create_cmd)
+def setup_module(create_cmd, type_list, migrations=()):
+    """
+    Register the tables, types and migrations of a model module.
+
+    @param create_cmd the command which creates the tables of the module or None
+    @param type_list a list of (class, adapter, converter) tuples
+    @param migrations a list of (version, script) tuples.
+            The script is run by Store.create if the schema version
+            of the database is older than version.
+            The newest version must not be greater than SCHEMA_VERSION.
+    """
+    if create_cmd is not None and create_cmd not in Store.CREATE_CMDS:
+        Store.CREATE_CMDS.append(create_cmd)
+
+    for version, script in migrations:
+        Store.MIGRATIONS.setdefault(version, []).append(script)
 
     for cls, adapter, converter in type_list:
         sqlite3.register_adapter(cls, adapter)
         sqlite3.register_converter(cls.__name__, converter)
 
 
+def timestamp_migration(table, columns):
+    """
+    Create the migration script which turns the text timestamps of the
+    given columns into integer UTC seconds since the epoch.
+
+    @param table the name of the table
+    @param columns the names of the TIMESTAMP columns
+    """
+    set_fmt = """{0} = CASE WHEN typeof({0}) IN ('text', 'blob')
+                           THEN CAST(strftime('%s', CAST({0} AS TEXT)) AS INTEGER)
+                           ELSE {0}
+                      END"""
+    return 'UPDATE {} SET {};'.format(table, ', '.join(set_fmt.format(column) for column in columns))
+
+
 def now_with_tz():
     """
     Get the current time in UTC format.
@@ -43,54 +91,12 @@ def now_with_tz():
     return n - datetime.timedelta(microseconds=n.microsecond)
 
 
-def get_foreign_obj(store, id, module):
-    if id is None:
-        return None
-    return module.get(store, id)
-
-
-def unwrap_row(store, row, cls, arg_list, opt_list=None, foreign_keys=None):
-    if opt_list is None:
-        opt_list = ()
-    if foreign_keys is None:
-        foreign_keys = ()
-    args = {k: v for k, v in zip(row.keys(), row) if k in arg_list}
-
-    foreign_args = {key: get_foreign_obj(store, row[key], module) for key, module in foreign_keys}
-    args.update(foreign_args)
-    obj = cls(**args)
-
-    for opt in opt_list:
-        if opt in row.keys():
-            setattr(obj, opt, row[opt])
-    return obj
-
-
 def get_id(obj):
     if obj is None:
         return None
     return obj.id
 
 
-def unwrap_obj(obj, ignore_list=None, foreign_keys=None):
-    def member_gen(obj, ignore_list):
-        for name in dir(obj):
-            name_attr = getattr(obj, name)
-            if name.startswith('_') or name in ignore_list or callable(name_attr):
-                continue
-            if name in foreign_keys:
-                yield name, get_id(name_attr)
-            else:
-                yield name, name_attr
-
-    if ignore_list is None:
-        ignore_list = ()
-    if foreign_keys is None:
-        foreign_keys = ()
-
-    return dict(member_gen(obj, ignore_list))
-
-
 class TimeSpan(object):
     """
     TimeSpan is a class to represent a span of time with a start and an end.
@@ -101,6 +107,8 @@ class TimeSpan(object):
 
     """
 
+    __slots__ = ('_start', '_end')
+
     def __init__(self, start=None, end=None):
         """
         Create a TimeSpan object where the begin of the time span is `start`
@@ -208,8 +216,12 @@ class Event(object):
 
     It is the superclass of Task and Appointment.
 
+    The events have __slots__ instead of a __dict__, since a report can hold
+    the events and timerecords of years in memory.
     """
 
+    __slots__ = ('id', 'title', 'description', 'created', 'cache_id')
+
     def __init__(self, title, description, created=None):
         self.id = None
         self.title = title
@@ -226,7 +238,42 @@ class Event(object):
                 )
 
 
-CacheItem = collections.namedtuple('CacheItem', ['id', 'type', 'module'])
+CacheItem = collections.namedtuple('CacheItem', ['id', 'type', 'key'])
+
+# The cache file starts with a header of the magic bytes, the format version
+# and the number of records. It is followed by one fixed width record per
+# cache id with the type tag of the event, the id of its row and a key,
+# which tells objects with the same id apart and is 0 for most types.
+CACHE_MAGIC = b'DOTO'
+CACHE_VERSION = 2
+CACHE_HEADER = struct.Struct('<4sHI')
+CACHE_RECORD = struct.Struct('<cqq')
+
+# The registered cache types as tag: (class, get function, key function)
+CACHE_TYPES = {}
+CACHE_TAGS = {}
+
+
+def register_cache_type(tag, cls, get_fn, key_fn=None):
+    """
+    Register a class whose objects can be stored in the cache.
+
+    @param tag a single byte which identifies the class in the cache file
+    @param cls the class
+    @param get_fn the function get(store, id) which loads an object of the class,
+            or get(store, id, key) if the class has a key_fn
+    @param key_fn a function key(obj) which returns the integer key of an object,
+            if the id of an object is not enough to load it. Default=None
+    """
+    CACHE_TYPES[tag] = (cls, get_fn, key_fn)
+    CACHE_TAGS[cls] = tag
+
+
+def pack_cache_record(event):
+    """ Pack the type tag, the id and the key of the event into a cache record. """
+    tag = CACHE_TAGS[event.__class__]
+    _, _, key_fn = CACHE_TYPES[tag]
+    return CACHE_RECORD.pack(tag, event.id, 0 if key_fn is None else key_fn(event))
 
 
 def dump_cache(filename, events):
@@ -236,11 +283,55 @@ def dump_cache(filename, events):
     @param filename the name of the file
     @param events the events that will be stored in the cache.
     """
-    with open(filename, 'wb') as cache_file:
-        pickle.dump([CacheItem(event.id, event.__class__, event.__class__.__module__)
-                     for event in events],
-                    cache_file,
-                    protocol=pickle.HIGHEST_PROTOCOL)
+    dump_cache_records(filename, [pack_cache_record(event) for event in events])
+
+
+def dump_cache_records(filename, records):
+    """
+    Dump the packed cache records in the given file.
+
+    The file is written to a temporary file first and then moved in place,
+    so a reader always sees a complete cache file.
+
+    @param filename the name of the file
+    @param records a list of records packed by pack_cache_record
+    """
+    tmp_filename = filename + '.tmp'
+    with open(tmp_filename, 'wb') as cache_file:
+        cache_file.write(CACHE_HEADER.pack(CACHE_MAGIC, CACHE_VERSION, len(records)))
+        cache_file.write(b''.join(records))
+    os.replace(tmp_filename, filename)
+
+
+def _read_cache(filename, read_fn):
+    """
+    Map the cache file into memory and call read_fn(cache_map, count) with it.
+
+    @return the result of read_fn and False or None and True if the cache file could not be read.
+    """
+    try:
+        with open(filename, "rb") as cache_file:
+            with mmap.mmap(cache_file.fileno(), 0, access=mmap.ACCESS_READ) as cache_map:
+                magic, version, count = CACHE_HEADER.unpack_from(cache_map)
+                if magic != CACHE_MAGIC or version != CACHE_VERSION:
+                    return None, True
+                if len(cache_map) < CACHE_HEADER.size + count * CACHE_RECORD.size:
+                    return None, True
+                return read_fn(cache_map, count), False
+    except (IOError, ValueError, struct.error):
+        # ValueError is raised for an empty file and struct.error for a short header
+        return None, True
+
+
+def _to_cache_item(tag, row_id, key):
+    """
+    Create a CacheItem from a record.
+
+    The type is None if the model module of the tag was not imported,
+    because then the caller can not ask for an object of that type.
+    """
+    cls, _, _ = CACHE_TYPES.get(tag, (None, None, None))
+    return CacheItem(row_id, cls, key)
 
 
 def load_cache(filename):
@@ -251,34 +342,55 @@ def load_cache(filename):
 
     @return the cache as a list of events.
     """
-    try:
-        with open(filename, "rb") as cache_file:
-            return pickle.load(cache_file), False
-    except IOError:
+    def read_all(cache_map, count):
+        return [_to_cache_item(*record)
+                for record in CACHE_RECORD.iter_unpack(cache_map[CACHE_HEADER.size:
+                                                                 CACHE_HEADER.size + count * CACHE_RECORD.size])]
+
+    cache, cache_error = _read_cache(filename, read_all)
+    if cache_error:
         return [], True
+    return cache, False
+
+
+def load_cache_item(filename, cache_id):
+    """
+    Load only the item with the cache_id from the cache file.
+
+    The record is read directly from its position in the file.
+
+    @return the CacheItem or None if there is no item with the cache_id and the cache error
+    """
+    def read_one(cache_map, count):
+        if cache_id >= count:
+            return None
+        return _to_cache_item(*CACHE_RECORD.unpack_from(cache_map, CACHE_HEADER.size + cache_id * CACHE_RECORD.size))
+
+    return _read_cache(filename, read_one)
 
 
 def get_cache_item(store, cache_id, e_type):
     """
     Get the item with cache_id from the cache file and return it.
+
+    An item of a subclass of e_type is also returned,
+    like an occurrence of a repeated appointment for an appointment.
     """
     if cache_id == -1:
-        cache, cache_error = load_cache(store.last_file)
-        cache_id = 0
+        cache_item, cache_error = load_cache_item(store.last_file, 0)
     elif cache_id < 0:
         return None, False
     else:
-        cache, cache_error = load_cache(store.cache_file)
+        cache_item, cache_error = load_cache_item(store.cache_file, cache_id)
     if cache_error:
         return None, cache_error
-    try:
-        cache_item = cache[cache_id]
-    except IndexError:
+    if cache_item is None or cache_item.type is None or not issubclass(cache_item.type, e_type):
         return None, False
-    if cache_item.type != e_type:
-        return None, cache_error
-    event_module = importlib.import_module(cache_item.module)
-    event = event_module.get(store, cache_item.id)
+    _, get_fn, key_fn = CACHE_TYPES[CACHE_TAGS[cache_item.type]]
+    if key_fn is None:
+        event = get_fn(store, cache_item.id)
+    else:
+        event = get_fn(store, cache_item.id, cache_item.key)
     return event, cache_error
 
 
@@ -290,7 +402,6 @@ def _create_dir(db_name):
             It can be a local path.
     """
     import errno
-    import os
     dir_path = os.path.dirname(db_name)
     try:
         os.makedirs(dir_path)
@@ -299,49 +410,267 @@ def _create_dir(db_name):
             raise exception
 
 
-class Store(object):
-    """ The store object take care of all permanent data stores. """
-    CREATE_CMDS = set()
+# The version of the newest migration. A store with this version has the current schema,
+# so no DDL runs when it is opened. It has to be raised with every new migration.
+SCHEMA_VERSION = 5
 
-    def __init__(self, filename, cache_file, last_file):
+SCHEMA_VERSION_CMD = """
+                     CREATE TABLE IF NOT EXISTS
+                        schema_version (
+                             version INTEGER NOT NULL,
+                             applied TIMESTAMP NOT NULL,
+                             PRIMARY KEY (version)
+                     );
+                     """
+
+
+# The modules which register the tables of the store
+MODEL_MODULES = ('doto.model.repeat', 'doto.model.task', 'doto.model.apmt', 'doto.model.timerecord', 'doto.model.search')
+
+
+# All SQL statements of the model by their name
+QUERIES = collections.OrderedDict()
+_QUERY_NAMES = {}
+
+
+def register_queries(module, **queries):
+    """
+    Register the SQL statements of a model module in the query registry.
+
+    The statements are built once when the model modules are imported.
+    So every call of a statement uses the same string, which sqlite3
+    finds in the statement cache of the connection.
+
+    @param module the name of the module, like "task"
+    @param queries the statements by their names, like select=select_query
+    """
+    for name, query in sorted(queries.items()):
+        full_name = '{}.{}'.format(module, name)
+        QUERIES[full_name] = query
+        _QUERY_NAMES[query] = full_name
+
+
+def query_name(query):
+    """ Get the name of a registered statement or the statement itself. """
+    return _QUERY_NAMES.get(query, ' '.join(query.split()))
+
+
+class StatementStats(object):
+    """
+    StatementStats counts the hits and misses of the statement cache of a connection.
+
+    sqlite3 has no interface to its statement cache,
+    so StatementStats keeps the statements in the same LRU order as the cache.
+
+    @param size the cached_statements of the connection
+    """
+    def __init__(self, size):
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self.statements = collections.Counter()
+        self.__cache = collections.OrderedDict()
+
+    def use(self, query):
+        """ Count one execution of query. """
+        self.statements[query] += 1
+        if query in self.__cache:
+            self.__cache.move_to_end(query)
+            self.hits += 1
+            return
+        self.misses += 1
+        self.__cache[query] = True
+        if len(self.__cache) > self.size:
+            self.__cache.popitem(last=False)
+
+    def reset(self):
+        """ Reset the counts, but keep the statements which are still in the cache. """
+        self.hits = 0
+        self.misses = 0
+        self.statements.clear()
+
+
+# The PRAGMAs which can be set for a store and a pattern of their valid values
+STORE_PRAGMAS = {'journal_mode': re.compile(r'(?i)(delete|truncate|persist|memory|wal|off)\Z'),
+                 'synchronous': re.compile(r'(?i)(off|normal|full|extra|[0-3])\Z'),
+                 'cache_size': re.compile(r'-?[0-9]+\Z'),
+                 'mmap_size': re.compile(r'[0-9]+\Z'),
+                 'temp_store': re.compile(r'(?i)(default|file|memory|[0-2])\Z'),
+                 }
+
+
+def check_pragmas(pragmas):
+    """
+    Check the names and values of the PRAGMAs for a store.
+
+    PRAGMA statements can not have parameters,
+    so only the names and values in STORE_PRAGMAS are allowed.
+
+    @param pragmas a dictionary with the name and the value of every PRAGMA
+
+    @return a list of the PRAGMA statements
+    """
+    statements = []
+    for name, value in pragmas.items():
+        if name not in STORE_PRAGMAS:
+            raise ValueError("Unknown store setting {}".format(name))
+        value = str(value).strip()
+        if not STORE_PRAGMAS[name].match(value):
+            raise ValueError("The store setting {} can not be {}".format(name, value))
+        statements.append('PRAGMA {} = {};'.format(name, value))
+    return statements
+
+
+class Store(object):
+    """
+    The store object take care of all permanent data stores.
+
+    @param filename the name of the database file, "" for a database in memory
+    @param cache_file the name of the cache file
+    @param last_file the name of the file with the last event
+    @param pragmas a dictionary with the PRAGMAs of the connection,
+            see STORE_PRAGMAS. Store.PRAGMAS is used if it is None.
+    @param cached_statements the size of the statement cache of the connection,
+            Store.CACHED_STATEMENTS is used if it is None.
+    """
+    # The create commands in the order in which the modules were registered
+    CREATE_CMDS = [SCHEMA_VERSION_CMD]
+    MIGRATIONS = {}
+    IDENTITY_MAP_SIZE = 4096
+    # The defaults of the [store] section of the config
+    PRAGMAS = {name: value for name, value in doto.defaultconfig.CONF_DEF['store'].items() if name in STORE_PRAGMAS}
+    CACHED_STATEMENTS = int(doto.defaultconfig.CONF_DEF['store']['cached_statements'])
+
+    def __init__(self, filename, cache_file, last_file, pragmas=None, cached_statements=None, timings=None):
         if filename != "":
             _create_dir(filename)
         else:
             filename = ':memory:'
 
-        self.conn = sqlite3.connect(filename, detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES)
-        self.conn.row_factory = sqlite3.Row
-
-        self.create()
+        if cached_statements is None:
+            cached_statements = Store.CACHED_STATEMENTS
+        # the phases of the command are measured in this Timings object
+        self.timings = doto.timings.NO_TIMINGS if timings is None else timings
+        with self.timings.phase('open'):
+            self.conn = sqlite3.connect(filename, detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES,
+                                        cached_statements=cached_statements)
+            self.statement_stats = StatementStats(cached_statements)
+            self.conn.row_factory = sqlite3.Row
+            for statement in check_pragmas(Store.PRAGMAS if pragmas is None else pragmas):
+                # some PRAGMAs return their new value, which has to be fetched
+                self.conn.execute(statement).fetchall()
+            self.identity_map = doto.model.identity.IdentityMap(Store.IDENTITY_MAP_SIZE)
+
+        with self.timings.phase('ddl'):
+            self.bootstrap()
 
         self.cache_file = cache_file
         self.last_file = last_file
-        self._cache_list = []
+        self._cache_records = []
         self._last_cache = None
+        self._transaction_depth = 0
+
+    def bootstrap(self):
+        """
+        Create the tables and run the migrations if the schema of the database is not current.
+
+        The schema version in PRAGMA user_version is read from the header of the database,
+        so opening a current store does not parse or run any DDL.
+
+        @return True if the schema was created or migrated
+        """
+        if self.get_version() >= SCHEMA_VERSION:
+            return False
+        self.create()
+        return True
 
     def create(self):
-        """ Run all the create commands which come from the submodules. """
+        """
+        Run all the create commands which come from the submodules.
+
+        All model modules are imported first, so every table and migration is registered
+        even if the command only imported a part of the model.
+        """
+        for module_name in MODEL_MODULES:
+            importlib.import_module(module_name)
         create_cmds = ';'.join(Store.CREATE_CMDS)
         self.conn.executescript(create_cmds)
+        self.migrate()
+
+    def get_version(self):
+        """ Get the schema version of the database. """
+        (version,) = self.conn.execute('PRAGMA user_version;').fetchone()
+        return version
+
+    def migrate(self):
+        """
+        Run all migrations which are newer than the schema version of the database.
+
+        Every migration runs in its own transaction together with the update of the schema version.
+        The schema version is stored in PRAGMA user_version
+        and every applied migration is logged in the schema_version table.
+        """
+        version = self.get_version()
+        for new_version in sorted(v for v in Store.MIGRATIONS if v > version):
+            script = ''.join(Store.MIGRATIONS[new_version])
+            log = "INSERT INTO schema_version (version, applied) VALUES ({:d}, strftime('%s', 'now'));".format(new_version)
+            try:
+                self.conn.executescript('BEGIN; {} {} PRAGMA user_version = {:d}; COMMIT;'.format(script, log, new_version))
+            except sqlite3.Error:
+                self.conn.rollback()
+                raise
+
+    def get_migrations(self):
+        """ Get the applied migrations as a list of (version, applied) tuples. """
+        return [tuple(row) for row in self.execute('SELECT version, applied FROM schema_version ORDER BY version;')]
+
+    def analyze(self):
+        """ Gather the statistics for the query planner. """
+        self.conn.execute('ANALYZE;')
+
+    def explain(self, query, parameters=None):
+        """
+        Get the query plan of an SQL query.
+
+        @return a list of (id, parent, detail) tuples of the plan
+        """
+        plan = self.execute('EXPLAIN QUERY PLAN ' + query, parameters)
+        return [(row[0], row[1], row[3]) for row in plan]
 
     def execute(self, query, parameters=None):
         """ Execute an SQL query with the given parameters. """
-        if parameters is None:
-            return self.conn.execute(query)
-        return self.conn.execute(query, parameters)
+        self.statement_stats.use(query)
+        with self.timings.phase('query'):
+            if parameters is None:
+                return self.conn.execute(query)
+            return self.conn.execute(query, parameters)
+
+    def executemany(self, query, parameters):
+        """ Execute an SQL query once for every parameter set in parameters. """
+        self.statement_stats.use(query)
+        with self.timings.phase('query'):
+            return self.conn.executemany(query, parameters)
 
     def get_one(self, convert, query, parameters=None):
         """ Run a select statement which only return one row."""
         cur = self.execute(query, parameters)
-        row = cur.fetchone()
-        assert cur.fetchone() is None
-        return convert(row, self)
+        result = doto.model.mapper.load(convert, self, cur)
+        assert len(result) == 1
+        return result[0]
 
     def query(self, convert, query, parameters=None):
         """
         Execute a query and convert the result with the convert function.
         """
-        return [convert(x, self) for x in self.execute(query, parameters)]
+        return doto.model.mapper.load(convert, self, self.execute(query, parameters))
+
+    def iter_query(self, convert, query, parameters=None):
+        """
+        Execute a query and convert the rows while they are fetched from the cursor.
+
+        @return a generator of the converted rows
+        """
+        return doto.model.mapper.iter_load(convert, self, self.execute(query, parameters))
 
     def add_to_cache(self, events):
         """
@@ -349,11 +678,20 @@ class Store(object):
 
         @param events the events that will be added to the cache.
         """
-        cache_len = len(self._cache_list)
-        for i, event in enumerate(events):
-            event.cache_id = cache_len + i
+        for event in events:
+            self.cache_event(event)
+
+    def cache_event(self, event):
+        """
+        Add one event to the cache and set its cache_id.
+
+        Only the packed type and id of the event are kept until the cache is saved.
 
-        self._cache_list += events
+        @return the event
+        """
+        event.cache_id = len(self._cache_records)
+        self._cache_records.append(pack_cache_record(event))
+        return event
 
     def set_last(self, event):
         """
@@ -374,18 +712,67 @@ class Store(object):
         """
         return load_cache(self.cache_file)
 
+    @contextlib.contextmanager
+    def transaction(self):
+        """
+        Run the statements of the block as one unit of work.
+
+        The block is a SAVEPOINT, so transactions can be nested.
+        If the block raises an exception, its statements are rolled back,
+        the identity map is cleared and the cache entries of the block are dropped.
+        The statements before the block stay in the transaction.
+
+        The transaction is not committed at the end of the block. Every change
+        of a command is committed at once with save(), which must not be called in the block.
+        """
+        if not self.conn.in_transaction:
+            self.conn.execute('BEGIN;')
+        name = 'doto_{:d}'.format(self._transaction_depth)
+        cache_records = len(self._cache_records)
+        last_cache = self._last_cache
+        self.conn.execute('SAVEPOINT {};'.format(name))
+        self._transaction_depth += 1
+        try:
+            yield self
+        except BaseException:
+            self.conn.execute('ROLLBACK TO {};'.format(name))
+            self.conn.execute('RELEASE {};'.format(name))
+            self.identity_map.clear()
+            del self._cache_records[cache_records:]
+            self._last_cache = last_cache
+            raise
+        else:
+            self.conn.execute('RELEASE {};'.format(name))
+        finally:
+            self._transaction_depth -= 1
+
     def save(self):
         """
         Save the store.
 
         @returns True if the save worked flawless
         """
-        if len(self._cache_list) > 0:
-            dump_cache(self.cache_file, self._cache_list)
-        if self._last_cache is not None:
-            dump_cache(self.last_file, (self._last_cache,))
+        with self.timings.phase('save'):
+            if len(self._cache_records) > 0:
+                dump_cache_records(self.cache_file, self._cache_records)
+            if self._last_cache is not None:
+                dump_cache(self.last_file, (self._last_cache,))
+
+            self.conn.commit()
+
+    def reset(self):
+        """
+        Forget the state of the last command.
 
-        self.conn.commit()
+        Uncommitted changes are rolled back, the identity map is cleared,
+        the pending cache entries are dropped and the statement counts are reset,
+        so a long running process sees the changes of other processes.
+        """
+        self.conn.rollback()
+        self.identity_map.clear()
+        self.statement_stats.reset()
+        self._cache_records = []
+        self._last_cache = None
 
     def close(self):
         """
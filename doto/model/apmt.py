@@ -1,5 +1,9 @@
+import copy
+import datetime
+
 import doto.model
 import doto.model.crud
+import doto.model.mapper
 import doto.model.repeat
 
 
@@ -18,6 +22,23 @@ CREATE_CMD = """
                     );
              """
 
+# The occurrences of the repeated appointments after their last appointment in the store.
+# They are expanded from the rule of the repeat up to the expanded_until date of the repeat.
+OCCURRENCES_CMD = """
+                CREATE TABLE IF NOT EXISTS
+                    occurrences (
+                            repeat INTEGER NOT NULL,
+                            start TIMESTAMP NOT NULL,
+                            PRIMARY KEY (repeat, start),
+                            FOREIGN KEY(repeat) REFERENCES repeats(id)
+                    ) WITHOUT ROWID;
+                CREATE INDEX IF NOT EXISTS occurrences_start ON occurrences (start);
+                  """
+
+# An expansion of the occurrences reaches this far after the requested date,
+# so the occurrences are only expanded again when the window has moved on.
+OCCURRENCE_WINDOW = datetime.timedelta(days=31)
+
 
 class Appointment(doto.model.Event):
     """
@@ -26,39 +47,16 @@ class Appointment(doto.model.Event):
     """
 
     __tablename__ = "appointments"
+    __slots__ = ('schedule', 'repeat')
 
     def __init__(self, title, start,
                  description=None, end=None,
-                 repeat=None
+                 repeat=None, created=None
                  ):
-        super().__init__(title, description)
+        super().__init__(title, description, created)
         self.schedule = doto.model.TimeSpan(start, end)
         self.repeat = repeat
 
-    @staticmethod
-    def row_to_obj(row, store):
-        """
-        Create Task from database row
-        """
-        apmt = doto.model.unwrap_row(store,
-                                     row,
-                                     Appointment,
-                                     ('title', 'start', 'description', 'end'),
-                                     ('id', 'created'),
-                                     foreign_keys=(('repeat', doto.model.repeat),)
-                                     )
-        return apmt
-
-    @staticmethod
-    def obj_to_row(obj):
-        """
-        """
-        row_dict = doto.model.unwrap_obj(obj, ignore_list=('schedule',), foreign_keys=('repeat',))
-        row_dict['start'] = obj.schedule.start
-        row_dict['end'] = obj.schedule.end
-        row_dict['repeat'] = doto.model.get_id(obj.repeat)
-        return row_dict
-
     def move(self, start, end=None):
         """
         Move the appointment to a new start and/or end date
@@ -86,32 +84,194 @@ class Appointment(doto.model.Event):
                 )
 
 
-def create_repeat(store, apmt):
-    """ Create a repeated appointment """
-    next_dt = apmt.repeat.next(doto.model.now_with_tz())
+class Occurrence(Appointment):
+    """
+    An Occurrence is a repetition of a repeated appointment which is not an appointment in the store yet.
+
+    It is a copy of the last appointment of its repeat, which is moved to the start of the occurrence,
+    and has the id of that appointment. So it can be shown, but it must not be changed or deleted.
+
+    @param apmt the last appointment of the repeat
+    @param start the start of the occurrence
+    """
+
+    __slots__ = ()
+
+    def __init__(self, apmt, start):
+        super().__init__(apmt.title, start, description=apmt.description, repeat=apmt.repeat, created=apmt.created)
+        self.id = apmt.id
+        self.schedule = doto.model.TimeSpan.move(apmt.schedule, start)
+
+
+def _build_row_to_obj(index):
+    """
+    Build the function which creates an Appointment from a database row.
+
+    @param index a dictionary with the column index of every column name
+    """
+    i_id = index['id']
+    i_title = index['title']
+    i_description = index['description']
+    i_created = index['created']
+    i_start = index['start']
+    i_end = index['end']
+    i_repeat = index['repeat']
+
+    def row_to_obj(row, foreign):
+        """
+        Create Appointment from database row
+        """
+        apmt = Appointment(row[i_title],
+                           row[i_start],
+                           description=row[i_description],
+                           end=row[i_end],
+                           repeat=foreign['repeat'].get(row[i_repeat]),
+                           created=row[i_created])
+        apmt.id = row[i_id]
+        return apmt
+    return row_to_obj
+
+
+def _obj_to_row(obj):
+    """ Create the row parameters of an Appointment """
+    return {'id': obj.id,
+            'title': obj.title,
+            'description': obj.description,
+            'created': obj.created,
+            'start': obj.schedule.start,
+            'end': obj.schedule.end,
+            'repeat': doto.model.get_id(obj.repeat),
+            }
+
+
+mapper = doto.model.mapper.register(Appointment, _build_row_to_obj, _obj_to_row,
+                                    foreign_keys=(('repeat', doto.model.repeat.get_by_ids),))
+
+
+def create_occurrences(store, apmt, now):
+    """
+    Add the occurrences of a repeated appointment which are missing in the store.
+
+    Every occurrence after the materialised_until watermark of the repeat up to now
+    and the next occurrence after now are added.
+
+    @param store the database store
+    @param apmt the last appointment of the repeat
+    @param now the current date
+
+    @return the new appointments
+    """
     repeat = apmt.repeat
-    apmt.schedule = doto.model.TimeSpan.move(apmt.schedule, next_dt)
-    # TODO: This cries for a transaction
-    new_apmt = add_new(store, apmt).id
-    repeat.event = new_apmt
-    doto.model.repeat.update(store, repeat)
-    return new_apmt
-
-
-def create_repeats(store):
-    oudated_query = """SELECT appointments.* FROM appointments
-                                               INNER JOIN repeats
-                                               ON appointments.id=repeats.event
-                                               WHERE appointments.start <= :now;
+    starts = repeat.between(repeat.materialised_until, now)
+    starts.append(repeat.next(now))
+    # copy the appointment, since apmt is the object of the old row in the identity map
+    new_apmts = []
+    for start in starts:
+        new_apmt = copy.copy(apmt)
+        new_apmt.schedule = doto.model.TimeSpan.move(apmt.schedule, start)
+        new_apmts.append(new_apmt)
+    with store.transaction():
+        add_many(store, new_apmts)
+        repeat.event = new_apmts[-1].id
+        repeat.materialised_until = new_apmts[-1].schedule.start
+        doto.model.repeat.update(store, repeat)
+        store.execute(delete_occurrences_query, {'repeat': repeat.id, 'until': repeat.materialised_until})
+    return new_apmts
+
+
+def add_repeated(store, apmt, rule_pattern):
+    """
+    Add a new appointment which repeats with the rule_pattern.
+
+    The appointment, its repeat and the link between them are written in one store transaction.
+
+    @param store the database store
+    @param apmt the new appointment
+    @param rule_pattern a pattern of doto.model.repeat.PATTERNS
+
+    @return the new appointment
+    """
+    with store.transaction():
+        add_new(store, apmt)
+        apmt.repeat = doto.model.repeat.parse(rule_pattern, apmt.schedule.start, apmt.id,
+                                              materialised_until=apmt.schedule.start)
+        doto.model.repeat.add_new(store, apmt.repeat)
+        update(store, apmt)
+    return apmt
+
+
+due_repeats_query = 'SELECT * FROM repeats WHERE materialised_until <= :now;'
+due_expansion_query = """SELECT * FROM repeats WHERE materialised_until IS NOT NULL
+                                               AND (expanded_until IS NULL OR expanded_until < :until);
                       """
-    outdated_apmts = store.query(Appointment.row_to_obj, oudated_query, {'now': doto.model.now_with_tz()})
-    for apmt in outdated_apmts:
-        create_repeat(store, apmt)
+insert_occurrence_query = 'INSERT OR IGNORE INTO occurrences (repeat, start) VALUES (?, ?);'
+delete_occurrences_query = 'DELETE FROM occurrences WHERE repeat = :repeat AND start <= :until;'
+
+
+def expand_occurrences(store, until, window=OCCURRENCE_WINDOW):
+    """
+    Add the occurrences of the repeated appointments up to until to the occurrences table.
+
+    A repeat which is already expanded up to until is not touched, the others are expanded
+    to until + window, so the next calls with a slightly later date do not write anything.
+    The expansion starts at the expanded_until date of the repeat, or at its
+    materialised_until date if it was never expanded.
+
+    @param store the database store
+    @param until the date up to which the occurrences are needed
+    @param window how far the occurrences are expanded after until
+
+    @return the number of new occurrences
+    """
+    repeats = store.query(doto.model.repeat.mapper, due_expansion_query, {'until': until})
+    count = 0
+    for repeat in repeats:
+        begin = repeat.materialised_until
+        if repeat.expanded_until is not None and repeat.expanded_until > begin:
+            begin = repeat.expanded_until
+        starts = repeat.between(begin, until + window)
+        with store.transaction():
+            store.executemany(insert_occurrence_query, ((repeat.id, start) for start in starts))
+            repeat.expanded_until = until + window
+            doto.model.repeat.update(store, repeat)
+        count += len(starts)
+    return count
+
+
+def create_repeats(store, now=None):
+    """
+    Add the missing occurrences of all repeated appointments.
+
+    Only the repeats whose materialised_until watermark has passed are touched.
+    If no repeat is due nothing is written to the store.
+    All changes are made in the current transaction and are committed with Store.save.
+
+    @param store the database store
+    @param now the current date. Default=now_with_tz()
+
+    @return the new appointments
+    """
+    if now is None:
+        now = doto.model.now_with_tz()
+    repeats = store.query(doto.model.repeat.mapper, due_repeats_query, {'now': now})
+    if not repeats:
+        return []
+    apmts = get_by_ids(store, [repeat.event for repeat in repeats])
+    new_apmts = []
+    for repeat in repeats:
+        apmt = apmts.get(repeat.event)
+        if apmt is None or doto.model.get_id(apmt.repeat) != repeat.id:
+            # the event of the repeat was deleted
+            continue
+        # the identity map may have evicted the repeat, so apmt.repeat can be another object of the same row
+        apmt.repeat = repeat
+        new_apmts += create_occurrences(store, apmt, now)
+    return new_apmts
 
 
 def get_many(store, query, params):
     create_repeats(store)
-    return store.query(Appointment.row_to_obj, query, params)
+    return store.query(mapper, query, params)
 
 
 def get_current(store, date, delta):
@@ -119,24 +279,153 @@ def get_current(store, date, delta):
     Get the appointments that are between the given date and the date + delta.
 
     So to get the appointments of the next seven days set date to now and delta to seven days.
+    Every occurrence of a repeated appointment in this time is returned.
 
     @param date The returned appointments are younger then this date.
     @param delta Only Appointments that are older than date + delta are returned.
 
     @return the appointments between the date and date + delta
     """
-    query = 'SELECT * FROM appointments WHERE start >= :from AND start < :until ORDER BY start;'
-    params = {'from': date, 'until': date + delta}
-
-    return get_many(store, query, params)
+    return list(iter_current(store, date, delta))
 
 
 def get_all(store, date):
-    query = 'SELECT * FROM appointments WHERE start >= :from ORDER BY start;'
-    params = {'from': date}
-    return get_many(store, query, params)
+    """
+    Get all appointments after date and the occurrences of
+    the repeated appointments in the OCCURRENCE_WINDOW after date.
+    """
+    return list(iter_all(store, date))
+
+
+def iter_many(store, query, params):
+    """
+    Get the appointments of the query while they are read from the store.
+
+    The missing occurrences of repeated appointments are added before the query runs.
+
+    @return a generator of appointments
+    """
+    create_repeats(store)
+    return store.iter_query(mapper, query, params)
+
+
+def iter_occurrences(store, query, params):
+    """
+    Get the appointments and the occurrences of the repeated appointments of the query.
+
+    The missing appointments of the repeats are added and the occurrences are expanded
+    up to params['until'] before the query runs.
+    An occurrence is returned as Occurrence of the last appointment of its repeat.
+
+    @param query a query with the columns "at" for the start of the occurrence,
+            "occurrence" which is 1 for an occurrence and then the columns of the appointment
+
+    @return a generator of appointments
+    """
+    create_repeats(store)
+    expand_occurrences(store, params['until'])
+    cursor = store.execute(query, params)
+    for row, apmt in mapper.iter_rows(store, cursor):
+        if row['occurrence']:
+            # the identity map returns the last appointment of the repeat for every occurrence
+            apmt = Occurrence(apmt, row['at'])
+        yield apmt
+
+
+def get_occurrence(store, apmt_id, start):
+    """
+    Get the occurrence of the repeat of an appointment.
+
+    If the occurrence was added to the store since it was cached, its appointment is returned.
+
+    @param apmt_id the id of the appointment of the repeat
+    @param start the start of the occurrence in seconds since the epoch, as returned by occurrence_key
+
+    @return the Occurrence, the Appointment or None if the appointment or its repeat are gone
+    """
+    apmt = get_by_ids(store, [apmt_id]).get(apmt_id)
+    if apmt is None or apmt.repeat is None:
+        return None
+    start = doto.model.convert_datetime(start)
+    added = store.query(mapper, select_occurrence_query, {'repeat': apmt.repeat.id, 'start': start})
+    if added:
+        return added[0]
+    return Occurrence(apmt, start)
+
+
+def occurrence_key(occurrence):
+    """ Get the key of an occurrence in the cache, which is its start in seconds since the epoch. """
+    return doto.model.adapt_datetime(occurrence.schedule.start)
+
+
+def page_key(apmt):
+    """
+    Get the key of an appointment in the order of the pages.
+
+    @return the tuple (start, id)
+    """
+    return apmt.schedule.start, apmt.id
+
+
+def _page_params(date, after, size):
+    if after is None:
+        # the ids start at 1, so this key is before every appointment of the date
+        after = (date, 0)
+    return {'from': date,
+            'after_start': after[0],
+            'after_id': after[1],
+            'limit': -1 if size is None else size}
 
 
+def iter_current(store, date, delta, after=None, size=None):
+    """
+    Get the appointments between the given date and the date + delta
+    while they are read from the store.
+
+    The appointments are ordered by their start and id.
+    A page starts after the key of the last appointment of the page before,
+    so the store seeks to the start of the page in the index.
+    The occurrences of the repeated appointments are included.
+
+    @param after the page_key of the last appointment of the previous page, None for the first page
+    @param size the maximum number of appointments, None for no limit
+
+    @return a generator of the appointments
+    """
+    params = _page_params(date, after, size)
+    params['until'] = date + delta
+    return iter_occurrences(store, current_page_query, params)
+
+
+def iter_all(store, date, after=None, size=None):
+    """
+    Get a page of all appointments after date while they are read from the store.
+
+    The occurrences of the repeated appointments are included for the OCCURRENCE_WINDOW after date.
+    """
+    params = _page_params(date, after, size)
+    params['until'] = date + OCCURRENCE_WINDOW
+    return iter_occurrences(store, all_page_query, params)
+
+
+current_query = 'SELECT * FROM appointments WHERE start >= :from AND start < :until ORDER BY start;'
+all_query = 'SELECT * FROM appointments WHERE start >= :from ORDER BY start;'
+# Both parts of the union are range scans of the index on start and are merged in the order of the pages.
+# An occurrence gets the columns of the last appointment of its repeat.
+OCCURRENCE_PAGE_QUERY = """SELECT start AS at, 0 AS occurrence, * FROM appointments
+                               WHERE start >= :from AND {until_appointments}
+                                     (start, id) > (:after_start, :after_id)
+                           UNION ALL
+                           SELECT occurrences.start, 1, appointments.* FROM occurrences
+                               JOIN repeats ON repeats.id = occurrences.repeat
+                               JOIN appointments ON appointments.id = repeats.event
+                                                AND appointments.repeat = repeats.id
+                               WHERE occurrences.start >= :from AND occurrences.start < :until
+                                     AND (occurrences.start, appointments.id) > (:after_start, :after_id)
+                           ORDER BY at, id LIMIT :limit;
+                        """
+current_page_query = OCCURRENCE_PAGE_QUERY.format(until_appointments='start < :until AND')
+all_page_query = OCCURRENCE_PAGE_QUERY.format(until_appointments='')
 count_query = 'SELECT COUNT(id) FROM appointments'
 insert_query = """INSERT INTO appointments ( title,  description,  created,  start,  end,  repeat)
                                     VALUES (:title, :description, :created, :start, :end, :repeat)
@@ -152,10 +441,35 @@ update_query = """UPDATE appointments SET title = :title,
                """
 delete_query = 'DELETE FROM appointments WHERE id = ?;'
 select_query = 'SELECT * FROM appointments WHERE id = :id;'
-update = doto.model.crud.update(update_query, Appointment)
-add_new = doto.model.crud.insert(insert_query, Appointment, add_fn=doto.model.crud.add_and_cache)
-delete = doto.model.crud.delete(delete_query)
-get = doto.model.crud.get(select_query, Appointment)
+select_ids_query = 'SELECT * FROM appointments WHERE id IN ({});'
+select_occurrence_query = 'SELECT * FROM appointments WHERE repeat = :repeat AND start = :start;'
+update = doto.model.crud.update(update_query, mapper)
+add_new = doto.model.crud.insert(insert_query, mapper,
+                                 add_fn=doto.model.crud.add_and_cache,
+                                 add_many_fn=doto.model.crud.add_many_and_cache)
+add_many = doto.model.crud.insert_many(insert_query, mapper)
+delete = doto.model.crud.delete(delete_query, mapper)
+get = doto.model.crud.get(select_query, mapper)
+get_by_ids = doto.model.crud.get_by_ids(select_ids_query, mapper)
 get_count = doto.model.crud.get_count(count_query)
+doto.model.register_queries('apmt', due_repeats=due_repeats_query, due_expansion=due_expansion_query,
+                            insert_occurrence=insert_occurrence_query, delete_occurrences=delete_occurrences_query,
+                            current=current_query, all=all_query,
+                            current_page=current_page_query, all_page=all_page_query, count=count_query,
+                            insert=insert_query, update=update_query, delete=delete_query, select=select_query,
+                            select_occurrence=select_occurrence_query)
+doto.model.register_cache_type(b'A', Appointment, get)
+doto.model.register_cache_type(b'O', Occurrence, get_occurrence, key_fn=occurrence_key)
+
+# The watermark of existing repeats is the start of their last appointment.
+# The column is added by the migration of the repeat module.
+materialised_until_migration = """UPDATE repeats SET materialised_until = (SELECT start FROM appointments
+                                                                            WHERE appointments.id = repeats.event
+                                                                            AND appointments.repeat = repeats.id);
+                               """
 
-doto.model.setup_module(CREATE_CMD, ())
+doto.model.setup_module(CREATE_CMD, (),
+                        migrations=((1, doto.model.timestamp_migration('appointments', ('created', 'start', 'end'))),
+                                    (2, materialised_until_migration),
+                                    (3, 'CREATE INDEX IF NOT EXISTS appointments_start ON appointments (start);'),
+                                    (5, OCCURRENCES_CMD)))
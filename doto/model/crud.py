@@ -1,56 +1,115 @@
 """
 Module for crud operations
 """
+import doto.model
 
+LAST_ID_QUERY = 'SELECT last_insert_rowid();'
+doto.model.register_queries('crud', last_id=LAST_ID_QUERY)
 
-def add_one(store, cls, insert_query, obj):
+
+def add_one(store, mapper, insert_query, obj):
     """
     Add one row
     """
-    row_parameters = cls.obj_to_row(obj)
+    row_parameters = mapper.obj_to_row(obj)
     cur = store.execute(insert_query, row_parameters)
 
     obj.id = cur.lastrowid
     return obj
 
 
-def add_and_cache(store, cls, insert_query, obj):
+def add_and_cache(store, mapper, insert_query, obj):
     """
     Add a new row and store the id and type in the last event cache
     """
-    obj = add_one(store, cls, insert_query, obj)
+    obj = add_one(store, mapper, insert_query, obj)
     store.set_last(obj)
     return obj
 
 
-def insert(insert_query, cls, add_fn=add_one):
+def add_many(store, mapper, insert_query, objs):
+    """
+    Add many rows with one executemany
+
+    SQLite gives every inserted row the largest rowid of the table plus one.
+    No other connection can write while the statement runs in the transaction,
+    so the new rows have a contiguous range of ids which ends with the last inserted rowid.
+    The rows are added in a store transaction, so either all or none of them are added.
+    """
+    objs = list(objs)
+    if not objs:
+        return objs
+    with store.transaction():
+        store.executemany(insert_query, map(mapper.obj_to_row, objs))
+        (last_id,) = store.execute(LAST_ID_QUERY).fetchone()
+    for obj_id, obj in enumerate(objs, last_id - len(objs) + 1):
+        obj.id = obj_id
+    return objs
+
+
+def add_many_and_cache(store, mapper, insert_query, objs):
+    """
+    Add many rows and store the last of them in the last event cache
+    """
+    objs = add_many(store, mapper, insert_query, objs)
+    if objs:
+        store.set_last(objs[-1])
+    return objs
+
+
+def insert(insert_query, mapper, add_fn=add_one, add_many_fn=add_many):
     """
     Create insert function
 
     @param insert_query the query for the new insert function
-    @param obj_to_row the function to create the row_parameters from the obj
-    @param cls the class or module which has a obj_to_row function
+    @param mapper the mapper of the class which has a obj_to_row function
+    @param add_fn the function which adds one object
+    @param add_many_fn the function which adds a list of objects
     """
     def insert_clojure(store, obj_s):
         """
-        Add a new event to the store
+        Add a new event or a list of new events to the store
 
         @param store the database store
-        @param obj the new event
+        @param obj_s the new event or a list or tuple of new events
         """
-        try:
-            return [add_fn(store, cls, insert_query, obj) for obj in obj_s]
-        except TypeError:
-            return add_fn(store, cls, insert_query, obj_s)
+        if isinstance(obj_s, (list, tuple)):
+            return add_many_fn(store, mapper, insert_query, obj_s)
+        return add_fn(store, mapper, insert_query, obj_s)
 
     return insert_clojure
 
 
-def delete(delete_query):
+def insert_many(insert_query, mapper, add_many_fn=add_many):
+    """
+    Create a bulk insert function
+
+    @param insert_query the query for the new insert function
+    @param mapper the mapper of the class which has a obj_to_row function
+    @param add_many_fn the function which adds a list of objects
+    """
+    def insert_many_clojure(store, objs):
+        """
+        Add all events with one statement in the current transaction
+
+        The transaction is committed with store.save().
+
+        @param store the database store
+        @param objs an iterable of new events
+
+        @return a list of the new events with their ids
+        """
+        return add_many_fn(store, mapper, insert_query, objs)
+
+    return insert_many_clojure
+
+
+def delete(delete_query, mapper):
     """
     Create delete function
 
     @param delete_query the query for the new delete function
+    @param mapper the mapper of the class
     """
     def delete_clojure(store, obj):
         """
@@ -59,16 +118,17 @@ def delete(delete_query):
         @param store the database store
         @param obj the event that will be deleted
         """
+        store.identity_map.discard(mapper.cls, obj.id)
         store.execute(delete_query, (obj.id, ))
     return delete_clojure
 
 
-def update(update_query, cls):
+def update(update_query, mapper):
     """
     Create update function
 
     @param update_query the query for the new delete function
-    @param cls the class or module which has a obj_to_row function
+    @param mapper the mapper of the class which has a obj_to_row function
     """
     def update_clojure(store, obj):
         """
@@ -77,18 +137,19 @@ def update(update_query, cls):
         @param store the database store
         @param obj the event that will be updated
         """
-        row_dict = cls.obj_to_row(obj)
+        row_dict = mapper.obj_to_row(obj)
+        store.identity_map.discard(mapper.cls, obj.id)
         store.execute(update_query, row_dict)
         return obj
     return update_clojure
 
 
-def get(select_query, cls):
+def get(select_query, mapper):
     """
     Create update function
 
     @param select_query the query which is used to select the object with the id
-    @param cls the class or module which has a row_to_obj function
+    @param mapper the mapper of the class
     """
     def get_clojure(store, select_id):
         """
@@ -97,10 +158,60 @@ def get(select_query, cls):
         @param store the database store
         @param select_id the id of the obect that shall be fetched
         """
-        return store.get_one(cls.row_to_obj, select_query, {'id': select_id})
+        obj = store.identity_map.get(mapper.cls, select_id)
+        if obj is not None:
+            return obj
+        return store.get_one(mapper, select_query, {'id': select_id})
     return get_clojure
 
 
+def get_by_ids(select_query, mapper, chunk_size=512):
+    """
+    Create a function which gets many objects by their ids.
+
+    The IN clause of a query has a power of two placeholders and
+    the ids are padded with the last id, so there are only a few
+    different statements in the statement cache.
+
+    @param select_query the query with a "{}" placeholder in the IN clause for the ids
+            for example 'SELECT * FROM repeats WHERE id IN ({});'
+    @param mapper the mapper of the class
+    @param chunk_size the maximum number of ids in one query
+    """
+    sizes = [1]
+    while sizes[-1] < chunk_size:
+        sizes.append(sizes[-1] * 2)
+    queries = {size: select_query.format(', '.join('?' * size)) for size in sizes}
+    doto.model.register_queries(mapper.cls.__name__.lower(),
+                                **{'by_ids_{}'.format(size): query for size, query in queries.items()})
+
+    def get_by_ids_clojure(store, ids):
+        """
+        Get all objects with the given ids
+
+        @param store the database store
+        @param ids a collection of ids
+
+        @return a dictionary with the id and the object
+        """
+        objs = {}
+        missing = []
+        for obj_id in ids:
+            obj = store.identity_map.get(mapper.cls, obj_id)
+            if obj is None:
+                missing.append(obj_id)
+            else:
+                objs[obj_id] = obj
+        ids = missing
+        for start in range(0, len(ids), chunk_size):
+            chunk = ids[start:start + chunk_size]
+            size = next(size for size in sizes if size >= len(chunk))
+            chunk += chunk[-1:] * (size - len(chunk))
+            objs.update((obj.id, obj) for obj in store.query(mapper, queries[size], chunk))
+        return objs
+    return get_by_ids_clojure
+
+
 def get_count(count_query):
     """ Get the number of rows with the SELECT COUNT(*) query """
     def get_count_clojure(store):
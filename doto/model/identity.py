@@ -0,0 +1,68 @@
+"""
+The identity map of a store.
+
+The identity map makes sure that every row of a table is only turned into
+one object per session. If a row is loaded a second time the object that
+was created the first time is returned.
+
+The map has a maximum size, if it is full the least recently used object
+is dropped from the map.
+"""
+import collections
+
+
+class IdentityMap(object):
+    """
+    IdentityMap maps the (class, id) pairs of loaded rows to their objects.
+
+    @param size the maximum number of objects in the map
+    """
+
+    def __init__(self, size):
+        self.__size = size
+        self.__objs = collections.OrderedDict()
+
+    @property
+    def size(self):
+        """ Get the maximum number of objects in the map. """
+        return self.__size
+
+    def get(self, cls, obj_id):
+        """
+        Get the object of the class cls with the id obj_id.
+
+        @return the object or None if it is not in the map
+        """
+        key = (cls, obj_id)
+        try:
+            obj = self.__objs[key]
+        except KeyError:
+            return None
+        self.__objs.move_to_end(key)
+        return obj
+
+    def add(self, cls, obj_id, obj):
+        """
+        Add the object to the map.
+
+        If the map is full the least recently used object is dropped.
+        """
+        key = (cls, obj_id)
+        self.__objs[key] = obj
+        self.__objs.move_to_end(key)
+        if len(self.__objs) > self.__size:
+            self.__objs.popitem(last=False)
+
+    def discard(self, cls, obj_id):
+        """ Remove the object of the class cls with the id obj_id if it is in the map. """
+        self.__objs.pop((cls, obj_id), None)
+
+    def clear(self):
+        """ Remove all objects from the map. """
+        self.__objs.clear()
+
+    def __len__(self):
+        return len(self.__objs)
+
+    def __contains__(self, key):
+        return key in self.__objs
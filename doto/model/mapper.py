@@ -0,0 +1,193 @@
+"""
+Registry of the row mappers of the model classes.
+
+A mapper converts the rows of a table into objects of one model class and
+objects of that class back into row parameters.
+
+The conversion from a row depends on the order of the columns in the cursor,
+so the mapper asks the model module once for every column order to build a
+specialised row_to_obj function. Every following row with the same column
+order is converted without looking up any column names.
+
+Foreign keys are resolved for a whole result set at once. The mapper collects
+the ids of every foreign key column and loads the referenced objects with one
+query, so rows which reference the same object share it.
+
+Rows with an id column go through the identity map of the store, so a row
+which was already loaded in this session returns the existing object.
+
+Large results can be streamed, then the rows are fetched and converted
+in chunks of ITER_CHUNK_SIZE rows.
+"""
+
+MAPPERS = {}
+ITER_CHUNK_SIZE = 256
+
+
+class Mapper(object):
+    """
+    A Mapper converts rows into objects of the class cls and back.
+
+    @param cls the model class
+    @param build_row_to_obj a function which gets a dictionary of column names to
+            column indices and returns a function row_to_obj(row, foreign)
+    @param obj_to_row a function which returns the row parameters for an object
+    @param foreign_keys a tuple of (column name, get_by_ids function) pairs.
+            get_by_ids(store, ids) must return a dictionary of the ids and the objects.
+            The objects are passed to row_to_obj in the foreign dictionary
+            as foreign[column name][id].
+    """
+
+    def __init__(self, cls, build_row_to_obj, obj_to_row, foreign_keys=()):
+        self.cls = cls
+        self.obj_to_row = obj_to_row
+        self.__build_row_to_obj = build_row_to_obj
+        self.__foreign_keys = foreign_keys
+        self.__compiled = {}
+
+    def compile(self, columns):
+        """
+        Get the row_to_obj function for the given column order.
+
+        The function is build on the first call for a column order
+        and reused on every following call.
+
+        @param columns a tuple of column names in the order of the cursor
+
+        @return a function row_to_obj(row, foreign),
+                a tuple of (column name, column index, get_by_ids) for the foreign keys
+                and the index of the id column or None if there is no id column
+        """
+        try:
+            return self.__compiled[columns]
+        except KeyError:
+            index = {name: i for i, name in enumerate(columns)}
+            row_to_obj = self.__build_row_to_obj(index)
+            foreign_keys = tuple((name, index[name], get_by_ids)
+                                 for name, get_by_ids in self.__foreign_keys)
+            compiled = self.__compiled[columns] = row_to_obj, foreign_keys, index.get('id')
+            return compiled
+
+    def load(self, store, cursor):
+        """
+        Convert all rows of the cursor into objects.
+
+        @param store the store which is used to load the foreign objects
+        @param cursor the cursor of an executed query
+
+        @return a list of objects
+        """
+        compiled = self.compile(tuple(column[0] for column in cursor.description))
+        return self._convert(store, compiled, cursor.fetchall())
+
+    def iter_load(self, store, cursor, chunk_size=ITER_CHUNK_SIZE):
+        """
+        Convert the rows of the cursor while they are fetched.
+
+        The foreign keys are resolved for every chunk of rows.
+
+        @param store the store which is used to load the foreign objects
+        @param cursor the cursor of an executed query
+        @param chunk_size the number of rows which are fetched at once
+
+        @return a generator of objects
+        """
+        for _, obj in self.iter_rows(store, cursor, chunk_size):
+            yield obj
+
+    def iter_rows(self, store, cursor, chunk_size=ITER_CHUNK_SIZE):
+        """
+        Convert the rows of the cursor while they are fetched and keep the rows.
+
+        This is used for queries with columns that are not part of the object.
+
+        @return a generator of (row, object) pairs
+        """
+        compiled = self.compile(tuple(column[0] for column in cursor.description))
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                return
+            yield from zip(rows, self._convert(store, compiled, rows))
+
+    def _convert(self, store, compiled, rows):
+        """ Convert the rows with the compiled row_to_obj function. """
+        row_to_obj, foreign_keys, i_id = compiled
+        if i_id is None:
+            foreign = resolve_foreign_keys(store, foreign_keys, rows)
+            return [row_to_obj(row, foreign) for row in rows]
+
+        cls = self.cls
+        identity_map = store.identity_map
+        objs = [identity_map.get(cls, row[i_id]) for row in rows]
+        new_rows = [row for row, obj in zip(rows, objs) if obj is None]
+        if not new_rows:
+            return objs
+
+        foreign = resolve_foreign_keys(store, foreign_keys, new_rows)
+        new_objs = iter([row_to_obj(row, foreign) for row in new_rows])
+        for i, obj in enumerate(objs):
+            if obj is None:
+                obj = objs[i] = next(new_objs)
+                identity_map.add(cls, obj.id, obj)
+        return objs
+
+    def __repr__(self):
+        return "Mapper(cls=%s)" % self.cls.__name__
+
+
+def resolve_foreign_keys(store, foreign_keys, rows):
+    """
+    Load the objects of all foreign keys in the rows.
+
+    Every foreign key column is resolved with a single call of its get_by_ids function.
+
+    @return a dictionary with the column name and the dictionary of its objects
+    """
+    foreign = {}
+    for name, i, get_by_ids in foreign_keys:
+        ids = {row[i] for row in rows}
+        ids.discard(None)
+        foreign[name] = get_by_ids(store, ids) if ids else {}
+    return foreign
+
+
+def register(cls, build_row_to_obj, obj_to_row, foreign_keys=()):
+    """
+    Create the mapper of the class cls and add it to the registry.
+
+    @return the new mapper
+    """
+    mapper = Mapper(cls, build_row_to_obj, obj_to_row, foreign_keys)
+    MAPPERS[cls] = mapper
+    return mapper
+
+
+def get(cls):
+    """ Get the mapper of the class cls. """
+    return MAPPERS[cls]
+
+
+def load(convert, store, cursor):
+    """
+    Convert all rows of the cursor.
+
+    If convert is a Mapper the rows are converted by the mapper,
+    otherwise convert(row, store) is called for every row.
+
+    @return a list with the converted rows
+    """
+    if isinstance(convert, Mapper):
+        return convert.load(store, cursor)
+    return [convert(row, store) for row in cursor]
+
+
+def iter_load(convert, store, cursor):
+    """
+    Convert the rows of the cursor while they are fetched.
+
+    @return a generator of the converted rows
+    """
+    if isinstance(convert, Mapper):
+        return convert.iter_load(store, cursor)
+    return (convert(row, store) for row in cursor)
@@ -3,6 +3,7 @@ Description of a recurring event.
 """
 import doto.model
 import doto.model.crud
+import doto.model.mapper
 from dateutil import rrule
 import pytz
 
@@ -39,35 +40,55 @@ class Repeat(object):
     It indicates that the event will repeat in a specific pattern.
     """
 
-    def __init__(self, repeat_rule, event):
-        """ constructor for Repeat """
+    def __init__(self, repeat_rule, event, materialised_until=None, expanded_until=None):
+        """
+        constructor for Repeat
+
+        @param repeat_rule the rrule of the repeat in UTC without tzinfo
+        @param event the id of the last event of the repeat
+        @param materialised_until the date of the last event which was added to the store.
+                It is only set for repeated appointments.
+        @param expanded_until the end of the window up to which the occurrences
+                after materialised_until are in the occurrences table.
+        """
+        self.id = None
         self.event = event
 
         self.repeat_rule = repeat_rule
+        self.materialised_until = materialised_until
+        self.expanded_until = expanded_until
 
-    @staticmethod
-    def row_to_obj(row, store):
-        """ Create Repeat from database row """
-        repeat = doto.model.unwrap_row(store,
-                                       row,
-                                       Repeat,
-                                       ('repeat_rule', 'event'),
-                                       ('id',)
-                                       )
-        return repeat
-
-    @staticmethod
-    def obj_to_row(obj):
+    def _rule_after(self, utc_after):
         """
-        Create Row from repeat object
+        Get a rule which yields the same events after utc_after as the repeat_rule.
+
+        The rrule walks every event from its dtstart, which are thousands for an
+        hourly rule started years ago. The materialised_until date is an event of the rule,
+        so the rule can start there, if it is not after utc_after.
         """
-        row_dict = doto.model.unwrap_obj(obj)
-        return row_dict
+        if self.materialised_until is None:
+            return self.repeat_rule
+        utc_start = pytz.utc.normalize(self.materialised_until).replace(tzinfo=None)
+        if utc_start > utc_after or utc_start <= self.repeat_rule._dtstart:
+            return self.repeat_rule
+        return self.repeat_rule.replace(dtstart=utc_start)
 
     def next(self, after_dt):
         """ return the next event after after_dt """
         utc_after = pytz.utc.normalize(after_dt).replace(tzinfo=None)
-        return self.repeat_rule.after(utc_after).replace(tzinfo=pytz.utc)
+        return self._rule_after(utc_after).after(utc_after).replace(tzinfo=pytz.utc)
+
+    def between(self, after_dt, before_dt):
+        """
+        Return all events after after_dt until and including before_dt.
+
+        @return a list of the dates of the events
+        """
+        utc_after = pytz.utc.normalize(after_dt).replace(tzinfo=None)
+        utc_before = pytz.utc.normalize(before_dt).replace(tzinfo=None)
+        return [event_dt.replace(tzinfo=pytz.utc)
+                for event_dt in self._rule_after(utc_after).between(utc_after, utc_before, inc=True)
+                if event_dt > utc_after]
 
     def __eq__(self, obj):
         return str(self.repeat_rule) == str(obj.repeat_rule)
@@ -76,28 +97,80 @@ class Repeat(object):
         return REV_PATTERNS[self.repeat_rule._freq]
 
 
-def parse(rule_pattern, start_dt, event):
-    utc_start = pytz.utc.normalize(start_dt)
-    return Repeat(rrule.rrule(PATTERNS[rule_pattern], dtstart=utc_start), event=event)
+def _build_row_to_obj(index):
+    """
+    Build the function which creates a Repeat from a database row.
 
+    @param index a dictionary with the column index of every column name
+    """
+    i_id = index['id']
+    i_repeat_rule = index['repeat_rule']
+    i_event = index['event']
+    i_materialised_until = index['materialised_until']
+    i_expanded_until = index['expanded_until']
 
-insert_query = """INSERT INTO repeats ( repeat_rule,  event)
-                              VALUES  (:repeat_rule, :event);
+    def row_to_obj(row, _foreign):
+        """ Create Repeat from database row """
+        repeat = Repeat(row[i_repeat_rule], row[i_event], row[i_materialised_until], row[i_expanded_until])
+        repeat.id = row[i_id]
+        return repeat
+    return row_to_obj
+
+
+def _obj_to_row(obj):
+    """ Create the row parameters of a Repeat """
+    return {'id': obj.id,
+            'repeat_rule': obj.repeat_rule,
+            'event': obj.event,
+            'materialised_until': obj.materialised_until,
+            'expanded_until': obj.expanded_until,
+            }
+
+
+mapper = doto.model.mapper.register(Repeat, _build_row_to_obj, _obj_to_row)
+
+
+def parse(rule_pattern, start_dt, event, materialised_until=None):
+    # the rule is stored without tzinfo, so it is created without it
+    utc_start = pytz.utc.normalize(start_dt).replace(tzinfo=None)
+    return Repeat(rrule.rrule(PATTERNS[rule_pattern], dtstart=utc_start),
+                  event=event,
+                  materialised_until=materialised_until)
+
+
+insert_query = """INSERT INTO repeats ( repeat_rule,  event,  materialised_until,  expanded_until)
+                              VALUES  (:repeat_rule, :event, :materialised_until, :expanded_until);
                """
 update_query = """UPDATE repeats SET repeat_rule = :repeat_rule,
-                                     event = :event
+                                     event = :event,
+                                     materialised_until = :materialised_until,
+                                     expanded_until = :expanded_until
                                      WHERE id = :id;
                """
 delete_query = 'DELETE FROM repeats WHERE id = ?;'
 select_query = """SELECT * FROM repeats WHERE id = :id; """
+select_ids_query = 'SELECT * FROM repeats WHERE id IN ({});'
+
+update = doto.model.crud.update(update_query, mapper)
+add_new = doto.model.crud.insert(insert_query, mapper)
+add_many = doto.model.crud.insert_many(insert_query, mapper)
+delete = doto.model.crud.delete(delete_query, mapper)
+get = doto.model.crud.get(select_query, mapper)
+get_by_ids = doto.model.crud.get_by_ids(select_ids_query, mapper)
+doto.model.register_queries('repeat', insert=insert_query, update=update_query, delete=delete_query, select=select_query)
+
 
-update = doto.model.crud.update(update_query, Repeat)
-add_new = doto.model.crud.insert(insert_query, Repeat)
-delete = doto.model.crud.delete(delete_query)
-get = doto.model.crud.get(select_query, Repeat)
+INDEX_CMD = """
+            CREATE INDEX IF NOT EXISTS repeats_event ON repeats (event);
+            CREATE INDEX IF NOT EXISTS repeats_materialised_until ON repeats (materialised_until)
+                WHERE materialised_until IS NOT NULL;
+            """
 
 
 def convert_rrule(rule_str):
     return rrule.rrulestr(rule_str.decode("utf-8"))
 
-doto.model.setup_module(CREATE_CMD, ((rrule.rrule, str, convert_rrule),))
+doto.model.setup_module(CREATE_CMD, ((rrule.rrule, str, convert_rrule),),
+                        migrations=((2, 'ALTER TABLE repeats ADD COLUMN materialised_until TIMESTAMP;'),
+                                    (3, INDEX_CMD),
+                                    (5, 'ALTER TABLE repeats ADD COLUMN expanded_until TIMESTAMP;')))
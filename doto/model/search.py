@@ -0,0 +1,106 @@
+"""
+The full-text search over the titles and descriptions of the tasks and appointments.
+
+The search uses two FTS5 tables, which take their content from the tables
+tasks and appointments and are kept in sync by triggers.
+"""
+import sqlite3
+
+import doto.model
+import doto.model.apmt
+import doto.model.task
+
+TASK_TAG = 'T'
+APMT_TAG = 'A'
+
+SEARCH_TABLES = (('tasks', 'tasks_search'),
+                 ('appointments', 'appointments_search'))
+
+SEARCH_TABLE_CMD = """
+             CREATE VIRTUAL TABLE IF NOT EXISTS {search} USING fts5(title, description, content='{table}', content_rowid='id');
+             CREATE TRIGGER IF NOT EXISTS {search}_insert AFTER INSERT ON {table} BEGIN
+                 INSERT INTO {search} (rowid, title, description) VALUES (new.id, new.title, new.description);
+             END;
+             CREATE TRIGGER IF NOT EXISTS {search}_delete AFTER DELETE ON {table} BEGIN
+                 INSERT INTO {search} ({search}, rowid, title, description) VALUES ('delete', old.id, old.title, old.description);
+             END;
+             CREATE TRIGGER IF NOT EXISTS {search}_update AFTER UPDATE OF title, description ON {table} BEGIN
+                 INSERT INTO {search} ({search}, rowid, title, description) VALUES ('delete', old.id, old.title, old.description);
+                 INSERT INTO {search} (rowid, title, description) VALUES (new.id, new.title, new.description);
+             END;
+             """
+REBUILD_CMD = "INSERT INTO {search} ({search}) VALUES ('rebuild');"
+
+CREATE_CMD = ''.join(SEARCH_TABLE_CMD.format(table=table, search=search) for table, search in SEARCH_TABLES)
+REBUILD_CMDS = ''.join(REBUILD_CMD.format(search=search) for _, search in SEARCH_TABLES)
+
+# bm25 is smaller for better matches
+search_query = """SELECT '{task}' AS tag, rowid AS id, bm25(tasks_search) AS rank
+                      FROM tasks_search WHERE tasks_search MATCH :match
+                  UNION ALL
+                  SELECT '{apmt}', rowid, bm25(appointments_search)
+                      FROM appointments_search WHERE appointments_search MATCH :match
+                  ORDER BY rank LIMIT :limit;
+               """.format(task=TASK_TAG, apmt=APMT_TAG)
+doto.model.register_queries('search', search=search_query)
+
+
+def fts5_available():
+    """ Check if the sqlite library was compiled with FTS5. """
+    conn = sqlite3.connect(':memory:')
+    try:
+        conn.execute('CREATE VIRTUAL TABLE test USING fts5(text);')
+        return True
+    except sqlite3.OperationalError:
+        return False
+    finally:
+        conn.close()
+
+
+def match_terms(terms):
+    """
+    Create an FTS5 query which matches the events that contain all terms.
+
+    Every term is quoted, so it can not be misread as an operator or a column name.
+
+    @param terms a list of strings
+
+    @return the query string for MATCH
+    """
+    return ' '.join('"{}"'.format(term.replace('"', '""')) for term in terms)
+
+
+def search(store, terms, limit=20):
+    """
+    Search the tasks and appointments which contain all terms in their title or description.
+
+    An event of the search index which is missing in its table, for example after
+    the table was changed without the triggers, is skipped until the next rebuild.
+
+    @param terms a list of strings
+    @param limit the maximum number of results, None for no limit
+
+    @return a list of tasks and appointments, the best match first
+    """
+    params = {'match': match_terms(terms), 'limit': -1 if limit is None else limit}
+    rows = store.execute(search_query, params).fetchall()
+    tasks = doto.model.task.get_by_ids(store, [row['id'] for row in rows if row['tag'] == TASK_TAG])
+    apmts = doto.model.apmt.get_by_ids(store, [row['id'] for row in rows if row['tag'] == APMT_TAG])
+    events = {TASK_TAG: tasks, APMT_TAG: apmts}
+    return [events[row['tag']][row['id']] for row in rows if row['id'] in events[row['tag']]]
+
+
+def rebuild(store):
+    """
+    Create the search tables if they are missing and fill them with all tasks and appointments.
+
+    This brings the search of a store up to date, which was created without FTS5
+    or modified by a program which did not run the triggers.
+    """
+    store.conn.executescript('BEGIN; {} {} COMMIT;'.format(CREATE_CMD, REBUILD_CMDS))
+
+
+# The search tables are created by a migration, so the triggers are created after the tables
+# of the events and the events of an older store are added to the search.
+if fts5_available():
+    doto.model.setup_module(None, (), migrations=((4, CREATE_CMD + REBUILD_CMDS),))
@@ -3,6 +3,8 @@ import copy
 import doto.model
 import doto.statemachine
 import doto.model.crud
+import doto.model.mapper
+import doto.model.repeat
 
 
 CREATE_CMD = """
@@ -72,13 +74,19 @@ class StateHolder(object):
     This class is used to manage the state of a Task object.
 
     The StateHolder class holds the current state of the task and supports
-    methods to manipulate the state of the task.
+    methods to get the next state of the task.
 
     Supported states are pending, started, completed, blocked, interrupted.
 
+    There is only one immutable StateHolder for every state, which all tasks
+    in this state share. So the methods do not change the holder, but return
+    the holder of the next state, which the task has to store.
+
     """
 
+    __slots__ = ('state',)
     states = {}
+    holders = {}
     completed = _add_new_state(states, "c", "completed", doto.statemachine.FinalState)
     pending = _add_new_state(states, "p", "pending")
     started = _add_new_state(states, "s", "started")
@@ -91,9 +99,32 @@ class StateHolder(object):
     blocked.add_neighbor(started, "unblock")
     interrupted.add_neighbor(started, "restart")
 
-    def __init__(self, state=pending):
-        assert state.key in StateHolder.states
-        self.state = state
+    def __new__(cls, state=pending):
+        try:
+            return StateHolder.holders[state.key]
+        except KeyError:
+            assert StateHolder.states[state.key] is state
+            holder = object.__new__(cls)
+            object.__setattr__(holder, 'state', state)
+            StateHolder.holders[state.key] = holder
+            return holder
+
+    @staticmethod
+    def from_key(key):
+        """ Get the StateHolder of the state with the key. """
+        return StateHolder(StateHolder.states[key])
+
+    def __setattr__(self, name, value):
+        raise AttributeError("a StateHolder can not be changed")
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, _memo):
+        return self
+
+    def __reduce__(self):
+        return StateHolder.from_key, (self.key,)
 
     @property
     def key(self):
@@ -101,28 +132,37 @@ class StateHolder(object):
         return self.state.key
 
     def complete(self):
-        """ Set the state to complete if itis not already complete. """
+        """
+        Complete the state if it is not already complete.
+
+        @return the completed StateHolder or None if the state is already complete
+        """
         if self.state is StateHolder.completed:
-            return False
-        self.state = StateHolder.completed
-        return True
+            return None
+        return StateHolder(StateHolder.completed)
 
     def start(self):
-        """ Set the state to started if it is not already started.  """
+        """
+        Start the state if it is pending.
+
+        @return the started StateHolder or None if the state is not pending
+        """
         if self.state is not StateHolder.pending:
-            return False
-        self.state = StateHolder.started
-        return True
+            return None
+        return StateHolder(StateHolder.started)
 
     def reset(self):
-        """ Reset the state to pending. """
-        self.state = StateHolder.pending
-        return True
+        """ Get the pending StateHolder. """
+        return StateHolder(StateHolder.pending)
 
     def next_state(self, action):
-        """Set the next state according to the given action."""
+        """
+        Get the next state according to the given action.
+
+        @return the StateHolder of the next state
+        """
         # TODO: unused in cli maybe in gui
-        self.state = self.state.next_state(action)
+        return StateHolder(self.state.next_state(action))
 
     def get_actions(self):
         """
@@ -154,7 +194,7 @@ class StateHolder(object):
     @classmethod
     def type_def(cls):
         def state_converter(char):
-            return StateHolder(StateHolder.states[char.decode()])
+            return StateHolder.from_key(char.decode())
 
         def state_adapter(state):
             return state.key
@@ -164,7 +204,7 @@ class StateHolder(object):
 
 def state_def():
     def state_converter(char):
-        return StateHolder(StateHolder.states[char.decode()])
+        return StateHolder.from_key(char.decode())
 
     def state_adapter(state):
         return state.key
@@ -174,7 +214,7 @@ def state_def():
 
 def final_state_def():
     def state_converter(char):
-        return StateHolder(StateHolder.states[char.decode()])
+        return StateHolder.from_key(char.decode())
 
     def state_adapter(state):
         return state.key
@@ -191,38 +231,16 @@ class Task(doto.model.Event):
 
     """
     __tablename__ = "tasks"
+    __slots__ = ('_difficulty', 'state', 'schedule', 'due', 'repeat')
 
-    def __init__(self, title, description, difficulty=DIFFICULTY.unknown, repeat=None):
-        super().__init__(title, description)
+    def __init__(self, title, description, difficulty=DIFFICULTY.unknown, repeat=None, created=None):
+        super().__init__(title, description, created)
         self.difficulty = difficulty
         self.state = StateHolder()
         self.schedule = doto.model.TimeSpan()
         self.due = None
         self.repeat = repeat
 
-    @staticmethod
-    def row_to_obj(row, store):
-        """
-        Create Task from database row
-        """
-        task = doto.model.unwrap_row(store,
-                                     row,
-                                     Task,
-                                     ('title', 'description', 'difficulty'),
-                                     ('id', 'due', 'created', 'state'),
-                                     foreign_keys=(('repeat', doto.model.repeat),)
-                                     )
-        task.schedule = doto.model.TimeSpan(start=row['start'], end=row['end'])
-        return task
-
-    @staticmethod
-    def obj_to_row(obj):
-        row_dict = doto.model.unwrap_obj(obj, ignore_list=['schedule', 'started'])
-        row_dict['start'] = obj.schedule.start
-        row_dict['end'] = obj.schedule.end
-        row_dict['repeat'] = doto.model.get_id(obj.repeat)
-        return row_dict
-
     @property
     def difficulty(self):
         """ Get the difficulty of the task. """
@@ -241,8 +259,10 @@ class Task(doto.model.Event):
 
         This method marks the task as completed and also sets the end date
         """
-        if not self.state.complete():
+        state = self.state.complete()
+        if state is None:
             return False
+        self.state = state
         now = doto.model.now_with_tz()
         if self.schedule.start is None:
             self.schedule.start = now
@@ -257,8 +277,10 @@ class Task(doto.model.Event):
 
         This method marks the task as started and also sets the start date
         """
-        if not self.state.start():
+        state = self.state.start()
+        if state is None:
             return False
+        self.state = state
         self.schedule.start = doto.model.now_with_tz()
         return True
 
@@ -272,8 +294,7 @@ class Task(doto.model.Event):
 
         Set the state of the task to pending.
         """
-        if not self.state.reset():
-            return False
+        self.state = self.state.reset()
         self.schedule = doto.model.TimeSpan()
         return True
 
@@ -302,6 +323,59 @@ class Task(doto.model.Event):
                 )
 
 
+def _build_row_to_obj(index):
+    """
+    Build the function which creates a Task from a database row.
+
+    @param index a dictionary with the column index of every column name
+    """
+    i_id = index['id']
+    i_title = index['title']
+    i_description = index['description']
+    i_created = index['created']
+    i_state = index['state']
+    i_difficulty = index['difficulty']
+    i_due = index['due']
+    i_start = index['start']
+    i_end = index['end']
+    i_repeat = index['repeat']
+
+    def row_to_obj(row, foreign):
+        """
+        Create Task from database row
+        """
+        task = Task(row[i_title],
+                    row[i_description],
+                    row[i_difficulty],
+                    repeat=foreign['repeat'].get(row[i_repeat]),
+                    created=row[i_created])
+        task.id = row[i_id]
+        task.due = row[i_due]
+        task.state = row[i_state]
+        task.schedule = doto.model.TimeSpan(start=row[i_start], end=row[i_end])
+        return task
+    return row_to_obj
+
+
+def _obj_to_row(obj):
+    """ Create the row parameters of a Task """
+    return {'id': obj.id,
+            'title': obj.title,
+            'description': obj.description,
+            'created': obj.created,
+            'state': obj.state,
+            'difficulty': obj.difficulty,
+            'due': obj.due,
+            'start': obj.schedule.start,
+            'end': obj.schedule.end,
+            'repeat': doto.model.get_id(obj.repeat),
+            }
+
+
+mapper = doto.model.mapper.register(Task, _build_row_to_obj, _obj_to_row,
+                                    foreign_keys=(('repeat', doto.model.repeat.get_by_ids),))
+
+
 TASK_SELECT = """SELECT id,
                         title,
                         description,
@@ -317,10 +391,22 @@ TASK_SELECT = """SELECT id,
 
 
 count_query = 'SELECT COUNT(id) FROM tasks'
+# The state is part of the query string and not a parameter,
+# so the query planner can use the partial indexes of the open tasks.
+OPEN_TASKS_WHERE = "state != '%s'" % StateHolder.completed.key
+open_tasks_query = TASK_SELECT + ' WHERE ' + OPEN_TASKS_WHERE
+# LIMIT -1 is no limit
+many_query = TASK_SELECT + ' LIMIT ?;'
+open_tasks_limit_query = open_tasks_query + ' LIMIT ?;'
+# The pages of the open tasks, which are read from the index tasks_open_due
+open_due_first_query = open_tasks_query + ' AND due IS NOT NULL ORDER BY due, id LIMIT :limit;'
+open_due_page_query = open_tasks_query + """ AND due IS NOT NULL AND (due, id) > (:after_due, :after_id)
+                                            ORDER BY due, id LIMIT :limit;"""
+open_no_due_page_query = open_tasks_query + ' AND due IS NULL AND id > :after_id ORDER BY id LIMIT :limit;'
 
 
 def _get_tasks(store, query, args=None):
-    return store.query(Task.row_to_obj, query, args)
+    return store.query(mapper, query, args)
 
 
 def get_many(store, limit=10):
@@ -333,27 +419,53 @@ def get_many(store, limit=10):
             If limit is zero there is no limit
 
     """
-    if limit is None:
-        return _get_tasks(store, TASK_SELECT + ';')
-    else:
-        return _get_tasks(store, TASK_SELECT + ' LIMIT ?;', (limit,))
+    return _get_tasks(store, many_query, (-1 if limit is None else limit,))
 
 
 def create_repeat(store, task):
-    """ Create a repeated appointment """
+    """
+    Create the next task of a repeated task.
+
+    The new task and the update of its repeat are written in one store transaction.
+
+    @param store the database store
+    @param task the task which was finished
+
+    @return the new task
+    """
     new_task = copy.copy(task)
     new_task.reset()
     now = doto.model.now_with_tz()
     next_dt = now if now > task.due else task.due
     new_task.due = new_task.repeat.next(next_dt)
     new_task.created = now
-    # TODO: This cries for a transaction
-    add_new(store, new_task)
-    new_task.repeat.task = new_task.id
-    doto.model.repeat.update(store, new_task.repeat)
+    with store.transaction():
+        add_new(store, new_task)
+        new_task.repeat.event = new_task.id
+        doto.model.repeat.update(store, new_task.repeat)
     return new_task
 
 
+def add_repeated(store, task, rule_pattern):
+    """
+    Add a new task with a due date, which repeats with the rule_pattern.
+
+    The task and its repeat are written in one store transaction.
+
+    @param store the database store
+    @param task the new task
+    @param rule_pattern a pattern of doto.model.repeat.PATTERNS
+
+    @return the new task
+    """
+    with store.transaction():
+        add_new(store, task)
+        task.repeat = doto.model.repeat.parse(rule_pattern, task.due, task.id)
+        doto.model.repeat.add_new(store, task.repeat)
+        update(store, task)
+    return task
+
+
 def get_open_tasks(store, limit=20):
     """
     Get all task which are not completed.
@@ -364,12 +476,63 @@ def get_open_tasks(store, limit=20):
 
     @return A list of unfinished tasks
     """
-    if limit is None:
-        return _get_tasks(store,
-                          TASK_SELECT + 'WHERE state != ? ;', (StateHolder.completed,))
+    return _get_tasks(store, open_tasks_limit_query, (-1 if limit is None else limit,))
+
+
+def iter_open_tasks(store, limit=20):
+    """
+    Get all task which are not completed while they are read from the store.
+
+    The tasks are ordered like the pages of iter_open_tasks_page.
+
+    @param limit Set the maximum number of returned items, None for no limit
+
+    @return A generator of unfinished tasks
+    """
+    return iter_open_tasks_page(store, after=None, size=limit)
+
+
+def page_key(task):
+    """
+    Get the key of a task in the order of the pages.
+
+    @return the tuple (due, id)
+    """
+    return task.due, task.id
+
+
+def iter_open_tasks_page(store, after=None, size=20):
+    """
+    Get a page of the tasks which are not completed.
+
+    The tasks are ordered by their due date and their id,
+    the tasks without a due date come last.
+    A page starts after the key of the last task of the page before,
+    so the store seeks to the start of the page in the index
+    and does not read the tasks of the pages before.
+
+    @param after the page_key of the last task of the previous page, None for the first page
+    @param size the maximum number of tasks of the page, None for no limit
+
+    @return A generator of the tasks of the page
+    """
+    if after is None:
+        pages = ((open_due_first_query, {}),
+                 (open_no_due_page_query, {'after_id': 0}))
+    elif after[0] is None:
+        pages = ((open_no_due_page_query, {'after_id': after[1]}),)
     else:
-        return _get_tasks(store,
-                          TASK_SELECT + 'WHERE state != ? LIMIT ?;', (StateHolder.completed, limit,))
+        pages = ((open_due_page_query, {'after_due': after[0], 'after_id': after[1]}),
+                 (open_no_due_page_query, {'after_id': 0}))
+
+    count = 0
+    for query, params in pages:
+        if size is not None and count >= size:
+            return
+        params['limit'] = -1 if size is None else size - count
+        for task in store.iter_query(mapper, query, params):
+            count += 1
+            yield task
 
 
 insert_query = """INSERT INTO tasks ( title,  description,  created,  state,  difficulty,  due,  start,  end,  repeat)
@@ -389,13 +552,31 @@ update_query = """UPDATE tasks SET title = :title,
                """
 delete_query = 'DELETE FROM tasks WHERE id = ?;'
 select_query = TASK_SELECT + ' WHERE id = :id;'
-update = doto.model.crud.update(update_query, Task)
-add_new = doto.model.crud.insert(insert_query, Task, add_fn=doto.model.crud.add_and_cache)
-delete = doto.model.crud.delete(delete_query)
-get = doto.model.crud.get(select_query, Task)
+select_ids_query = TASK_SELECT + ' WHERE id IN ({});'
+update = doto.model.crud.update(update_query, mapper)
+add_new = doto.model.crud.insert(insert_query, mapper,
+                                 add_fn=doto.model.crud.add_and_cache,
+                                 add_many_fn=doto.model.crud.add_many_and_cache)
+add_many = doto.model.crud.insert_many(insert_query, mapper)
+delete = doto.model.crud.delete(delete_query, mapper)
+get = doto.model.crud.get(select_query, mapper)
+get_by_ids = doto.model.crud.get_by_ids(select_ids_query, mapper)
 get_count = doto.model.crud.get_count(count_query)
-
-
-doto.model.setup_module(CREATE_CMD, (StateHolder.type_def(),
-                                     state_def(),
-                                     final_state_def()))
+doto.model.register_queries('task', count=count_query, many=many_query, open_tasks_limit=open_tasks_limit_query,
+                            open_due_first=open_due_first_query, open_due_page=open_due_page_query,
+                            open_no_due_page=open_no_due_page_query, insert=insert_query, update=update_query,
+                            delete=delete_query, select=select_query)
+doto.model.register_cache_type(b'T', Task, get)
+
+
+INDEX_CMD = """
+            CREATE INDEX IF NOT EXISTS tasks_open_due ON tasks (due) WHERE {open_tasks};
+            CREATE INDEX IF NOT EXISTS tasks_repeat ON tasks (repeat) WHERE repeat IS NOT NULL;
+            """.format(open_tasks=OPEN_TASKS_WHERE)
+
+doto.model.setup_module(CREATE_CMD,
+                        (StateHolder.type_def(),
+                         state_def(),
+                         final_state_def()),
+                        migrations=((1, doto.model.timestamp_migration('tasks', ('created', 'due', 'start', 'end'))),
+                                    (3, INDEX_CMD)))
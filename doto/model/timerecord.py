@@ -1,4 +1,12 @@
+import collections
+import datetime
+import functools
+
+import pytz
+
 import doto.model
+import doto.model.crud
+import doto.model.mapper
 import doto.model.task
 
 CREATE_CMD = """
@@ -25,6 +33,8 @@ class Timerecord(object):
     This should come in handy for freelancers (like me).
     """
 
+    __slots__ = ('id', 'span', 'task')
+
     def __init__(self, start, end=None, task_event=None):
         """
         """
@@ -32,30 +42,41 @@ class Timerecord(object):
         self.span = doto.model.TimeSpan(start=start, end=end)
         self.task = task_event
 
-    @staticmethod
-    def row_to_obj(row, store):
+
+def _build_row_to_obj(index):
+    """
+    Build the function which creates a Timerecord from a database row.
+
+    @param index a dictionary with the column index of every column name
+    """
+    i_id = index['id']
+    i_task_id = index['task_id']
+    i_start = index['start']
+    i_end = index['end']
+
+    def row_to_obj(row, foreign):
         """
-        Create Task from database row
+        Create Timerecord from database row
         """
-        timerecord = doto.model.unwrap_row(store,
-                                           row,
-                                           Timerecord,
-                                           ('start', 'end'),
-                                           ('id',))
-        task_id = row['task_id']
-        if task_id is None:
-            timerecord.task = None
-        else:
-            timerecord.task = doto.model.task.get(store, task_id)
+        timerecord = Timerecord(row[i_start],
+                                row[i_end],
+                                foreign['task_id'].get(row[i_task_id]))
+        timerecord.id = row[i_id]
         return timerecord
+    return row_to_obj
+
+
+def _obj_to_row(obj):
+    """ Create the row parameters of a Timerecord """
+    return {'id': obj.id,
+            'task_id': doto.model.get_id(obj.task),
+            'start': obj.span.start,
+            'end': obj.span.end,
+            }
+
 
-    @staticmethod
-    def obj_to_row(obj):
-        row_dict = doto.model.unwrap_obj(obj, ignore_list=['span', 'task'])
-        row_dict['task_id'] = obj.task.id if obj.task is not None else None
-        row_dict['start'] = obj.span.start
-        row_dict['end'] = obj.span.end
-        return row_dict
+mapper = doto.model.mapper.register(Timerecord, _build_row_to_obj, _obj_to_row,
+                                   foreign_keys=(('task_id', doto.model.task.get_by_ids),))
 
 
 def get_started_timerecords(store):
@@ -68,9 +89,100 @@ def get_started_timerecords(store):
 
     @return A list of unfinished tasks
     """
-    return store.query(Timerecord.row_to_obj, 'SELECT * FROM timerecords WHERE end IS NULL;', ())
+    return store.query(mapper, started_query, ())
+
+
+ReportRow = collections.namedtuple('ReportRow', ('period', 'task_id', 'title', 'records', 'seconds'))
+# The title in the report of the records of a task which was deleted
+DELETED_TASK_TITLE = "(deleted task)"
+
+# The local period of a record, local_jd is the julian day of its start in local time.
+# A week is named after its Monday.
+REPORT_PERIODS = {'day': "date(local_jd)",
+                  'week': "date(local_jd, '-6 days', 'weekday 1')",
+                  'month': "strftime('%Y-%m', local_jd)",
+                  'total': "NULL",
+                  }
+
+# utc_offset is a function of the connection, which is created by report
+report_query_fmt = """WITH records AS (
+                          SELECT task_id,
+                                 julianday(COALESCE(end, :now), 'unixepoch') - julianday(start, 'unixepoch') AS days,
+                                 julianday(start + utc_offset(start), 'unixepoch') AS local_jd
+                          FROM timerecords
+                          WHERE start >= :since AND start < :until
+                      )
+                      SELECT {period} AS period, {task_id} AS task_id, {title} AS title,
+                             COUNT(*) AS records, CAST(ROUND(SUM(days) * 86400) AS INTEGER) AS seconds
+                      FROM records {join}
+                      GROUP BY 1, 2
+                      ORDER BY 1, 2;
+                   """
+
+
+def _report_query(period, per_task):
+    if per_task:
+        task_columns = {'task_id': 'records.task_id',
+                        'title': 'CASE WHEN records.task_id IS NOT NULL THEN COALESCE(tasks.title, :deleted_title) END',
+                        'join': 'LEFT JOIN tasks ON tasks.id = records.task_id'}
+    else:
+        task_columns = {'task_id': 'NULL', 'title': 'NULL', 'join': ''}
+    return report_query_fmt.format(period=REPORT_PERIODS[period], **task_columns)
+
+
+report_queries = {(period, per_task): _report_query(period, per_task)
+                  for period in REPORT_PERIODS for per_task in (False, True)}
+
+
+def _utc_offset_fn(local_tz):
+    """
+    Create the SQL function utc_offset(seconds),
+    which returns the offset of local_tz at the UTC seconds since the epoch.
+
+    The offset only changes at full hours, so it is cached per hour.
+    """
+    @functools.lru_cache(maxsize=4096)
+    def hour_offset(hour):
+        date = doto.model.EPOCH + datetime.timedelta(hours=hour)
+        return int(date.astimezone(local_tz).utcoffset().total_seconds())
+
+    def utc_offset(seconds):
+        return hour_offset(seconds // 3600)
+    return utc_offset
+
 
+def report(store, local_tz, period='week', per_task=False, since=None, until=None):
+    """
+    Sum up the worked time of the timerecords per local period and task.
+
+    The sums are computed by the database and the rows are returned
+    while they are read, so the timerecords are never loaded.
+    A timerecord belongs to the period of its local start,
+    a started timerecord counts until now.
+
+    @param local_tz the pytz timezone of the periods
+    @param period 'day', 'week', 'month' or 'total'
+    @param per_task if True every period is split by the tasks
+    @param since only records which started at or after this date, None for all
+    @param until only records which started before this date, None for all
 
+    @return a generator of ReportRow tuples, ordered by period and task id
+    """
+    store.conn.create_function('utc_offset', 1, _utc_offset_fn(local_tz))
+    params = {'now': doto.model.now_with_tz(),
+              'deleted_title': DELETED_TASK_TITLE,
+              'since': doto.model.EPOCH if since is None else since,
+              'until': datetime.datetime.max.replace(tzinfo=pytz.utc) if until is None else until}
+    cursor = store.execute(report_queries[period, per_task], params)
+    while True:
+        rows = cursor.fetchmany(doto.model.mapper.ITER_CHUNK_SIZE)
+        if not rows:
+            return
+        for row in rows:
+            yield ReportRow(*row)
+
+
+started_query = 'SELECT * FROM timerecords WHERE end IS NULL;'
 insert_query = """INSERT INTO timerecords ( task_id,  start,  end)
                               VALUES      (:task_id, :start, :end)
                   ;
@@ -82,8 +194,20 @@ update_query = """UPDATE timerecords SET task_id = :task_id,
                """
 delete_query = 'DELETE FROM timerecords WHERE id = ?;'
 
-update = doto.model.crud.update(update_query, Timerecord)
-add_new = doto.model.crud.insert(insert_query, Timerecord)
-delete = doto.model.crud.delete(delete_query)
-
-doto.model.setup_module(CREATE_CMD, ())
+update = doto.model.crud.update(update_query, mapper)
+add_new = doto.model.crud.insert(insert_query, mapper)
+add_many = doto.model.crud.insert_many(insert_query, mapper)
+delete = doto.model.crud.delete(delete_query, mapper)
+doto.model.register_queries('timerecord', started=started_query, insert=insert_query, update=update_query,
+                            delete=delete_query,
+                            **{'report_{}{}'.format(period, '_per_task' if per_task else ''): query
+                               for (period, per_task), query in report_queries.items()})
+
+INDEX_CMD = """
+            CREATE INDEX IF NOT EXISTS timerecords_started ON timerecords (start) WHERE end IS NULL;
+            CREATE INDEX IF NOT EXISTS timerecords_task ON timerecords (task_id);
+            """
+
+doto.model.setup_module(CREATE_CMD, (),
+                        migrations=((1, doto.model.timestamp_migration('timerecords', ('start', 'end'))),
+                                    (3, INDEX_CMD)))
@@ -0,0 +1,104 @@
+"""
+Timers for the phases of a doto command.
+
+The phases of a command are
+    config  reading the config file
+    import  parsing the command line and importing the command and the model
+    open    opening the store and setting its PRAGMAs
+    ddl     creating the tables and running the migrations
+    query   executing the SQL statements
+    render  the rest of the command, mostly converting the rows and printing them
+    save    committing the store and writing the cache files
+
+Phases can be nested, the time of a phase does not include the time of the
+phases inside of it. So the query phase inside of the render phase is only
+counted once and the sum of all phases is the time of the command.
+"""
+import time
+
+
+class Timings(object):
+    """ Timings sums up the time of every phase. """
+
+    def __init__(self):
+        self.phases = {}
+        self.order = []
+        self.__stack = []
+
+    def phase(self, name):
+        """
+        Get a context manager which adds the time of its block to the phase name.
+
+        @param name the name of the phase
+        """
+        return _Phase(self, name)
+
+    def _start(self, name):
+        if name not in self.phases:
+            self.phases[name] = 0.0
+            self.order.append(name)
+        self.__stack.append(0.0)
+
+    def _stop(self, name, elapsed):
+        nested = self.__stack.pop()
+        if self.__stack:
+            self.__stack[-1] += elapsed
+        self.phases[name] += elapsed - nested
+
+    def total(self):
+        """ Get the sum of the time of all phases in seconds. """
+        return sum(self.phases.values())
+
+    def print_timings(self, stream):
+        """
+        Print the time of every phase in the order in which they were first started.
+
+        @param stream the file object the timings are written to
+        """
+        for name in self.order:
+            stream.write("{:<8} {:>9.2f} ms\n".format(name, self.phases[name] * 1000))
+        stream.write("{:<8} {:>9.2f} ms\n".format("total", self.total() * 1000))
+
+
+class _Phase(object):
+    """ The context manager of one run of a phase. """
+
+    __slots__ = ('timings', 'name', 'start')
+
+    def __init__(self, timings, name):
+        self.timings = timings
+        self.name = name
+
+    def __enter__(self):
+        self.timings._start(self.name)
+        self.start = time.perf_counter()
+
+    def __exit__(self, *_):
+        self.timings._stop(self.name, time.perf_counter() - self.start)
+
+
+class NoTimings(object):
+    """ NoTimings has the interface of Timings and measures nothing. """
+
+    phases = {}
+    order = []
+
+    def phase(self, _name):
+        return NO_PHASE
+
+    def total(self):
+        return 0.0
+
+
+class _NoPhase(object):
+    """ A context manager which does nothing. """
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *_):
+        pass
+
+
+NO_PHASE = _NoPhase()
+NO_TIMINGS = NoTimings()
@@ -1,18 +1,21 @@
 """ Tests for the DBManager """
 import unittest
+import datetime
 import shutil
 import os.path
+import sqlite3
 import tempfile
 
+import pytz
+
 import doto.model
+import doto.model.identity
 import doto.model.timerecord
 import doto.model.task
 import doto.model.apmt
 import doto.model.repeat
 
 TEST_DB_FILE = ""
-TEST_CACHE_FILE = "./test/store/cache"
-TEST_LAST_FILE = "./test/store/last"
 
 
 class TestDBManager(unittest.TestCase):
@@ -21,11 +24,15 @@ class TestDBManager(unittest.TestCase):
 
     def setUp(self):
         """ Create a new Db store. """
-        self.store = doto.model.Store(TEST_DB_FILE, TEST_CACHE_FILE, TEST_LAST_FILE)
+        self.tmp_dir = tempfile.mkdtemp()
+        self.store = doto.model.Store(TEST_DB_FILE,
+                                      os.path.join(self.tmp_dir, "cache"),
+                                      os.path.join(self.tmp_dir, "last"))
 
     def tearDown(self):
         """ Close the connection after everx test. """
         self.store.close()
+        shutil.rmtree(self.tmp_dir)
 
     def test_init(self):
         """ Test the constructor of the database store. """
@@ -103,6 +110,207 @@ class TestDBManager(unittest.TestCase):
         repeat_two = doto.model.repeat.get(self.store, repeat.id)
         self.assertEqual(repeat_two, repeat)
 
+    def test_timestamp(self):
+        """ Test if timestamps are stored as integer seconds and read back. """
+        test_task = doto.model.task.Task("title", "description")
+        test_task.due = datetime.datetime(2016, 2, 29, 23, 59, 58, tzinfo=pytz.utc)
+        doto.model.task.add_new(self.store, test_task)
+        (due, due_type) = self.store.execute('SELECT due + 0, typeof(due) FROM tasks;').fetchone()
+        self.assertEqual(due_type, 'integer')
+        self.assertEqual(due, 1456790398)
+        (task,) = doto.model.task.get_many(self.store, 10)
+        self.assertEqual(task.due, test_task.due)
+
+    def test_schema_version(self):
+        """ Test if all migrations are applied and logged. """
+        versions = [version for version, _ in self.store.get_migrations()]
+        self.assertEqual(versions, sorted(doto.model.Store.MIGRATIONS))
+        self.assertEqual(self.store.get_version(), versions[-1])
+
+    def test_bootstrap(self):
+        """ Test if the tables are only created if the schema version of the store is old. """
+        self.assertEqual(max(doto.model.Store.MIGRATIONS), doto.model.SCHEMA_VERSION)
+        self.assertEqual(doto.model.Store.CREATE_CMDS[0], doto.model.SCHEMA_VERSION_CMD)
+        self.assertFalse(self.store.bootstrap())
+
+        created = []
+
+        class CreateStore(doto.model.Store):
+            def create(self):
+                created.append(self)
+                super().create()
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filename = os.path.join(tmp_dir, "store.db")
+            cache_file = os.path.join(tmp_dir, "cache")
+            last_file = os.path.join(tmp_dir, "last")
+            new_store = CreateStore(filename, cache_file, last_file)
+            self.assertEqual(new_store.get_version(), doto.model.SCHEMA_VERSION)
+            new_store.close()
+            CreateStore(filename, cache_file, last_file).close()
+        self.assertEqual(created, [new_store])
+
+    def test_open_tasks_index(self):
+        """ Test if the open tasks are selected with the partial index. """
+        plan = self.store.explain(doto.model.task.open_tasks_query)
+        self.assertIn('tasks_open_due', ' '.join(detail for _, _, detail in plan))
+
+    def test_add_many(self):
+        """ Test if the ids of a bulk insert match the ids of the new rows. """
+        doto.model.task.add_new(self.store, doto.model.task.Task("first", "description"))
+        tasks = doto.model.task.add_many(self.store, (doto.model.task.Task("title %i" % i, "description") for i in range(5)))
+        self.store.save()
+        rows = self.store.execute('SELECT id, title FROM tasks WHERE id > 1 ORDER BY id;').fetchall()
+        self.assertEqual([tuple(row) for row in rows], [(task.id, task.title) for task in tasks])
+        self.assertEqual(doto.model.task.add_many(self.store, []), [])
+
+    def test_add_many_timerecords(self):
+        """ Test if many timerecords are added with one statement. """
+        start = datetime.datetime(2016, 1, 1, tzinfo=pytz.utc)
+        records = [doto.model.timerecord.Timerecord(start + datetime.timedelta(hours=i),
+                                                    start + datetime.timedelta(hours=i, minutes=30))
+                   for i in range(1000)]
+        doto.model.timerecord.add_many(self.store, records)
+        self.store.save()
+        self.store.identity_map.clear()
+        (record,) = self.store.query(doto.model.timerecord.mapper, "SELECT * FROM timerecords WHERE id = ?;", (records[-1].id,))
+        self.assertEqual(record.span.start, records[-1].span.start)
+        (count,) = self.store.execute('SELECT COUNT(*) FROM timerecords;').fetchone()
+        self.assertEqual(count, 1000)
+
+    def test_transaction(self):
+        """ Test if a failed nested transaction only rolls back its own statements. """
+        def titles():
+            return [row['title'] for row in self.store.execute('SELECT title FROM tasks ORDER BY id;')]
+
+        with self.store.transaction():
+            doto.model.task.add_new(self.store, doto.model.task.Task("outer", "description"))
+            with self.assertRaises(ValueError):
+                with self.store.transaction():
+                    doto.model.task.add_new(self.store, doto.model.task.Task("inner", "description"))
+                    raise ValueError()
+            self.assertEqual(titles(), ["outer"])
+        self.assertTrue(self.store.conn.in_transaction)
+        self.store.save()
+        self.assertFalse(self.store.conn.in_transaction)
+
+        with self.assertRaises(ValueError):
+            with self.store.transaction():
+                doto.model.task.add_new(self.store, doto.model.task.Task("failed", "description"))
+                raise ValueError()
+        self.store.save()
+        self.assertEqual(titles(), ["outer"])
+        self.assertIsNotNone(self.store.get_last())
+
+    def test_atomic_repeat(self):
+        """ Test if a repeated task is not added if its repeat can not be added. """
+        task = doto.model.task.Task("title", "description")
+        task.due = datetime.datetime(2016, 1, 1, tzinfo=pytz.utc)
+        with self.assertRaises(KeyError):
+            doto.model.task.add_repeated(self.store, task, '@never')
+        self.store.save()
+        self.assertEqual(doto.model.task.get_count(self.store), 0)
+
+        new_task = doto.model.task.Task("title", "description")
+        new_task.due = datetime.datetime(2016, 1, 1, tzinfo=pytz.utc)
+        doto.model.task.add_repeated(self.store, new_task, '@daily')
+        self.store.save()
+        next_task = doto.model.task.create_repeat(self.store, new_task)
+        self.store.save()
+        repeat = doto.model.repeat.get(self.store, new_task.repeat.id)
+        self.assertEqual(repeat.event, next_task.id)
+
+    def test_task_pages(self):
+        """ Test if the pages of the open tasks contain every open task once in the order of due and id. """
+        start = datetime.datetime(2016, 1, 1, tzinfo=pytz.utc)
+        tasks = [doto.model.task.Task("title %i" % i, "description") for i in range(50)]
+        for i, task in enumerate(tasks):
+            task.due = None if i % 4 == 0 else start + datetime.timedelta(days=i % 7)
+        tasks[1].done()
+        doto.model.task.add_many(self.store, tasks)
+        self.store.save()
+
+        pages = []
+        after = None
+        while True:
+            page = list(doto.model.task.iter_open_tasks_page(self.store, after=after, size=6))
+            if not page:
+                break
+            self.assertLessEqual(len(page), 6)
+            pages += page
+            after = doto.model.task.page_key(page[-1])
+        open_tasks = [task for task in tasks if task.state != doto.model.task.StateHolder.completed]
+        expected = (sorted((task for task in open_tasks if task.due is not None), key=doto.model.task.page_key) +
+                    [task for task in open_tasks if task.due is None])
+        self.assertEqual([task.id for task in pages], [task.id for task in expected])
+        self.assertEqual(list(doto.model.task.iter_open_tasks_page(self.store, size=None)), expected)
+
+    def test_apmt_pages(self):
+        """ Test if the pages of the appointments start after the key of the last page. """
+        start = datetime.datetime(2016, 1, 1, tzinfo=pytz.utc)
+        apmts = [doto.model.apmt.Appointment("title %i" % i, start + datetime.timedelta(days=i % 3)) for i in range(9)]
+        doto.model.apmt.add_many(self.store, apmts)
+        self.store.save()
+        first = list(doto.model.apmt.iter_all(self.store, start, size=4))
+        second = list(doto.model.apmt.iter_all(self.store, start, after=doto.model.apmt.page_key(first[-1]), size=4))
+        rest = list(doto.model.apmt.iter_all(self.store, start, after=doto.model.apmt.page_key(second[-1])))
+        self.assertEqual([apmt.id for apmt in first + second + rest],
+                         [apmt.id for apmt in sorted(apmts, key=doto.model.apmt.page_key)])
+
+        current = list(doto.model.apmt.iter_current(self.store, start, datetime.timedelta(days=2),
+                                                    after=doto.model.apmt.page_key(first[-1])))
+        self.assertEqual([apmt.id for apmt in current], [apmt.id for apmt in second[:2]])
+
+    def test_statement_stats(self):
+        """ Test if the statement cache counts a miss for a new statement and a hit for a cached one. """
+        stats = doto.model.StatementStats(2)
+        for query in ("a", "b", "a", "c", "b", "b"):
+            stats.use(query)
+        self.assertEqual((stats.hits, stats.misses), (2, 4))
+        self.assertEqual(stats.statements["b"], 3)
+
+    def test_query_registry(self):
+        """ Test if the statements of the model are registered and a get by ids uses only a few of them. """
+        self.assertEqual(doto.model.QUERIES['task.select'], doto.model.task.select_query)
+        self.assertEqual(doto.model.query_name(doto.model.task.select_query), 'task.select')
+        tasks = doto.model.task.add_many(self.store, [doto.model.task.Task("title %i" % i, "") for i in range(40)])
+        self.store.identity_map.clear()
+        for count in range(17, 33):
+            found = doto.model.task.get_by_ids(self.store, [task.id for task in tasks[:count]])
+            self.assertEqual(sorted(found), [task.id for task in tasks[:count]])
+            self.store.identity_map.clear()
+        by_ids = [query for query in self.store.statement_stats.statements if 'IN (' in query]
+        self.assertEqual([doto.model.query_name(query) for query in by_ids], ['task.by_ids_32'])
+
+    def test_timerecord_report(self):
+        """ Test if the worked time is summed up per local day, week and task. """
+        task = doto.model.task.Task("title", "description")
+        doto.model.task.add_new(self.store, task)
+        berlin = pytz.timezone("Europe/Berlin")
+        # 22:30 UTC is 23:30 in Berlin before the switch to summer time on the 27th and 00:30 after it
+        start = datetime.datetime(2016, 3, 26, 22, 30, tzinfo=pytz.utc)
+        records = [doto.model.timerecord.Timerecord(start + datetime.timedelta(days=i),
+                                                    start + datetime.timedelta(days=i, minutes=30),
+                                                    task if i % 2 else None)
+                   for i in range(10)]
+        doto.model.timerecord.add_many(self.store, records)
+        self.store.save()
+
+        days = list(doto.model.timerecord.report(self.store, berlin, period='day'))
+        self.assertEqual([row.period for row in days[:3]], ['2016-03-26', '2016-03-28', '2016-03-29'])
+        weeks = list(doto.model.timerecord.report(self.store, berlin, period='week'))
+        self.assertEqual([(row.period, row.records, row.seconds) for row in weeks],
+                         [('2016-03-21', 1, 1800), ('2016-03-28', 7, 7 * 1800), ('2016-04-04', 2, 2 * 1800)])
+        per_task = list(doto.model.timerecord.report(self.store, berlin, period='total', per_task=True,
+                                                     since=start + datetime.timedelta(days=1)))
+        self.assertEqual([(row.task_id, row.title, row.records) for row in per_task],
+                         [(None, None, 4), (task.id, "title", 5)])
+
+        doto.model.task.delete(self.store, task)
+        per_task = list(doto.model.timerecord.report(self.store, berlin, period='total', per_task=True))
+        self.assertEqual([(row.task_id, row.title) for row in per_task],
+                         [(None, None), (task.id, doto.model.timerecord.DELETED_TASK_TITLE)])
+
     def test_fail_delete(self):
         """ Test if a task with no id can't be deleted. """
         test_task = doto.model.task.Task("title", "description")
@@ -110,6 +318,139 @@ class TestDBManager(unittest.TestCase):
         self.store.save()
 
 
+class TestRepeats(unittest.TestCase):
+
+    """Tests for the materialisation of repeated appointments."""
+
+    def setUp(self):
+        """ Create a new Db store with an hourly appointment that started five hours ago. """
+        self.tmp_dir = tempfile.mkdtemp()
+        self.store = doto.model.Store(TEST_DB_FILE,
+                                      os.path.join(self.tmp_dir, "cache"),
+                                      os.path.join(self.tmp_dir, "last"))
+        self.now = datetime.datetime(2016, 5, 4, 12, 30, tzinfo=pytz.utc)
+        self.start = self.now - datetime.timedelta(hours=5)
+        self.apmt = doto.model.apmt.Appointment("title", self.start)
+        doto.model.apmt.add_new(self.store, self.apmt)
+        self.apmt.repeat = doto.model.repeat.parse('@hourly', self.start, self.apmt.id,
+                                                   materialised_until=self.start)
+        doto.model.repeat.add_new(self.store, self.apmt.repeat)
+        doto.model.apmt.update(self.store, self.apmt)
+        self.store.save()
+
+    def tearDown(self):
+        """ Close the connection after every test. """
+        self.store.close()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_catch_up(self):
+        """ Test if all missed occurrences and the next one are added at once. """
+        new_apmts = doto.model.apmt.create_repeats(self.store, self.now)
+        starts = [apmt.schedule.start for apmt in new_apmts]
+        self.assertEqual(starts, [self.start + datetime.timedelta(hours=h) for h in range(1, 7)])
+        repeat = doto.model.repeat.get(self.store, self.apmt.repeat.id)
+        self.assertEqual(repeat.event, new_apmts[-1].id)
+        self.assertEqual(repeat.materialised_until, starts[-1])
+        self.assertEqual(doto.model.apmt.get_count(self.store), 7)
+
+    def test_evicted_repeats(self):
+        """ Test if every due repeat is added when the identity map is smaller than the number of repeats. """
+        for i in range(3):
+            apmt = doto.model.apmt.Appointment("title %d" % i, self.start)
+            doto.model.apmt.add_repeated(self.store, apmt, '@hourly')
+        self.store.save()
+        self.store.identity_map = doto.model.identity.IdentityMap(2)
+        new_apmts = doto.model.apmt.create_repeats(self.store, self.now)
+        self.assertEqual(len(new_apmts), 4 * 6)
+        self.assertEqual(doto.model.apmt.get_count(self.store), 4 * 7)
+
+    def test_nothing_due(self):
+        """ Test if nothing is written if no repeat is due. """
+        doto.model.apmt.create_repeats(self.store, self.now)
+        self.store.save()
+        changes = self.store.conn.total_changes
+        self.assertEqual(doto.model.apmt.create_repeats(self.store, self.now), [])
+        self.assertEqual(self.store.conn.total_changes, changes)
+        self.assertFalse(self.store.conn.in_transaction)
+
+
+class TestOccurrences(unittest.TestCase):
+
+    """Tests for the expanded occurrences of repeated appointments."""
+
+    def setUp(self):
+        """ Create a new Db store with a daily appointment that started three days ago. """
+        self.tmp_dir = tempfile.mkdtemp()
+        self.store = doto.model.Store(TEST_DB_FILE,
+                                      os.path.join(self.tmp_dir, "cache"),
+                                      os.path.join(self.tmp_dir, "last"))
+        self.now = doto.model.now_with_tz().replace(microsecond=0)
+        self.start = self.now - datetime.timedelta(days=3, hours=1)
+        self.apmt = doto.model.apmt.Appointment("daily", self.start, end=self.start + datetime.timedelta(hours=2))
+        doto.model.apmt.add_new(self.store, self.apmt)
+        self.apmt.repeat = doto.model.repeat.parse('@daily', self.start, self.apmt.id,
+                                                   materialised_until=self.start)
+        doto.model.repeat.add_new(self.store, self.apmt.repeat)
+        doto.model.apmt.update(self.store, self.apmt)
+        self.single = doto.model.apmt.Appointment("single", self.now + datetime.timedelta(days=2))
+        doto.model.apmt.add_new(self.store, self.single)
+        self.store.save()
+
+    def tearDown(self):
+        """ Close the connection after every test. """
+        self.store.close()
+        shutil.rmtree(self.tmp_dir)
+
+    def daily_starts(self, apmts):
+        return [apmt.schedule.start for apmt in apmts if apmt.title == "daily"]
+
+    def test_current(self):
+        """ Test if every occurrence of the next 14 days is returned in the order of the start. """
+        apmts = doto.model.apmt.get_current(self.store, self.now, datetime.timedelta(days=14))
+        expected = [self.start + datetime.timedelta(days=d) for d in range(4, 18)]
+        self.assertEqual(self.daily_starts(apmts), expected)
+        self.assertEqual([apmt.schedule.start for apmt in apmts], sorted(apmt.schedule.start for apmt in apmts))
+        self.assertIn("single", [apmt.title for apmt in apmts])
+        for apmt in apmts:
+            if apmt.title == "daily":
+                self.assertEqual(apmt.schedule.time_delta(), datetime.timedelta(hours=2))
+        # an occurrence is a copy of the last appointment of the repeat
+        self.assertEqual(len({apmt.id for apmt in apmts if apmt.title == "daily"}), 1)
+
+    def test_window(self):
+        """ Test if the occurrences are expanded once for the window and again when the window has moved. """
+        doto.model.apmt.get_current(self.store, self.now, datetime.timedelta(days=14))
+        self.store.save()
+        changes = self.store.conn.total_changes
+        doto.model.apmt.get_current(self.store, self.now + datetime.timedelta(days=1), datetime.timedelta(days=14))
+        self.assertEqual(self.store.conn.total_changes, changes)
+
+        later = self.now + doto.model.apmt.OCCURRENCE_WINDOW + datetime.timedelta(days=20)
+        apmts = doto.model.apmt.get_current(self.store, later, datetime.timedelta(days=3))
+        self.assertEqual(len(self.daily_starts(apmts)), 3)
+
+    def test_materialised(self):
+        """ Test if an occurrence is not returned twice after its appointment was added to the store. """
+        doto.model.apmt.get_current(self.store, self.now, datetime.timedelta(days=14))
+        doto.model.apmt.create_repeats(self.store, self.now + datetime.timedelta(days=5))
+        apmts = doto.model.apmt.get_current(self.store, self.now, datetime.timedelta(days=14))
+        starts = self.daily_starts(apmts)
+        self.assertEqual(starts, [self.start + datetime.timedelta(days=d) for d in range(4, 18)])
+        (count,) = self.store.execute('SELECT COUNT(*) FROM occurrences WHERE start <= ?;',
+                                      (self.start + datetime.timedelta(days=9),)).fetchone()
+        self.assertEqual(count, 0)
+
+    def test_rebased_rule(self):
+        """ Test if the next occurrence of an old rule is found from the materialised_until date. """
+        start = datetime.datetime(2000, 1, 1, 0, 30, tzinfo=pytz.utc)
+        repeat = doto.model.repeat.parse('@hourly', start, None,
+                                         materialised_until=datetime.datetime(2016, 5, 4, 10, 30, tzinfo=pytz.utc))
+        after = datetime.datetime(2016, 5, 4, 12, 0, tzinfo=pytz.utc)
+        self.assertEqual(repeat.next(after), datetime.datetime(2016, 5, 4, 12, 30, tzinfo=pytz.utc))
+        self.assertEqual(repeat.between(start, start + datetime.timedelta(hours=2)),
+                         [start + datetime.timedelta(hours=1), start + datetime.timedelta(hours=2)])
+
+
 class TestDBFiles(unittest.TestCase):
     """ Tests for creating store files. """
 
@@ -118,11 +459,13 @@ class TestDBFiles(unittest.TestCase):
         """ Set up the test path and base in /tmp """
         cls.base = tempfile.mkdtemp()
         cls.path = os.path.join(cls.base, "test/db/test123/")
+        cls.cache_file = os.path.join(cls.base, "cache")
+        cls.last_file = os.path.join(cls.base, "last")
 
     def test_create_store(self):
         """ Test if we can create a new store file """
         test_file = os.path.join(self.path, "file1.db")
-        store = doto.model.Store(test_file, TEST_CACHE_FILE, TEST_LAST_FILE)
+        store = doto.model.Store(test_file, self.cache_file, self.last_file)
         store.close()
         self.assertTrue(os.path.isfile(test_file))
 
@@ -131,16 +474,96 @@ class TestDBFiles(unittest.TestCase):
         test_file = os.path.join(self.path, "file2.db")
         test_task = doto.model.task.Task("create a file and read it",
                                          "We want a new db file and read this task from it.")
-        store = doto.model.Store(test_file, TEST_CACHE_FILE, TEST_LAST_FILE)
+        store = doto.model.Store(test_file, self.cache_file, self.last_file)
         doto.model.task.add_new(store, test_task)
         store.save()
         self.assertListEqual(doto.model.task.get_open_tasks(store, 10), [test_task])
         store.close()
         self.assertTrue(os.path.isfile(test_file))
-        store = doto.model.Store(test_file, TEST_CACHE_FILE, TEST_LAST_FILE)
+        store = doto.model.Store(test_file, self.cache_file, self.last_file)
         self.assertListEqual(doto.model.task.get_open_tasks(store, 10), [test_task])
         store.close()
 
+    def test_migrate_timestamps(self):
+        """ Test if the text timestamps of an old store are turned into integers. """
+        test_file = os.path.join(self.path, "file3.db")
+        os.makedirs(self.path, exist_ok=True)
+        conn = sqlite3.connect(test_file)
+        conn.executescript(doto.model.task.CREATE_CMD)
+        conn.execute("""INSERT INTO tasks (title, description, created, state, difficulty, due)
+                        VALUES ('title', 'description', ?, 'p', 0, ?);""",
+                     (b'2015-01-02 03:04:05', '2015-02-03 04:05:06'))
+        conn.commit()
+        conn.close()
+
+        store = doto.model.Store(test_file, self.cache_file, self.last_file)
+        self.assertGreaterEqual(store.get_version(), 1)
+        types = store.execute('SELECT typeof(created), typeof(due), typeof(start) FROM tasks;').fetchone()
+        self.assertEqual(tuple(types), ('integer', 'integer', 'null'))
+        (task,) = doto.model.task.get_open_tasks(store, 10)
+        self.assertEqual(task.created, datetime.datetime(2015, 1, 2, 3, 4, 5, tzinfo=pytz.utc))
+        self.assertEqual(task.due, datetime.datetime(2015, 2, 3, 4, 5, 6, tzinfo=pytz.utc))
+        store.close()
+
+    def test_cache_file(self):
+        """ Test if the events of the cache file can be looked up by their cache id. """
+        os.makedirs(self.path, exist_ok=True)
+        cache_file = os.path.join(self.path, "cache")
+        store = doto.model.Store("", cache_file, self.last_file)
+        tasks = [doto.model.task.Task("title %d" % i, "description") for i in range(5)]
+        doto.model.task.add_new(store, tasks)
+        apmt = doto.model.apmt.Appointment("title", doto.model.now_with_tz())
+        doto.model.apmt.add_new(store, apmt)
+        store.add_to_cache(tasks + [apmt])
+        store.save()
+
+        cache, cache_error = doto.model.load_cache(cache_file)
+        self.assertFalse(cache_error)
+        self.assertEqual([item.id for item in cache], [event.id for event in tasks + [apmt]])
+        self.assertEqual(doto.model.get_cache_item(store, 3, doto.model.task.Task), (tasks[3], False))
+        self.assertEqual(doto.model.get_cache_item(store, 5, doto.model.task.Task), (None, False))
+        self.assertEqual(doto.model.get_cache_item(store, 6, doto.model.task.Task), (None, False))
+        cached_apmt, cache_error = doto.model.get_cache_item(store, 5, doto.model.apmt.Appointment)
+        self.assertEqual(cached_apmt.id, apmt.id)
+        self.assertFalse(cache_error)
+        store.close()
+
+    def test_broken_cache_file(self):
+        """ Test if a cache file in an unknown format is reported as cache error. """
+        os.makedirs(self.path, exist_ok=True)
+        cache_file = os.path.join(self.path, "broken_cache")
+        store = doto.model.Store("", cache_file, self.last_file)
+        for content in (b'', b'DOTO', b'\x80\x04\x95 an old pickled cache'):
+            with open(cache_file, 'wb') as broken:
+                broken.write(content)
+            self.assertEqual(doto.model.get_cache_item(store, 0, doto.model.task.Task), (None, True))
+        store.close()
+
+    def test_pragmas(self):
+        """ Test if the PRAGMAs are set and a reader does not block the writer with write-ahead logging. """
+        test_file = os.path.join(self.path, "wal.db")
+        writer = doto.model.Store(test_file, self.cache_file, self.last_file)
+        self.assertEqual(tuple(writer.execute('PRAGMA journal_mode;').fetchone()), ('wal',))
+        self.assertEqual(tuple(writer.execute('PRAGMA synchronous;').fetchone()), (1,))
+        reader = doto.model.Store(test_file, self.cache_file, self.last_file, {'journal_mode': 'wal', 'cache_size': '-100'})
+        self.assertEqual(tuple(reader.execute('PRAGMA cache_size;').fetchone()), (-100,))
+
+        # the reader keeps a read transaction open while the writer commits
+        reader.conn.execute('BEGIN;')
+        self.assertEqual(doto.model.task.get_open_tasks(reader, None), [])
+        doto.model.task.add_new(writer, doto.model.task.Task("title", "description"))
+        writer.save()
+        reader.conn.rollback()
+        self.assertEqual(len(doto.model.task.get_open_tasks(reader, None)), 1)
+        reader.close()
+        writer.close()
+
+    def test_invalid_pragmas(self):
+        """ Test if unknown settings and values which are not allowed are refused. """
+        self.assertRaises(ValueError, doto.model.check_pragmas, {'user_version': '5'})
+        self.assertRaises(ValueError, doto.model.check_pragmas, {'journal_mode': 'wal; DROP TABLE tasks'})
+        self.assertEqual(doto.model.check_pragmas({'synchronous': 'FULL'}), ['PRAGMA synchronous = FULL;'])
+
     @classmethod
     def tearDownClass(cls):
         """ Clear up the directory we created """
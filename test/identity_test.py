@@ -0,0 +1,108 @@
+"""Unittests for the identity map of the store."""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import doto.model
+import doto.model.identity
+import doto.model.task
+import doto.model.timerecord
+
+TEST_DB_FILE = ""
+
+
+class TestIdentityMap(unittest.TestCase):
+
+    """Unittest for the IdentityMap class."""
+
+    def test_get_add(self):
+        """ Test if an added object can be found again. """
+        identity_map = doto.model.identity.IdentityMap(2)
+        obj = object()
+        identity_map.add(object, 1, obj)
+        self.assertIs(identity_map.get(object, 1), obj)
+        self.assertIsNone(identity_map.get(object, 2))
+        self.assertIsNone(identity_map.get(int, 1))
+
+    def test_lru(self):
+        """ Test if the least recently used object is dropped. """
+        identity_map = doto.model.identity.IdentityMap(2)
+        identity_map.add(object, 1, "one")
+        identity_map.add(object, 2, "two")
+        identity_map.get(object, 1)
+        identity_map.add(object, 3, "three")
+        self.assertEqual(len(identity_map), 2)
+        self.assertEqual(identity_map.get(object, 1), "one")
+        self.assertIsNone(identity_map.get(object, 2))
+        self.assertEqual(identity_map.get(object, 3), "three")
+
+    def test_discard(self):
+        """ Test if discard removes the object and ignores unknown objects. """
+        identity_map = doto.model.identity.IdentityMap(2)
+        identity_map.add(object, 1, "one")
+        identity_map.discard(object, 1)
+        identity_map.discard(object, 2)
+        self.assertIsNone(identity_map.get(object, 1))
+
+
+class TestStoreIdentity(unittest.TestCase):
+
+    """Tests for the identity map of the Store."""
+
+    def setUp(self):
+        """ Create a new Db store. """
+        self.tmp_dir = tempfile.mkdtemp()
+        self.store = doto.model.Store(TEST_DB_FILE,
+                                      os.path.join(self.tmp_dir, "cache"),
+                                      os.path.join(self.tmp_dir, "last"))
+
+    def tearDown(self):
+        """ Close the connection after every test. """
+        self.store.close()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_same_object(self):
+        """ Test if a task is only created once. """
+        task = doto.model.task.Task("title", "description")
+        doto.model.task.add_new(self.store, task)
+        (first,) = doto.model.task.get_many(self.store, 10)
+        (second,) = doto.model.task.get_many(self.store, 10)
+        self.assertIs(first, second)
+        self.assertIs(doto.model.task.get(self.store, task.id), first)
+
+    def test_timerecords_share_task(self):
+        """ Test if the timerecords of one task share the task object. """
+        task = doto.model.task.Task("title", "description")
+        doto.model.task.add_new(self.store, task)
+        records = [doto.model.timerecord.Timerecord(doto.model.now_with_tz(), task_event=task)
+                   for _ in range(20)]
+        doto.model.timerecord.add_new(self.store, records)
+
+        queries = []
+        self.store.conn.set_trace_callback(queries.append)
+        result = doto.model.timerecord.get_started_timerecords(self.store)
+        self.store.conn.set_trace_callback(None)
+
+        self.assertEqual(len(queries), 2)
+        self.assertEqual(len({id(record.task) for record in result}), 1)
+
+    def test_update_invalidates(self):
+        """ Test if an update drops the object from the identity map. """
+        task = doto.model.task.Task("title", "description")
+        doto.model.task.add_new(self.store, task)
+        first = doto.model.task.get(self.store, task.id)
+        first.title = "new title"
+        doto.model.task.update(self.store, first)
+        second = doto.model.task.get(self.store, task.id)
+        self.assertIsNot(first, second)
+        self.assertEqual(second.title, "new title")
+
+    def test_delete_invalidates(self):
+        """ Test if a delete drops the object from the identity map. """
+        task = doto.model.task.Task("title", "description")
+        doto.model.task.add_new(self.store, task)
+        doto.model.task.get(self.store, task.id)
+        doto.model.task.delete(self.store, task)
+        self.assertNotIn((doto.model.task.Task, task.id), self.store.identity_map)
@@ -0,0 +1,158 @@
+"""Unittests for the ls command."""
+
+import argparse
+import contextlib
+import datetime
+import io
+import os
+import tempfile
+import unittest
+
+import doto.cli.cmd.apmt
+import doto.cli.cmd.ls
+import doto.cli.printing
+import doto.defaultconfig
+import doto.model
+import doto.model.apmt
+import doto.model.task
+import doto.simpleconf
+
+TEST_DB_FILE = ""
+
+
+class BrokenWriter(doto.cli.printing.LineWriter):
+
+    """A LineWriter whose reader goes away after the first chunk."""
+
+    def flush(self):
+        raise BrokenPipeError()
+
+
+class TestLs(unittest.TestCase):
+
+    """Unittest for the views of the ls command."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.config = doto.simpleconf.Config("test/configs/dotorc.1", doto.defaultconfig.CONF_DEF)
+        # the date widths are cached next to the cache file of the config
+        self.config.path.set_value("cache", os.path.join(self.tmp_dir.name, "cache"))
+        self.store = doto.model.Store(TEST_DB_FILE,
+                                      os.path.join(self.tmp_dir.name, "cache"),
+                                      os.path.join(self.tmp_dir.name, "last"))
+        self.args = argparse.Namespace(all=True, limit=20, view='tasks', page_after=None, page_size=None)
+
+    def tearDown(self):
+        self.store.close()
+        self.tmp_dir.cleanup()
+
+    def add_tasks(self, count):
+        doto.model.task.add_many(self.store, [doto.model.task.Task("task %d" % i, "") for i in range(count)])
+
+    def add_daily(self):
+        """ Add a daily appointment, which started an hour ago, and return its start. """
+        start = doto.model.now_with_tz().replace(microsecond=0) - datetime.timedelta(hours=1)
+        doto.model.apmt.add_repeated(self.store, doto.model.apmt.Appointment("daily", start), '@daily')
+        self.store.save()
+        self.args.view = 'apmts'
+        self.args.all = False
+        return start
+
+    def print_page(self, view, after=None):
+        """ Print a page like an ls command and return the number of its events. """
+        view.print_view(self.store, self.args, doto.cli.printing.LineWriter(io.StringIO()), after)
+        count = len(self.store._cache_records)
+        self.store.save()
+        self.store.reset()
+        return count
+
+    def test_line_generator(self):
+        """ Test if a wrapped row is split into multiple lines. """
+        columns = [doto.cli.cmd.ls.Column('a', 2, '<'),
+                   doto.cli.cmd.ls.WrapColumn('b', 10, '<')]
+        lines = list(doto.cli.cmd.ls.line_generator(columns, [(1, "one two three"), (2, "four")]))
+        self.assertEqual([line[0] for line in lines], ['1', '', '2'])
+        self.assertEqual(lines[2], ('2', 'four'))
+        self.assertEqual(list(doto.cli.cmd.ls.line_generator(columns, [])), [])
+
+    def test_print_view(self):
+        """ Test if every printed task gets its cache id. """
+        self.add_tasks(3)
+        stream = io.StringIO()
+        writer = doto.cli.printing.LineWriter(stream, chunk_lines=2)
+        doto.cli.cmd.ls.TaskOverview(self.config, 80).print_view(self.store, self.args, writer)
+        writer.flush()
+        lines = stream.getvalue().splitlines()
+        self.assertEqual(len(lines), 4)
+        self.assertIn("task 2", lines[3])
+        self.store.save()
+        task, _ = doto.model.get_cache_item(self.store, 2, doto.model.task.Task)
+        self.assertEqual(task.title, "task 2")
+
+    def test_empty_view(self):
+        """ Test if an empty view prints nothing, not even the header. """
+        stream = io.StringIO()
+        writer = doto.cli.printing.LineWriter(stream)
+        doto.cli.cmd.ls.TaskOverview(self.config, 80).print_view(self.store, self.args, writer)
+        writer.flush()
+        self.assertEqual(stream.getvalue(), "")
+
+    def test_broken_pipe(self):
+        """ Test if the view stops reading tasks when the reader of the output is gone. """
+        self.add_tasks(2000)
+        writer = BrokenWriter(io.StringIO(), chunk_lines=256)
+        with self.assertRaises(BrokenPipeError):
+            doto.cli.cmd.ls.TaskOverview(self.config, 80).print_view(self.store, self.args, writer)
+        self.assertLess(len(self.store._cache_records), 2000)
+
+    def test_page_after(self):
+        """ Test if the next page starts after the task with the id of the last ls. """
+        self.add_tasks(5)
+        self.args.page_size = 2
+        view = doto.cli.cmd.ls.TaskOverview(self.config, 80)
+        stream = io.StringIO()
+        writer = doto.cli.printing.LineWriter(stream)
+        view.print_view(self.store, self.args, writer)
+        self.store.save()
+
+        after = view.get_page_key(self.store, 1)
+        view.print_view(self.store, self.args, writer, after)
+        writer.flush()
+        titles = [line.split()[-1] for line in stream.getvalue().splitlines() if "task" in line]
+        self.assertEqual(titles, ["0", "1", "2", "3"])
+        self.assertIsNone(view.get_page_key(self.store, 7))
+
+    def test_occurrence_pages(self):
+        """ Test if the pages of a repeated appointment show every occurrence exactly once. """
+        start = self.add_daily()
+        self.args.page_size = 3
+        view = doto.cli.cmd.ls.ApmtOverview(self.config, 80)
+        starts = []
+        after = None
+        # the 14 days of the view are 5 pages
+        for _ in range(10):
+            count = self.print_page(view, after)
+            if count == 0:
+                break
+            for cache_id in range(count):
+                apmt, _ = doto.model.get_cache_item(self.store, cache_id, doto.model.apmt.Appointment)
+                starts.append(apmt.schedule.start)
+            after = view.get_page_key(self.store, count - 1)
+        self.assertEqual(starts, [start + datetime.timedelta(days=d) for d in range(1, 15)])
+
+    def test_occurrence_ids(self):
+        """ Test if an occurrence can be shown with its id, but not changed. """
+        start = self.add_daily()
+        self.print_page(doto.cli.cmd.ls.ApmtOverview(self.config, 80))
+        occurrence, _ = doto.cli.cmd.apmt.get_cached_apmt(self.store, 1, occurrences=True)
+        self.assertIsInstance(occurrence, doto.model.apmt.Occurrence)
+        self.assertEqual(occurrence.schedule.start, start + datetime.timedelta(days=2))
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertEqual(doto.cli.cmd.apmt.get_cached_apmt(self.store, 1), (None, 1))
+
+        # after the occurrence was added to the store the id is its appointment
+        doto.model.apmt.create_repeats(self.store, start + datetime.timedelta(days=1, hours=1))
+        apmt, _ = doto.cli.cmd.apmt.get_cached_apmt(self.store, 1)
+        self.assertNotIsInstance(apmt, doto.model.apmt.Occurrence)
+        self.assertEqual(apmt.schedule.start, occurrence.schedule.start)
+        self.assertNotEqual(apmt.id, occurrence.id)
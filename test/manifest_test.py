@@ -0,0 +1,55 @@
+"""Unittests for the command manifest of the CLI."""
+
+import importlib
+import subprocess
+import sys
+import unittest
+
+import doto
+import doto.cli.manifest
+import doto.cli.sub_cmds
+
+
+class TestManifest(unittest.TestCase):
+
+    """Unittest for the manifest and the parser built from it."""
+
+    def test_modules(self):
+        """ Test if every command in the manifest has a module with the same command name. """
+        for path, command in doto.cli.manifest.leaf_commands():
+            module = importlib.import_module(command.module)
+            self.assertEqual(module.COMMAND, path[-1])
+            self.assertTrue(callable(module.main))
+
+    def test_choices(self):
+        """ Test if the static choices match the model and the views. """
+        import doto.cli.cmd.ls
+        import doto.model.task
+        self.assertEqual(doto.cli.manifest.DIFFICULTIES, list(doto.model.task.DIFFICULTY.keys))
+        self.assertEqual(set(doto.cli.manifest.LS_VIEWS), set(doto.cli.cmd.ls.VIEWS.keys()))
+        self.assertEqual(doto.cli.manifest.LS_VIEWS[0], doto.cli.cmd.ls.DEFAULT_VIEW)
+
+    def test_parse(self):
+        """ Test if the module of the selected command is set by the parser. """
+        _, args = doto.init_env(doto.cli.manifest.COMMANDS, ["task", "add", "title", "description", "--difficulty", "2"])
+        self.assertEqual(args.module, "doto.cli.cmd.task.add")
+        self.assertEqual(args.title, "title")
+        self.assertEqual(args.difficulty, 2)
+
+        _, args = doto.init_env(doto.cli.manifest.COMMANDS, ["punch", "in"])
+        self.assertEqual(doto.cli.sub_cmds.load_command(args).__name__, "doto.cli.cmd.punch.in")
+
+        _, args = doto.init_env(doto.cli.manifest.COMMANDS, ["task"])
+        self.assertIsNone(doto.cli.sub_cmds.load_command(args))
+
+    def test_lazy_import(self):
+        """ Test if only the selected command is imported. """
+        code = ("import sys, doto, doto.cli.manifest, doto.cli.sub_cmds\n"
+                "_, args = doto.init_env(doto.cli.manifest.COMMANDS, ['task', 'show', '1'])\n"
+                "doto.cli.sub_cmds.load_command(args)\n"
+                "print(' '.join(name for name in sys.modules if name.startswith('doto.cli.cmd.')))\n")
+        output = subprocess.check_output([sys.executable, "-c", code]).decode().split()
+        self.assertIn("doto.cli.cmd.task.show", output)
+        self.assertNotIn("doto.cli.cmd.ls", output)
+        self.assertNotIn("doto.cli.cmd.task.add", output)
+        self.assertNotIn("doto.cli.cmd.apmt", output)
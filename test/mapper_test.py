@@ -0,0 +1,94 @@
+"""Unittests for the row mappers of the model classes."""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import doto.model
+import doto.model.apmt
+import doto.model.mapper
+import doto.model.repeat
+import doto.model.task
+import doto.model.timerecord
+
+TEST_DB_FILE = ""
+
+
+class TestMapper(unittest.TestCase):
+
+    """Unittest for the Mapper class."""
+
+    def setUp(self):
+        """ Create a new Db store. """
+        self.tmp_dir = tempfile.mkdtemp()
+        self.store = doto.model.Store(TEST_DB_FILE,
+                                      os.path.join(self.tmp_dir, "cache"),
+                                      os.path.join(self.tmp_dir, "last"))
+
+    def tearDown(self):
+        """ Close the connection after every test. """
+        self.store.close()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_registry(self):
+        """ Test if every model class has a mapper. """
+        for module, cls in ((doto.model.task, doto.model.task.Task),
+                            (doto.model.apmt, doto.model.apmt.Appointment),
+                            (doto.model.repeat, doto.model.repeat.Repeat),
+                            (doto.model.timerecord, doto.model.timerecord.Timerecord)):
+            self.assertIs(doto.model.mapper.get(cls), module.mapper)
+
+    def test_compile_once(self):
+        """ Test if the row_to_obj function is only build once per column order. """
+        mapper = doto.model.task.mapper
+        columns = ('id', 'title', 'description', 'created', 'state',
+                   'difficulty', 'due', 'start', 'end', 'repeat')
+        self.assertIs(mapper.compile(columns), mapper.compile(columns))
+        self.assertIsNot(mapper.compile(columns), mapper.compile(tuple(reversed(columns))))
+
+    def test_column_order(self):
+        """ Test if rows with a different column order are converted correctly. """
+        apmt = doto.model.apmt.Appointment("title", doto.model.now_with_tz(), description="description")
+        doto.model.apmt.add_new(self.store, apmt)
+        query = 'SELECT repeat, end, start, created, description, title, id FROM appointments;'
+        (result,) = self.store.query(doto.model.apmt.mapper, query)
+        self.assertEqual(result.id, apmt.id)
+        self.assertEqual(result.title, apmt.title)
+        self.assertEqual(result.description, apmt.description)
+        self.assertEqual(result.schedule, apmt.schedule)
+        self.assertEqual(result.created, apmt.created)
+
+    def test_timerecord(self):
+        """ Test if a timerecord and its task survive the round trip. """
+        task = doto.model.task.Task("title", "description")
+        doto.model.task.add_new(self.store, task)
+        record = doto.model.timerecord.Timerecord(doto.model.now_with_tz(), task_event=task)
+        doto.model.timerecord.add_new(self.store, record)
+        (result,) = doto.model.timerecord.get_started_timerecords(self.store)
+        self.assertEqual(result.id, record.id)
+        self.assertEqual(result.span, record.span)
+        self.assertEqual(result.task, task)
+
+    def test_shared_repeat(self):
+        """ Test if the repeats of many tasks are loaded with one query and shared. """
+        now = doto.model.now_with_tz()
+        repeats = [doto.model.repeat.parse('@daily', now, None) for _ in range(3)]
+        doto.model.repeat.add_new(self.store, repeats)
+        tasks = []
+        for i in range(30):
+            task = doto.model.task.Task("title %d" % i, "description", repeat=repeats[i % 3])
+            task.due = now
+            tasks.append(task)
+        doto.model.task.add_new(self.store, tasks)
+
+        queries = []
+        self.store.conn.set_trace_callback(queries.append)
+        result = doto.model.task.get_open_tasks(self.store, limit=None)
+        self.store.conn.set_trace_callback(None)
+
+        self.assertEqual(len(queries), 2)
+        self.assertEqual(len(result), 30)
+        self.assertEqual(len({id(task.repeat) for task in result}), 3)
+        for task in result:
+            self.assertEqual(task.repeat.id, repeats[(task.id - 1) % 3].id)
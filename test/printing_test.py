@@ -3,8 +3,14 @@
 
 import unittest
 import datetime
+import os
+import tempfile
 import doto.cli.printing
+import doto.defaultconfig
 import doto.model
+import doto.simpleconf
+
+import pytz
 
 
 class TestStrFromTimeSpan(unittest.TestCase):
@@ -122,3 +128,84 @@ class TestUnicodeFromatter(unittest.TestCase):
                         )
         for spec, t_str in format_specs:
             self.assertEqual(t_str, formatter.format(spec, utest_str))
+
+    def test_display_width(self):
+        self.assertEqual(doto.cli.printing.display_width("over due"), 8)
+        self.assertEqual(doto.cli.printing.display_width("Ⅲ"), 1)
+        self.assertEqual(doto.cli.printing.display_width('Tet̲a̲r̲st'), 7)
+        self.assertEqual(doto.cli.printing.display_width("a\tb"), -1)
+
+
+class TestCompiledFormat(unittest.TestCase):
+    row_format = '{:>4} {:^15} {:^1} {:<30}'
+    rows = [(i, "over due", "✓", 'Tet̲a̲r̲st {}'.format(i)) for i in range(100)]
+
+    def test_same_as_format(self):
+        formatter = doto.cli.printing.UnicodeFormatter()
+        format_row = formatter.compile(self.row_format)
+        for row in self.rows + [(1, "", "Ⅲ", ""), ("text", 1.5, " ", "end")]:
+            self.assertEqual(formatter.format(self.row_format, *row), format_row(*row))
+        for escaped_format in ('a{{b}}c{:>3}d', '{:>3} {{x}}'):
+            self.assertEqual(formatter.compile(escaped_format)('x'), formatter.format(escaped_format, 'x'))
+
+    def test_literals(self):
+        formatter = doto.cli.printing.UnicodeFormatter()
+        self.assertEqual(formatter.compile('[{1:^5}|{0}]')('a', 'Ⅲ'), '[  Ⅲ  |a]')
+        self.assertEqual(formatter.compile('no fields')(), 'no fields')
+        self.assertRaises(ValueError, formatter.compile, '{name}')
+
+
+class TestDatePrinter(unittest.TestCase):
+    now = datetime.datetime(2015, 3, 28, 12, 0, tzinfo=pytz.utc)
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.config = doto.simpleconf.Config("test/configs/dotorc.1", doto.defaultconfig.CONF_DEF)
+        # the date widths are cached next to the cache file of the config
+        self.config.path.set_value("cache", os.path.join(self.tmp_dir.name, "cache"))
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_due_to_str(self):
+        date_printer = doto.cli.printing.DatePrinter(self.config, now=self.now)
+        self.assertEqual(date_printer.due_to_str(self.now - datetime.timedelta(minutes=1)), "over due")
+        self.assertEqual(date_printer.due_to_str(self.now + datetime.timedelta(hours=2)), "2h 0m")
+        self.assertEqual(date_printer.due_to_str(self.now + datetime.timedelta(days=10)), "07.04.2015")
+        self.assertEqual(date_printer.due_to_str(None, default="--"), "--")
+
+    def test_short_date_string(self):
+        """ Test if the short date is memoised per day of the local timezone. """
+        date_printer = doto.cli.printing.DatePrinter(self.config, now=self.now)
+        # 23:30 UTC is already the next day in Berlin
+        self.assertEqual(date_printer.short_date_string(datetime.datetime(2015, 3, 28, 10, 0, tzinfo=pytz.utc)), "28.03.2015")
+        self.assertEqual(date_printer.short_date_string(datetime.datetime(2015, 3, 28, 23, 30, tzinfo=pytz.utc)), "29.03.2015")
+        self.assertEqual(date_printer.short_date_string(datetime.datetime(2015, 3, 28, 11, 0, tzinfo=pytz.utc)), "28.03.2015")
+
+    def test_is_day_format(self):
+        self.assertTrue(doto.cli.printing.is_day_format("%d. %b. %Y"))
+        self.assertTrue(doto.cli.printing.is_day_format("%%H %d"))
+        self.assertFalse(doto.cli.printing.is_day_format("%d.%m.%Y-%H:%M"))
+
+    def test_cached_max_date_len(self):
+        """ Test if the width of a date format is computed once and read from the file afterwards. """
+        calls = []
+
+        def date_to_str(date):
+            calls.append(date)
+            return '{:%d. %B %Y}'.format(date)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filename = os.path.join(tmp_dir, doto.cli.printing.DATE_WIDTH_FILE)
+            width = doto.cli.printing.cached_max_date_len(filename, "test %B", "UTC", date_to_str)
+            self.assertEqual(width, len("12. September 2012"))
+            self.assertEqual(len(calls), 19)
+            self.assertTrue(os.path.exists(filename))
+
+            # a new process reads the file instead of formatting the dates
+            doto.cli.printing._date_widths.clear()
+            self.assertEqual(doto.cli.printing.cached_max_date_len(filename, "test %B", "UTC", date_to_str), width)
+            self.assertEqual(len(calls), 19)
+
+            doto.cli.printing.cached_max_date_len(filename, "test %B", "Europe/Berlin", date_to_str)
+            self.assertEqual(len(calls), 38)
@@ -0,0 +1,77 @@
+"""Unittests for the full-text search."""
+
+import datetime
+import os
+import shutil
+import tempfile
+import unittest
+
+import pytz
+
+import doto.model
+import doto.model.apmt
+import doto.model.search
+import doto.model.task
+
+TEST_DB_FILE = ""
+
+
+@unittest.skipUnless(doto.model.search.fts5_available(), "sqlite was compiled without FTS5")
+class TestSearch(unittest.TestCase):
+
+    """Unittest for the search module."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.store = doto.model.Store(TEST_DB_FILE,
+                                      os.path.join(self.tmp_dir, "cache"),
+                                      os.path.join(self.tmp_dir, "last"))
+        self.milk = doto.model.task.Task("buy milk", "at the store")
+        self.report = doto.model.task.Task("write report", "about the sales of milk and bread")
+        self.meeting = doto.model.apmt.Appointment("milk meeting", datetime.datetime(2030, 1, 1, tzinfo=pytz.utc),
+                                                   description="milk milk")
+        doto.model.task.add_many(self.store, [self.milk, self.report])
+        doto.model.apmt.add_new(self.store, self.meeting)
+        self.store.save()
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.tmp_dir)
+
+    def search(self, *terms):
+        return [event.title for event in doto.model.search.search(self.store, terms)]
+
+    def test_rank(self):
+        """ Test if tasks and appointments are found and the best match comes first. """
+        self.assertEqual(self.search("milk"), [self.meeting.title, self.milk.title, self.report.title])
+        self.assertEqual(self.search("milk", "store"), [self.milk.title])
+        self.assertEqual(self.search("cheese"), [])
+
+    def test_triggers(self):
+        """ Test if updates and deletes are found by the search. """
+        self.report.title = "write cheese report"
+        doto.model.task.update(self.store, self.report)
+        doto.model.task.delete(self.store, self.milk)
+        self.store.save()
+        self.assertEqual(self.search("cheese"), [self.report.title])
+        self.assertEqual(self.search("store"), [])
+
+    def test_quoted_terms(self):
+        """ Test if operators and quotes in the terms are searched as words. """
+        self.assertEqual(self.search('"milk', "NOT"), [])
+        self.assertEqual(self.search("milk-meeting"), [self.meeting.title])
+
+    def test_missing_event(self):
+        """ Test if an event of the index which is missing in its table is skipped. """
+        self.store.conn.executescript("DROP TRIGGER tasks_search_delete; DELETE FROM tasks WHERE id = {:d};".format(self.milk.id))
+        self.store.identity_map.clear()
+        self.assertEqual(self.search("milk"), [self.meeting.title, self.report.title])
+
+    def test_rebuild(self):
+        """ Test if the rebuild indexes the events of a store without search tables. """
+        self.store.conn.executescript("DROP TABLE tasks_search; DROP TABLE appointments_search;")
+        doto.model.search.rebuild(self.store)
+        self.assertEqual(self.search("milk", "store"), [self.milk.title])
+        new_task = doto.model.task.Task("new milk", "")
+        doto.model.task.add_new(self.store, new_task)
+        self.assertEqual(self.search("new"), [new_task.title])
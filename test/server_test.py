@@ -0,0 +1,133 @@
+"""Unittests for the doto server and its client."""
+
+import os
+import re
+import tempfile
+import threading
+import unittest
+
+import doto.cli.client
+import doto.cli.server
+import doto.defaultconfig
+import doto.model
+import doto.model.task
+import doto.model.timerecord
+
+
+CONFIG = """
+[path]
+store = {dir}/doto.db
+cache = {dir}/cache
+last = {dir}/last
+socket = {dir}/socket
+
+[date]
+local_tz = {tz}
+"""
+
+
+class TestServer(unittest.TestCase):
+
+    """Unittest for the Server class and the client."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.socket_path = os.path.join(self.tmp_dir.name, "socket")
+        self.config_file = os.path.join(self.tmp_dir.name, "dotorc")
+        self.write_config(self.tmp_dir.name, "Europe/Berlin")
+        self.config = doto.defaultconfig.read_config(self.config_file)
+        self.store = doto.model.Store("", self.config.path.cache, self.config.path.last)
+        self.server = doto.cli.server.Server(self.socket_path, self.store, self.config, self.config_file)
+
+    def tearDown(self):
+        self.server.server_close()
+        self.store.close()
+        self.tmp_dir.cleanup()
+
+    def write_config(self, directory, local_tz):
+        with open(self.config_file, "w") as config:
+            config.write(CONFIG.format(dir=directory, tz=local_tz))
+
+    def request(self, argv, config_file=None, store_file=None):
+        """ Send argv to the server and handle the request in this thread. """
+        result = {}
+        message = {'argv': argv, 'columns': 80, 'lines': 24,
+                   'config': os.path.realpath(self.config_file if config_file is None else config_file),
+                   'store': os.path.realpath(self.config.path.store if store_file is None else store_file)}
+
+        def client():
+            result['response'] = doto.cli.client.request(self.socket_path, message)
+
+        thread = threading.Thread(target=client)
+        thread.start()
+        self.server.handle_request()
+        thread.join()
+        return result['response']
+
+    def test_command(self):
+        """ Test if a command is executed with the store of the server. """
+        response = self.request(["task", "add", "title", "description"])
+        self.assertEqual(response['exit_code'], 0)
+        self.assertEqual(doto.model.task.get_count(self.store), 1)
+        self.assertEqual(len(self.store.identity_map), 0)
+
+        response = self.request(["task", "show", "-1"])
+        self.assertEqual(response['exit_code'], 0)
+        self.assertIn("title", response['stdout'])
+
+    def test_parser_error(self):
+        """ Test if a parser error is sent back instead of stopping the server. """
+        response = self.request(["task", "unknown"])
+        self.assertEqual(response['exit_code'], 2)
+        self.assertIn("invalid choice", response['stderr'])
+
+    def test_fallback(self):
+        """ Test if a command which reads from the terminal falls back to the client. """
+        self.request(["punch", "in"])
+        self.request(["punch", "in"])
+        response = self.request(["punch", "out"])
+        self.assertTrue(response['fallback'])
+        self.assertEqual(len(doto.model.timerecord.get_started_timerecords(self.store)), 2)
+
+    def test_other_config(self):
+        """ Test if the commands of a client with another config file or store fall back to the client. """
+        other = os.path.join(self.tmp_dir.name, "other")
+        self.assertTrue(self.request(["task", "add", "title", "description"], config_file=other)['fallback'])
+        self.assertTrue(self.request(["task", "add", "title", "description"], store_file=other)['fallback'])
+        self.assertEqual(doto.model.task.get_count(self.store), 0)
+
+    def test_changed_config(self):
+        """ Test if a changed config is read again and a changed store falls back to the client. """
+        self.write_config(self.tmp_dir.name, "UTC")
+        os.utime(self.config_file, ns=(0, 0))
+        self.assertEqual(self.request(["ls"])['exit_code'], 0)
+        self.assertEqual(self.server.config.date.local_tz, "UTC")
+
+        other = os.path.join(self.tmp_dir.name, "other")
+        os.mkdir(other)
+        self.write_config(other, "UTC")
+        self.assertTrue(self.request(["ls"])['fallback'])
+        self.assertEqual(self.server.config.date.local_tz, "UTC")
+
+    def test_stats(self):
+        """ Test if --stats only counts the statements of the request. """
+        def executed(response):
+            hits, misses = re.search(r"(\d+) hits, (\d+) misses", response['stdout']).groups()
+            return int(hits) + int(misses)
+
+        first = executed(self.request(["--stats", "ls", "tasks"]))
+        self.assertEqual(executed(self.request(["--stats", "ls", "tasks"])), first)
+
+    def test_absolute_profile(self):
+        """ Test if the file of --profile is made absolute before it is sent to the server. """
+        self.assertEqual(doto.cli.client.absolute_profile(["--profile=p.prof", "ls", "--profile=title"]),
+                         ["--profile=" + os.path.abspath("p.prof"), "ls", "--profile=title"])
+        self.assertEqual(doto.cli.client.absolute_profile(["--stats", "--profile=-", "ls"]),
+                         ["--stats", "--profile=-", "ls"])
+
+    def test_no_server(self):
+        """ Test if the client executes the command itself if there is no server. """
+        self.assertIsNone(doto.cli.client.forward(os.path.join(self.tmp_dir.name, "missing"), ["ls"],
+                                                  self.config_file, self.config.path.store))
+        self.assertFalse(doto.cli.server.is_running(os.path.join(self.tmp_dir.name, "missing")))
+        self.assertTrue(doto.cli.server.is_running(self.socket_path))
@@ -0,0 +1,92 @@
+"""Unittests for the phase timers and the --profile and --timings options."""
+
+import contextlib
+import io
+import os
+import pstats
+import tempfile
+import time
+import unittest
+
+import doto
+import doto.defaultconfig
+import doto.model
+import doto.simpleconf
+import doto.timings
+
+
+class TestTimings(unittest.TestCase):
+
+    """Unittest for the Timings class."""
+
+    def test_nested(self):
+        """ Test if the time of a nested phase is not added to the outer phase. """
+        timings = doto.timings.Timings()
+        with timings.phase("render"):
+            time.sleep(0.01)
+            with timings.phase("query"):
+                time.sleep(0.02)
+        with timings.phase("query"):
+            time.sleep(0.02)
+        self.assertEqual(timings.order, ["render", "query"])
+        self.assertGreaterEqual(timings.phases["query"], 0.04)
+        self.assertLess(timings.phases["render"], 0.02)
+        self.assertAlmostEqual(timings.total(), timings.phases["render"] + timings.phases["query"])
+
+        stream = io.StringIO()
+        timings.print_timings(stream)
+        self.assertEqual([line.split()[0] for line in stream.getvalue().splitlines()], ["render", "query", "total"])
+
+    def test_no_timings(self):
+        """ Test if NO_TIMINGS measures nothing. """
+        with doto.timings.NO_TIMINGS.phase("query"):
+            pass
+        self.assertEqual(doto.timings.NO_TIMINGS.phases, {})
+
+
+class TestOptions(unittest.TestCase):
+
+    """Unittest for the global --profile and --timings options."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.config = doto.simpleconf.Config("test/configs/dotorc.1", doto.defaultconfig.CONF_DEF)
+        self.config.path.set_value("cache", os.path.join(self.tmp_dir.name, "cache"))
+        self.store = doto.model.Store("",
+                                      os.path.join(self.tmp_dir.name, "cache"),
+                                      os.path.join(self.tmp_dir.name, "last"))
+
+    def tearDown(self):
+        self.store.close()
+        self.tmp_dir.cleanup()
+
+    def run_command(self, argv):
+        """ Run the command and return its stderr. """
+        args, cmd = doto.parse_command(argv)
+        stderr = io.StringIO()
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(stderr):
+            self.assertEqual(doto.run_command(cmd, self.store, args, self.config, os.terminal_size((80, 24))), 0)
+        return stderr.getvalue()
+
+    def test_timings(self):
+        """ Test if the phases of the command are printed to stderr. """
+        phases = [line.split()[0] for line in self.run_command(["--timings", "task", "add", "title", "description"]).splitlines()]
+        self.assertEqual(phases[0], "render")
+        self.assertIn("query", phases)
+        self.assertIn("save", phases)
+        self.assertEqual(phases[-1], "total")
+        self.assertIs(self.store.timings, doto.timings.NO_TIMINGS)
+        self.assertEqual(self.run_command(["task", "add", "title", "description"]), "")
+
+    def test_profile(self):
+        """ Test if the profile is written to the stats file or to stderr. """
+        filename = os.path.join(self.tmp_dir.name, "ls.prof")
+        self.assertEqual(self.run_command(["--profile=" + filename, "ls"]), "")
+        stats = pstats.Stats(filename)
+        self.assertTrue(any(name == "main" for _, _, name in stats.stats))
+
+        self.assertIn("cumulative", self.run_command(["--profile", "ls"]))
+
+
+if __name__ == '__main__':
+    unittest.main()